@@ -1,9 +1,15 @@
+from django.utils.functional import SimpleLazyObject
+
 from .models import AuthSettings
 
 def auth_settings(request):
-    """Expose global auth settings to templates."""
-    try:
-        settings = AuthSettings.load()
-    except Exception:
-        settings = None
-    return {'auth_settings': settings}
+    """
+    Expose global auth settings to templates. They are only loaded (from
+    the cache, see SingletonModel) by templates that use them.
+    """
+    def load():
+        try:
+            return AuthSettings.load()
+        except Exception:
+            return None
+    return {'auth_settings': SimpleLazyObject(load)}
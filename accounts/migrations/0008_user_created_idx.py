@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_user_organization'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['created_at', 'id'], name='accounts_user_created_idx'),
+        ),
+    ]
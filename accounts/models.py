@@ -5,10 +5,12 @@ Supports Super Admin, Admin, and User roles.
 
 import uuid
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from nfc_platform.singletons import SingletonModel
+
 
 class UserManager(BaseUserManager):
     """Custom user manager for email-based authentication."""
@@ -62,7 +64,16 @@ class User(AbstractUser):
         default=Role.USER,
         db_index=True
     )
-    
+
+    # Organization membership (optional; most users are unaffiliated)
+    organization = models.ForeignKey(
+        'organizations.Organization',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='members'
+    )
+
     # Verification and status
     is_verified = models.BooleanField(
         default=False,
@@ -99,10 +110,33 @@ class User(AbstractUser):
         verbose_name = _('user')
         verbose_name_plural = _('users')
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the dashboard listings
+            models.Index(fields=['created_at', 'id'], name='accounts_user_created_idx'),
+        ]
     
     def __str__(self):
         return self.email
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the membership so save() can move organization quotas
+        if 'organization_id' in instance.__dict__:
+            instance._loaded_organization_id = instance.organization_id
+        return instance
+    
+    def save(self, *args, **kwargs):
+        from organizations import quotas
+        
+        creating = self._state.adding
+        previous = None if creating else getattr(self, '_loaded_organization_id', self.organization_id)
+        
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            quotas.member_moved(self, previous, created=creating)
+        self._loaded_organization_id = self.organization_id
+    
     @property
     def is_super_admin(self):
         """Check if user is a Super Admin."""
@@ -211,7 +245,7 @@ class LoginHistory(models.Model):
         return f"{self.email_attempted} - {self.status} - {self.timestamp}"
 
 
-class AuthSettings(models.Model):
+class AuthSettings(SingletonModel):
     """Global authentication settings (Singleton)."""
     enable_google_login = models.BooleanField(
         default=True,
@@ -224,12 +258,3 @@ class AuthSettings(models.Model):
 
     def __str__(self):
         return "Authentication Settings"
-
-    def save(self, *args, **kwargs):
-        self.pk = 1  # Singleton
-        super().save(*args, **kwargs)
-
-    @classmethod
-    def load(cls):
-        obj, created = cls.objects.get_or_create(pk=1)
-        return obj
@@ -0,0 +1,149 @@
+"""
+Platform-wide statistics for the admin dashboards.
+
+``platform_stats`` returns the user, admin, organization and card counts,
+the all-time view total and weekly growth series for users and cards.
+They are computed with one grouped query per table: users by role, cards
+by status together with the sum of their ``total_views`` counters (kept
+by analytics/live.py), and organizations. Views are never counted from
+raw events.
+
+The result is cached in the ``accounts`` namespace. Once it is older than
+PLATFORM_STATS_TTL seconds the cached copy is still served while a
+``refresh_platform_stats`` job recomputes it, so the dashboard never
+waits on the counts; only when nothing has been cached for
+PLATFORM_STATS_MAX_AGE seconds are they computed inside the request.
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from nfc_platform.caching import namespace
+
+
+STATS_KEY = 'platform-stats'
+REFRESH_LOCK_KEY = 'accounts:platform-stats:refreshing'
+
+# Growth series shown on the dashboard
+GROWTH_GRANULARITY = 'week'
+GROWTH_PERIODS = 12
+
+
+def platform_stats():
+    """
+    The platform statistics as a dict; see ``compute`` for its keys.
+    Stale values are returned while a background job refreshes them.
+    """
+    stats = namespace('accounts').get(STATS_KEY)
+    if stats is None:
+        return refresh()
+    if time.time() - stats['computed_at'] > settings.PLATFORM_STATS_TTL:
+        # One refresh per TTL, whichever worker notices first
+        if cache.add(REFRESH_LOCK_KEY, 1, settings.PLATFORM_STATS_TTL):
+            from .tasks import refresh_platform_stats
+            refresh_platform_stats.enqueue()
+    return stats
+
+
+def refresh():
+    """Recompute the statistics, cache them and return them."""
+    stats = compute()
+    namespace('accounts').set(STATS_KEY, stats, settings.PLATFORM_STATS_MAX_AGE)
+    return stats
+
+
+def compute():
+    """
+    Returns {'total_users', 'total_admins', 'total_members',
+    'total_organizations', 'total_cards', 'active_cards', 'pending_cards',
+    'total_views', 'growth', 'computed_at'}, where 'growth' is a
+    ``growth_series``.
+    """
+    from cards.models import NFCCard
+    from organizations.models import Organization
+    from .models import User
+
+    users = dict(User.objects.order_by().values_list('role').annotate(count=Count('pk')))
+    cards = {
+        row['status']: row
+        for row in NFCCard.objects.order_by().values('status').annotate(
+            count=Count('pk'), views=Sum('total_views')
+        )
+    }
+    total_users = sum(users.values())
+    total_cards = sum(row['count'] for row in cards.values())
+
+    return {
+        'total_users': total_users,
+        'total_admins': users.get(User.Role.ADMIN, 0),
+        'total_members': users.get(User.Role.USER, 0),
+        'total_organizations': Organization.objects.count(),
+        'total_cards': total_cards,
+        'active_cards': cards.get(NFCCard.Status.ACTIVE, {}).get('count', 0),
+        'pending_cards': cards.get(NFCCard.Status.PENDING, {}).get('count', 0),
+        'total_views': sum(row['views'] or 0 for row in cards.values()),
+        'growth': growth_series(
+            GROWTH_GRANULARITY, GROWTH_PERIODS,
+            totals={'users': total_users, 'cards': total_cards}
+        ),
+        'computed_at': time.time(),
+    }
+
+
+def growth_series(granularity='week', periods=GROWTH_PERIODS, totals=None):
+    """
+    New and cumulative users and cards per day, week or month, for the
+    last ``periods`` buckets up to today. ``totals`` ({'users', 'cards'})
+    saves counting the running totals again when they are already known.
+
+    Returns {'granularity', 'buckets', 'users', 'cards', 'total_users',
+    'total_cards'}, with ISO bucket starts and one value per bucket.
+    """
+    from analytics.series import bucket_start, buckets
+    from cards.models import NFCCard
+    from nfc_platform.exports import datetime_bounds
+    from .models import User
+
+    if granularity not in ('day', 'week', 'month'):
+        raise ValueError(f'Unknown granularity "{granularity}"; expected day, week or month.')
+
+    end = timezone.localdate()
+    start = bucket_start(end, granularity)
+    for _ in range(periods - 1):
+        start = bucket_start(start - timedelta(days=1), granularity)
+    labels = buckets(start, end, granularity)
+    index = {label: position for position, label in enumerate(labels)}
+    since, _ = datetime_bounds(start, end)
+
+    series = {}
+    for name, model in (('users', User), ('cards', NFCCard)):
+        new = [0] * len(labels)
+        rows = model.objects.filter(created_at__gte=since).order_by().annotate(
+            bucket=Trunc('created_at', granularity, output_field=DateField())
+        ).values_list('bucket').annotate(count=Count('pk'))
+        for bucket, count in rows:
+            if bucket in index:
+                new[index[bucket]] = count
+
+        # Running totals, walking back from the current total
+        total = (totals or {}).get(name)
+        if total is None:
+            total = model.objects.count()
+        cumulative = []
+        for count in reversed(new):
+            cumulative.append(total)
+            total -= count
+        series[name] = new
+        series[f'total_{name}'] = cumulative[::-1]
+
+    return {
+        'granularity': granularity,
+        'buckets': [label.isoformat() for label in labels],
+        **series,
+    }
@@ -0,0 +1,22 @@
+"""
+Background tasks for accounts app.
+"""
+
+from django.conf import settings
+from django.core.mail import send_mail
+
+from jobs.queue import task
+
+
+@task
+def send_email(subject, message, recipient_list):
+    """Send a plain-text email. SMTP errors raise so the job is retried."""
+    send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, recipient_list)
+
+
+@task
+def refresh_platform_stats():
+    """Recompute the cached super admin dashboard statistics."""
+    from .stats import refresh
+
+    refresh()
@@ -1,3 +1,168 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.http import QueryDict
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from cards.models import NFCCard
+from nfc_platform import caching
+from nfc_platform.pagination import InvalidCursor, KeysetPaginator
+from nfc_platform.testing import LOCMEM_CACHES, clear_caches
+from organizations.models import Organization
+from .context_processors import auth_settings
+from .models import AuthSettings, User
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AuthSettingsCacheTests(TestCase):
+
+    def setUp(self):
+        # As in production the row exists; a load() that creates it also
+        # invalidates the value it has just cached
+        AuthSettings.objects.create()
+        clear_caches()
+
+    def test_warm_load_costs_no_queries_or_shared_cache_reads(self):
+        AuthSettings.load()
+        with self.assertNumQueries(0), mock.patch.object(caching, 'cache') as shared:
+            settings = AuthSettings.load()
+        self.assertTrue(settings.enable_google_login)
+        self.assertEqual(shared.mock_calls, [])
+
+    def test_template_render_uses_the_cached_row(self):
+        AuthSettings.load()
+        context = auth_settings(RequestFactory().get('/'))
+        template = Template('{% if auth_settings.enable_google_login %}google{% endif %}')
+        with self.assertNumQueries(0), mock.patch.object(caching, 'cache') as shared:
+            self.assertEqual(template.render(Context(context)), 'google')
+        self.assertEqual(shared.mock_calls, [])
+
+    def test_saving_reloads_the_row(self):
+        settings = AuthSettings.load()
+        settings.enable_google_login = False
+        settings.save()
+        with self.assertNumQueries(1):
+            self.assertFalse(AuthSettings.load().enable_google_login)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SECURE_SSL_REDIRECT=False, DASHBOARD_PAGE_SIZE=2)
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.owner = User.objects.create_user('owner@example.com', 'pass12345')
+        self.cards = [
+            NFCCard.objects.create(user=self.owner, qr_code='qrcodes/x.png', card_uid=f'UID-{n}')
+            for n in range(7)
+        ]
+        # Every card shares one created_at, so only the id breaks ties
+        NFCCard.objects.update(created_at=timezone.now())
+        self.newest_first = list(NFCCard.objects.order_by('-created_at', '-id'))
+
+    def walk(self, paginator):
+        pages = [paginator.page()]
+        while pages[-1].has_next:
+            pages.append(paginator.page(pages[-1].next_cursor))
+        return pages
+
+    def test_forward_cursors_visit_every_row_once_despite_ties(self):
+        paginator = KeysetPaginator(NFCCard.objects.all(), 3)
+        pages = self.walk(paginator)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual([card for page in pages for card in page], self.newest_first)
+        self.assertFalse(pages[0].has_previous)
+        self.assertTrue(pages[-1].has_previous)
+
+    def test_backward_cursors_return_the_previous_page(self):
+        paginator = KeysetPaginator(NFCCard.objects.all(), 3)
+        pages = self.walk(paginator)
+
+        middle = paginator.page(pages[2].previous_cursor)
+        self.assertEqual(list(middle), list(pages[1]))
+        self.assertTrue(middle.has_next)
+        first = paginator.page(middle.previous_cursor)
+        self.assertEqual(list(first), list(pages[0]))
+        self.assertFalse(first.has_previous)
+        self.assertEqual(list(paginator.page(first.next_cursor)), list(pages[1]))
+
+    def test_ascending_ordering(self):
+        paginator = KeysetPaginator(NFCCard.objects.all(), 2, ('created_at', 'id'))
+        pages = self.walk(paginator)
+        self.assertEqual([card for page in pages for card in page], self.newest_first[::-1])
+
+    def test_cursor_of_another_ordering_is_rejected(self):
+        cursor = KeysetPaginator(NFCCard.objects.all(), 2, ('created_at', 'id')).page().next_cursor
+        with self.assertRaises(InvalidCursor):
+            KeysetPaginator(NFCCard.objects.all(), 2).page(cursor)
+        with self.assertRaises(InvalidCursor):
+            KeysetPaginator(NFCCard.objects.all(), 2).page('not-a-cursor')
+
+    def test_view_404s_for_a_cursor_of_another_sort(self):
+        self.client.force_login(
+            User.objects.create_user('admin@example.com', 'pass12345', role=User.Role.ADMIN)
+        )
+        url = reverse('accounts:admin_cards')
+        next_url = self.client.get(url, {'sort': 'oldest'}).context['next_url']
+        cursor = QueryDict(next_url.split('?', 1)[1])['cursor']
+
+        self.assertEqual(self.client.get(url, {'sort': 'oldest', 'cursor': cursor}).status_code, 200)
+        self.assertEqual(self.client.get(url, {'sort': 'newest', 'cursor': cursor}).status_code, 404)
+
+    def test_view_keeps_search_and_filters_across_pages(self):
+        NFCCard.objects.exclude(card_uid__in=['UID-1', 'UID-2']).update(status=NFCCard.Status.ACTIVE)
+        self.client.force_login(
+            User.objects.create_user('admin@example.com', 'pass12345', role=User.Role.ADMIN)
+        )
+        response = self.client.get(
+            reverse('accounts:admin_cards'), {'q': 'uid-', 'status': NFCCard.Status.ACTIVE}
+        )
+        seen = list(response.context['cards'])
+        while response.context['next_url']:
+            self.assertIn('q=uid-', response.context['next_url'])
+            self.assertIn('status=ACTIVE', response.context['next_url'])
+            response = self.client.get(response.context['next_url'])
+            seen.extend(response.context['cards'])
+
+        self.assertEqual(
+            sorted(card.card_uid for card in seen), ['UID-0', 'UID-3', 'UID-4', 'UID-5', 'UID-6']
+        )
+        self.assertEqual(len(seen), len(set(seen)))
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SECURE_SSL_REDIRECT=False)
+class ExportAllCardsTests(TestCase):
+
+    url = reverse('accounts:admin_export_all_cards')
+
+    def setUp(self):
+        clear_caches()
+        self.acme = Organization.objects.create(name='Acme', max_users=10, max_cards=10)
+        self.globex = Organization.objects.create(name='Globex', max_users=10, max_cards=10)
+        for organization, uid in ((self.acme, 'UID-ACME'), (self.globex, 'UID-GLOBEX')):
+            owner = User.objects.create_user(f'owner@{organization.slug}.com', 'pass12345', organization=organization)
+            NFCCard.objects.create(user=owner, card_uid=uid, qr_code='qrcodes/x.png')
+
+    def exported(self, user, **params):
+        self.client.force_login(user)
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        rows = b''.join(response.streaming_content).decode().splitlines()[1:]
+        return sorted(row.split(',')[0] for row in rows)
+
+    def test_super_admin_without_an_organization_exports_every_card(self):
+        root = User.objects.create_user('root@example.com', 'pass12345', role=User.Role.SUPER_ADMIN)
+        self.assertEqual(self.exported(root), ['UID-ACME', 'UID-GLOBEX'])
+        self.assertEqual(self.exported(root, organization=self.globex.slug), ['UID-GLOBEX'])
+
+    def test_admins_export_their_own_organization(self):
+        admin = User.objects.create_user(
+            'admin@acme.com', 'pass12345', organization=self.acme, role=User.Role.ADMIN
+        )
+        self.assertEqual(self.exported(admin, organization=self.globex.slug), ['UID-ACME'])
+
+    def test_unknown_organization_is_400(self):
+        root = User.objects.create_user('root@example.com', 'pass12345', role=User.Role.SUPER_ADMIN)
+        self.client.force_login(root)
+        self.assertEqual(self.client.get(self.url, {'organization': 'nope'}).status_code, 400)
@@ -57,6 +57,10 @@ urlpatterns = [
     path('admin-dashboard/cards/<uuid:card_id>/export/', views.AdminExportCardView.as_view(), name='admin_export_card'),
     path('admin-dashboard/cards/export-all/', views.AdminExportAllCardsView.as_view(), name='admin_export_all_cards'),
     path('admin-dashboard/cards/print/', views.AdminPrintCardsView.as_view(), name='admin_print_cards'),
+    path('admin-dashboard/cards/print/sheets/', views.AdminPrintSheetsView.as_view(), name='admin_print_sheets'),
+    path('admin-dashboard/cards/print/sheets/<uuid:batch_id>/download/', views.AdminPrintSheetDownloadView.as_view(), name='admin_print_sheet_download'),
+    path('admin-dashboard/cards/provision/', views.AdminProvisionCardsView.as_view(), name='admin_provision_cards'),
+    path('admin-dashboard/cards/provision/<uuid:batch_id>/manifest/', views.AdminProvisionManifestView.as_view(), name='admin_provision_manifest'),
     path('admin-dashboard/analytics/', views.AdminAnalyticsView.as_view(), name='admin_analytics'),
     path('admin-dashboard/settings/', views.AdminSettingsView.as_view(), name='admin_settings'),
     
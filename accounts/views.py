@@ -5,19 +5,20 @@ Handles authentication, registration, and dashboards.
 
 import uuid
 import io
-import qrcode
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views import View
 from django.views.generic import TemplateView
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
-from django.core.mail import send_mail
 from django.conf import settings
 from django.utils import timezone
-from django.http import HttpResponseRedirect, HttpResponse, JsonResponse
+from django.http import HttpResponseRedirect, HttpResponse, HttpResponseBadRequest, JsonResponse
 from django.urls import reverse
 from django.template.loader import render_to_string
+from django.db.models import Q
+
+from nfc_platform.pagination import KeysetPaginationMixin
 
 from .models import User, LoginHistory
 from .forms import (
@@ -25,6 +26,7 @@ from .forms import (
     ResetPasswordForm, ChangePasswordForm
 )
 from .mixins import SuperAdminRequiredMixin, AdminRequiredMixin, UserRequiredMixin
+from .tasks import send_email
 
 
 class LoginView(View):
@@ -196,13 +198,7 @@ Best regards,
 The {settings.SITE_NAME} Team
 '''
         
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [user.email],
-            fail_silently=True,
-        )
+        send_email.enqueue(subject, message, [user.email])
 
 
 class VerifyEmailView(View):
@@ -288,13 +284,7 @@ Best regards,
 The {settings.SITE_NAME} Team
 '''
         
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [user.email],
-            fail_silently=True,
-        )
+        send_email.enqueue(subject, message, [user.email])
 
 
 class ResetPasswordView(View):
@@ -389,19 +379,23 @@ class SuperAdminDashboardView(SuperAdminRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Get statistics
-        from organizations.models import Organization
-        from cards.models import NFCCard
-        from analytics.models import ProfileAnalytics
-        from django.db.models import Count
-        
-        context['total_users'] = User.objects.count()
-        context['total_admins'] = User.objects.filter(role=User.Role.ADMIN).count()
-        context['total_organizations'] = Organization.objects.count()
-        context['total_cards'] = NFCCard.objects.count()
-        context['active_cards'] = NFCCard.objects.filter(status=NFCCard.Status.ACTIVE).count()
-        context['pending_cards'] = NFCCard.objects.filter(status=NFCCard.Status.PENDING).count()
-        context['total_views'] = ProfileAnalytics.objects.filter(interaction_type='VIEW').count()
+        # Get statistics (cached, refreshed in the background)
+        from datetime import date
+        from .stats import platform_stats
+        
+        stats = platform_stats()
+        context.update(stats)
+        growth = stats['growth']
+        context['growth_rows'] = [
+            {
+                'start': date.fromisoformat(start),
+                'users': growth['users'][position],
+                'cards': growth['cards'][position],
+                'total_users': growth['total_users'][position],
+                'total_cards': growth['total_cards'][position],
+            }
+            for position, start in reversed(list(enumerate(growth['buckets'])))
+        ]
         
         # Recent users with profile data
         context['recent_users'] = User.objects.select_related('profile').order_by('-created_at')[:10]
@@ -422,14 +416,47 @@ class SuperAdminAdminsView(SuperAdminRequiredMixin, TemplateView):
 
 
 
-class SuperAdminUsersView(SuperAdminRequiredMixin, TemplateView):
+def with_card_summary(users):
+    """
+    ``users`` with ``card_count`` and ``latest_cards`` (the newest card,
+    in a list) attached, rather than prefetching every card.
+    """
+    from django.db.models import Count, OuterRef, Prefetch, Subquery, Value
+    from django.db.models.functions import Coalesce
+    from cards.models import NFCCard
+    
+    card_count = NFCCard.objects.filter(
+        user=OuterRef('pk')
+    ).order_by().values('user').annotate(total=Count('pk')).values('total')
+    return users.select_related('profile').annotate(
+        card_count=Coalesce(Subquery(card_count), Value(0)),
+    ).prefetch_related(Prefetch(
+        'cards',
+        queryset=NFCCard.objects.only('id', 'user', 'url_slug').order_by('-created_at', '-id')[:1],
+        to_attr='latest_cards',
+    ))
+
+
+USER_SEARCH_FIELDS = ('email', 'profile__full_name', 'profile__phone_primary')
+
+USER_STATUS_FILTERS = {
+    'active': Q(is_active=True),
+    'inactive': Q(is_active=False),
+}
+
+
+class SuperAdminUsersView(SuperAdminRequiredMixin, KeysetPaginationMixin, TemplateView):
     """Super Admin - View all users."""
     template_name = 'dashboard/superadmin/users.html'
+    context_object_name = 'users'
+    search_fields = USER_SEARCH_FIELDS
+    filters = {
+        'role': {role: Q(role=role) for role in User.Role.values},
+        'status': USER_STATUS_FILTERS,
+    }
     
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['users'] = User.objects.select_related('profile').prefetch_related('cards').order_by('-created_at')
-        return context
+    def get_queryset(self):
+        return with_card_summary(User.objects.all())
 
 
 class SuperAdminAnalyticsView(SuperAdminRequiredMixin, TemplateView):
@@ -453,36 +480,47 @@ class AdminDashboardView(AdminRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # All users
-        context['users'] = User.objects.filter(role=User.Role.USER).select_related('profile').prefetch_related('cards')
-        context['user_count'] = context['users'].count()
+        # Counts only (cached, refreshed in the background); the listings are paginated
+        from .stats import platform_stats
         
-        from cards.models import NFCCard
-        context['cards'] = NFCCard.objects.all()
-        context['card_count'] = context['cards'].count()
-        context['active_cards'] = context['cards'].filter(status=NFCCard.Status.ACTIVE).count()
+        stats = platform_stats()
+        context['user_count'] = stats['total_members']
+        context['card_count'] = stats['total_cards']
+        context['active_cards'] = stats['active_cards']
         
         return context
 
 
-class AdminUsersView(AdminRequiredMixin, TemplateView):
+class AdminUsersView(AdminRequiredMixin, KeysetPaginationMixin, TemplateView):
     """Admin - Manage all users."""
     template_name = 'dashboard/admin/users.html'
+    context_object_name = 'users'
+    search_fields = USER_SEARCH_FIELDS
+    filters = {'status': USER_STATUS_FILTERS}
     
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['users'] = User.objects.filter(role=User.Role.USER).select_related('profile').prefetch_related('cards').order_by('-created_at')
-        return context
+    def get_queryset(self):
+        return with_card_summary(User.objects.filter(role=User.Role.USER))
 
 
-class AdminCardsView(AdminRequiredMixin, TemplateView):
+class AdminCardsView(AdminRequiredMixin, KeysetPaginationMixin, TemplateView):
     """Admin - Manage all cards."""
     template_name = 'dashboard/admin/cards.html'
+    context_object_name = 'cards'
+    search_fields = ('url_slug', 'card_uid', 'user__email', 'user__profile__full_name')
+    
+    @property
+    def filters(self):
+        from cards.models import NFCCard
+        return {'status': {status: Q(status=status) for status in NFCCard.Status.values}}
+    
+    def get_queryset(self):
+        from cards.models import NFCCard
+        return NFCCard.objects.select_related('user', 'user__profile', 'theme')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         from cards.models import NFCCard
-        context['cards'] = NFCCard.objects.select_related('user', 'user__profile', 'theme').order_by('-created_at')
+        context['statuses'] = NFCCard.Status.choices
         return context
 
 
@@ -525,8 +563,8 @@ class AdminUserDetailView(AdminRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         from cards.models import NFCCard
-        from analytics.models import ProfileAnalytics
-        from django.db.models import Count
+        from analytics.models import DailyAnalyticsSummary
+        from django.db.models import Sum
         
         user_id = self.kwargs.get('user_id')
         user = get_object_or_404(User, id=user_id)
@@ -535,11 +573,10 @@ class AdminUserDetailView(AdminRequiredMixin, TemplateView):
         context['cards'] = user.cards.all()
         context['active_cards_count'] = user.cards.filter(status=NFCCard.Status.ACTIVE).count()
         
-        # Get total views for user's cards
-        context['total_views'] = ProfileAnalytics.objects.filter(
-            card__in=user.cards.all(),
-            interaction_type='VIEW'
-        ).count()
+        # Get total views for user's cards from the daily rollups
+        context['total_views'] = DailyAnalyticsSummary.objects.filter(
+            card__user=user
+        ).aggregate(total=Sum('total_views'))['total'] or 0
         
         try:
             context['profile'] = user.profile
@@ -555,35 +592,19 @@ class AdminExportCardView(AdminRequiredMixin, View):
     def get(self, request, card_id):
         from cards.models import NFCCard
         from reportlab.lib.pagesizes import LETTER, inch
-        from reportlab.lib import colors
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.enums import TA_CENTER, TA_LEFT
+        from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer, Image
+        from cards import printing
         
         card = get_object_or_404(NFCCard, id=card_id)
         
         # Create PDF buffer
         buffer = io.BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=LETTER, topMargin=0.5*inch, bottomMargin=0.5*inch)
-        styles = getSampleStyleSheet()
-        
-        # Custom styles
-        title_style = ParagraphStyle(
-            'Title',
-            parent=styles['Heading1'],
-            fontSize=24,
-            alignment=TA_CENTER,
-            spaceAfter=20,
-            textColor=colors.HexColor('#D4AF37')
-        )
         
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=14,
-            spaceAfter=10,
-            textColor=colors.HexColor('#333333')
-        )
+        # Styles shared with the batch print sheets
+        styles = printing.styles()
+        title_style = styles['title']
+        heading_style = styles['heading']
         
         content = []
         
@@ -603,16 +624,7 @@ class AdminExportCardView(AdminRequiredMixin, View):
         ]
         
         t = Table(card_data, colWidths=[2*inch, 4*inch])
-        t.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f7f7f7')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-            ('TOPPADDING', (0, 0), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#dddddd')),
-        ]))
+        t.setStyle(styles['table'])
         content.append(t)
         content.append(Spacer(1, 20))
         
@@ -634,32 +646,16 @@ class AdminExportCardView(AdminRequiredMixin, View):
             ]
             
             t2 = Table(user_data, colWidths=[2*inch, 4*inch])
-            t2.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f7f7f7')),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-                ('TOPPADDING', (0, 0), (-1, -1), 10),
-                ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#dddddd')),
-            ]))
+            t2.setStyle(styles['table'])
             content.append(t2)
             content.append(Spacer(1, 20))
         
         # QR Code
         content.append(Paragraph("QR Code for Printing", heading_style))
         
-        # Generate QR code
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(f"{settings.SITE_URL}/u/{card.url_slug}")
-        qr.make(fit=True)
-        qr_img = qr.make_image(fill_color="#000000", back_color="white")
-        
-        # Save QR to buffer
-        qr_buffer = io.BytesIO()
-        qr_img.save(qr_buffer, format='PNG')
-        qr_buffer.seek(0)
+        # Reuse the card's stored QR code rather than rendering a new one
+        from cards import qr
+        qr_buffer = io.BytesIO(qr.read_asset(qr.get_asset(card)))
         
         # Add QR to PDF
         qr_image = Image(qr_buffer, width=2*inch, height=2*inch)
@@ -680,49 +676,77 @@ class AdminExportCardView(AdminRequiredMixin, View):
 
 
 class AdminExportAllCardsView(AdminRequiredMixin, View):
-    """Export all cards data for printing."""
+    """
+    Export organization cards as CSV for printing, streamed.
+    Accepts start/end (card creation date), organization (super admins;
+    every organization without it) and gzip query parameters; see
+    nfc_platform/exports.py.
+    """
     
     def get(self, request):
         from cards.models import NFCCard
-        import csv
+        from nfc_platform import exports
         
         user = request.user
         
-        # Get organization cards
-        if user.organization:
-            org_users = user.organization.members.all()
-            cards = NFCCard.objects.filter(user__in=org_users).select_related('user')
+        try:
+            start, end = exports.date_range(request)
+            organization = exports.requested_organization(request)
+        except exports.ExportError as e:
+            return HttpResponseBadRequest(str(e))
+        
+        # Get organization cards; every card for super admins without one
+        if organization:
+            cards = NFCCard.objects.filter(user__organization=organization)
+        elif user.is_super_admin:
+            cards = NFCCard.objects.all()
         else:
             cards = NFCCard.objects.none()
         
-        # Create CSV response
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="cards_export.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
-            'Card UID', 'URL Slug', 'Status', 'Public URL',
-            'User Email', 'Full Name', 'Company', 'Designation',
-            'Phone', 'Website', 'Created Date'
-        ])
-        
-        for card in cards:
-            profile = getattr(card.user, 'profile', None) if card.user else None
-            writer.writerow([
-                card.card_uid,
-                card.url_slug,
-                card.get_status_display(),
-                f"{settings.SITE_URL}/u/{card.url_slug}",
-                card.user.email if card.user else '',
-                profile.full_name if profile else '',
-                profile.company if profile else '',
-                profile.designation if profile else '',
-                profile.phone_primary if profile else '',
-                profile.website if profile else '',
-                card.created_at.strftime('%Y-%m-%d %H:%M'),
-            ])
-        
-        return response
+        since, until = exports.datetime_bounds(start, end)
+        if since:
+            cards = cards.filter(created_at__gte=since)
+        if until:
+            cards = cards.filter(created_at__lt=until)
+        
+        # User and profile columns come from joins in the same query
+        rows = cards.order_by('created_at', 'pk').values_list(
+            'card_uid', 'url_slug', 'status', 'user__email',
+            'user__profile__full_name', 'user__profile__company',
+            'user__profile__designation', 'user__profile__phone_primary',
+            'user__profile__website', 'created_at'
+        ).iterator(chunk_size=exports.CHUNK_SIZE)
+        
+        statuses = dict(NFCCard.Status.choices)
+        site_url = settings.SITE_URL
+        
+        def format_rows():
+            for (uid, slug, status, email, full_name, company, designation,
+                    phone, website, created_at) in rows:
+                yield [
+                    uid,
+                    slug,
+                    statuses.get(status, status),
+                    f"{site_url}/u/{slug}",
+                    email or '',
+                    full_name or '',
+                    company or '',
+                    designation or '',
+                    phone or '',
+                    website or '',
+                    created_at.strftime('%Y-%m-%d %H:%M'),
+                ]
+        
+        return exports.stream_csv(
+            'cards_export.csv',
+            [
+                'Card UID', 'URL Slug', 'Status', 'Public URL',
+                'User Email', 'Full Name', 'Company', 'Designation',
+                'Phone', 'Website', 'Created Date'
+            ],
+            format_rows(),
+            compress=exports.wants_gzip(request)
+        )
 
 
 class AdminPrintCardsView(AdminRequiredMixin, TemplateView):
@@ -750,6 +774,78 @@ class AdminPrintCardsView(AdminRequiredMixin, TemplateView):
         return context
 
 
+class AdminPrintSheetsView(AdminRequiredMixin, TemplateView):
+    """Admin - Render imposed print sheet PDFs in the background."""
+    template_name = 'dashboard/admin/print_sheets.html'
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        from cards.forms import PrintSheetForm
+        from cards.models import PrintBatch
+        
+        organization = self.request.user.organization
+        context.setdefault('form', PrintSheetForm(organization=organization))
+        context['organization'] = organization
+        context['batches'] = PrintBatch.objects.filter(
+            organization=organization
+        ).select_related('created_by').defer('card_ids')[:20] if organization else []
+        context['has_running'] = any(
+            batch.status in (PrintBatch.Status.PENDING, PrintBatch.Status.RUNNING)
+            for batch in context['batches']
+        )
+        return context
+    
+    def post(self, request):
+        from cards.forms import PrintSheetForm
+        from cards.models import PrintBatch
+        from cards.tasks import render_print_batch
+        
+        organization = request.user.organization
+        if not organization:
+            messages.error(request, 'You need an organization to print cards.')
+            return redirect('accounts:admin_print_sheets')
+        
+        form = PrintSheetForm(request.POST, organization=organization)
+        if not form.is_valid():
+            return self.render_to_response(self.get_context_data(form=form))
+        
+        batch = PrintBatch.objects.create(
+            organization=organization,
+            created_by=request.user,
+            card_ids=form.cleaned_data['card_ids'],
+            total=len(form.cleaned_data['card_ids']),
+            page_size=form.cleaned_data['page_size'],
+            crop_marks=form.cleaned_data['crop_marks'],
+        )
+        render_print_batch.enqueue(batch.pk)
+        
+        messages.success(request, 'Print sheet started. A download link appears here when it is ready.')
+        return redirect('accounts:admin_print_sheets')
+
+
+class AdminPrintSheetDownloadView(AdminRequiredMixin, View):
+    """Admin - Download a rendered print sheet PDF."""
+    
+    def get(self, request, batch_id):
+        from django.http import FileResponse
+        from cards.models import PrintBatch
+        
+        batch = get_object_or_404(
+            PrintBatch.objects.defer('card_ids'),
+            id=batch_id, organization=request.user.organization
+        )
+        if not batch.file:
+            messages.error(request, 'This print sheet is not ready yet.')
+            return redirect('accounts:admin_print_sheets')
+        
+        return FileResponse(
+            batch.file.open('rb'),
+            as_attachment=True,
+            filename=f'print_sheet_{batch.created_at:%Y%m%d_%H%M}.pdf',
+            content_type='application/pdf'
+        )
+
+
 # =============================================================================
 # USER DASHBOARD VIEWS
 # =============================================================================
@@ -847,11 +943,18 @@ class UserAnalyticsView(UserRequiredMixin, TemplateView):
         # Aggregate totals
         totals = context['daily_stats'].aggregate(
             total_views=Sum('total_views'),
-            total_unique=Sum('unique_views'),
             total_saves=Sum('contact_saves')
         )
+        from analytics.rollup import unique_visitors
+        totals['total_unique'] = unique_visitors(context['daily_stats'])
         context['totals'] = totals
         
+        from analytics.live import today
+        from analytics.series import time_series
+        context['today'] = today(cards)
+        end = timezone.localdate()
+        context['time_series'] = time_series('user', user.pk, end - timedelta(days=30), end)
+        
         return context
 
 
@@ -1115,6 +1218,75 @@ class AdminDeleteCardView(AdminRequiredMixin, View):
         return redirect('accounts:admin_user_detail', user_id=user_id)
 
 
+class AdminProvisionCardsView(AdminRequiredMixin, TemplateView):
+    """Admin - Provision cards in bulk from a CSV upload."""
+    template_name = 'dashboard/admin/provision_cards.html'
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        from cards.forms import ProvisionCardsForm
+        from cards.models import ProvisioningBatch
+        
+        organization = self.request.user.organization
+        context.setdefault('form', ProvisionCardsForm())
+        context['organization'] = organization
+        context['batches'] = ProvisioningBatch.objects.filter(
+            organization=organization
+        ).select_related('created_by')[:20] if organization else []
+        context['has_running'] = any(
+            batch.status in (ProvisioningBatch.Status.PENDING, ProvisioningBatch.Status.RUNNING)
+            for batch in context['batches']
+        )
+        return context
+    
+    def post(self, request):
+        from cards.forms import ProvisionCardsForm
+        from cards.models import ProvisioningBatch
+        from cards.tasks import provision_batch
+        
+        organization = request.user.organization
+        if not organization:
+            messages.error(request, 'You need an organization to provision cards.')
+            return redirect('accounts:admin_provision_cards')
+        
+        form = ProvisionCardsForm(request.POST, request.FILES)
+        if not form.is_valid():
+            return self.render_to_response(self.get_context_data(form=form))
+        
+        batch = ProvisioningBatch.objects.create(
+            organization=organization,
+            created_by=request.user,
+            theme=form.cleaned_data['theme'],
+            source=form.cleaned_data['csv_file'],
+        )
+        provision_batch.enqueue(batch.pk)
+        
+        messages.success(request, 'Provisioning started. This page updates as cards are created.')
+        return redirect('accounts:admin_provision_cards')
+
+
+class AdminProvisionManifestView(AdminRequiredMixin, View):
+    """Admin - Download the manifest of a provisioning batch."""
+    
+    def get(self, request, batch_id):
+        from django.http import FileResponse
+        from cards.models import ProvisioningBatch
+        
+        batch = get_object_or_404(
+            ProvisioningBatch, id=batch_id, organization=request.user.organization
+        )
+        if not batch.manifest:
+            messages.error(request, 'This batch has no manifest yet.')
+            return redirect('accounts:admin_provision_cards')
+        
+        return FileResponse(
+            batch.manifest.open('rb'),
+            as_attachment=True,
+            filename=f'cards_manifest_{batch.created_at:%Y%m%d_%H%M}.csv',
+            content_type='text/csv'
+        )
+
+
 # =============================================================================
 # ONBOARDING VIEWS
 # =============================================================================
@@ -1258,22 +1430,6 @@ class ThemeSelectionView(LoginRequiredMixin, View):
             activation_date=timezone.now()
         )
         
-        # Generate QR code for the card
-        try:
-            qr = qrcode.QRCode(version=1, box_size=10, border=5)
-            qr.add_data(f"{settings.SITE_URL}/u/{card.url_slug}")
-            qr.make(fit=True)
-            qr_img = qr.make_image(fill_color="#000000", back_color="white")
-            
-            qr_buffer = io.BytesIO()
-            qr_img.save(qr_buffer, format='PNG')
-            qr_buffer.seek(0)
-            
-            from django.core.files.base import ContentFile
-            card.qr_code.save(f'qr_{card.url_slug}.png', ContentFile(qr_buffer.getvalue()), save=True)
-        except Exception as e:
-            pass  # QR generation failed, but card is still created
-        
         messages.success(request, 'Your profile is ready!')
         return redirect('accounts:onboarding_complete')
 
@@ -4,8 +4,9 @@ Admin configuration for analytics app.
 
 from django.contrib import admin
 from .models import (
-    ProfileAnalytics, DailyAnalyticsSummary,
-    UserAnalyticsSummary, OrganizationAnalytics
+    ProfileAnalytics, DailyAnalyticsSummary, HourlyAnalyticsSummary,
+    UserAnalyticsSummary, OrganizationAnalytics,
+    UserAgent, Referrer, Location
 )
 
 
@@ -17,9 +18,11 @@ class ProfileAnalyticsAdmin(admin.ModelAdmin):
         'card', 'interaction_type', 'device_type',
         'country', 'timestamp'
     )
-    list_filter = ('interaction_type', 'device_type', 'country', 'timestamp')
+    list_filter = ('interaction_type', 'device_type', 'location__country', 'timestamp')
+    list_select_related = ('card', 'agent', 'source', 'location')
     search_fields = ('card__url_slug',)
-    readonly_fields = (
+    # Dimension values are shown decoded rather than as their keys
+    fields = readonly_fields = (
         'id', 'card', 'interaction_type', 'metadata',
         'visitor_ip_hash', 'user_agent', 'referrer',
         'country', 'city', 'device_type', 'browser', 'os', 'timestamp'
@@ -33,6 +36,38 @@ class ProfileAnalyticsAdmin(admin.ModelAdmin):
         return False
 
 
+class DimensionAdmin(admin.ModelAdmin):
+    """Read-only admin for the interned event dimension values."""
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(UserAgent)
+class UserAgentAdmin(DimensionAdmin):
+    list_display = ('value', 'browser', 'os')
+    search_fields = ('value',)
+
+
+@admin.register(Referrer)
+class ReferrerAdmin(DimensionAdmin):
+    list_display = ('url',)
+    search_fields = ('url',)
+
+
+@admin.register(Location)
+class LocationAdmin(DimensionAdmin):
+    list_display = ('country', 'city')
+    list_filter = ('country',)
+    search_fields = ('country', 'city')
+
+
 @admin.register(DailyAnalyticsSummary)
 class DailyAnalyticsSummaryAdmin(admin.ModelAdmin):
     """Admin for daily analytics summaries."""
@@ -67,6 +102,29 @@ class DailyAnalyticsSummaryAdmin(admin.ModelAdmin):
         return False
 
 
+@admin.register(HourlyAnalyticsSummary)
+class HourlyAnalyticsSummaryAdmin(admin.ModelAdmin):
+    """Admin for hourly analytics summaries."""
+    
+    list_display = ('card', 'hour', 'total_views', 'unique_views')
+    list_filter = ('hour',)
+    list_select_related = ('card',)
+    search_fields = ('card__url_slug',)
+    readonly_fields = (
+        'card', 'hour', 'total_views', 'unique_views',
+        'contact_saves', 'phone_clicks', 'email_clicks',
+        'website_clicks', 'social_clicks', 'shares',
+        'mobile_views', 'desktop_views', 'tablet_views'
+    )
+    ordering = ('-hour',)
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(UserAnalyticsSummary)
 class UserAnalyticsSummaryAdmin(admin.ModelAdmin):
     """Admin for user analytics summaries."""
@@ -80,6 +138,7 @@ class UserAnalyticsSummaryAdmin(admin.ModelAdmin):
         'user', 'total_views', 'total_unique_views',
         'total_contact_saves', 'total_interactions',
         'views_last_30_days', 'views_previous_30_days',
+        'unique_views_last_30_days', 'unique_views_last_90_days',
         'views_trend_percentage', 'last_view_at', 'updated_at'
     )
     
@@ -102,7 +161,9 @@ class OrganizationAnalyticsAdmin(admin.ModelAdmin):
     readonly_fields = (
         'organization', 'total_users', 'active_users',
         'total_cards', 'active_cards', 'total_views',
-        'views_last_30_days', 'top_cards', 'updated_at'
+        'views_last_30_days', 'total_unique_views',
+        'unique_views_last_30_days', 'unique_views_last_90_days',
+        'top_cards', 'updated_at'
     )
     
     def has_add_permission(self, request):
@@ -0,0 +1,110 @@
+"""
+Dimension tables for analytics events.
+
+User agent, referrer and location strings repeat across a great many
+events, so each distinct value is stored once in UserAgent, Referrer or
+Location and events point at it with a small integer key. ``resolve``
+interns the values pending on a batch of unsaved events: keys are looked
+up in a per-process cache, then with one query per table, and values
+seen for the first time are inserted in bulk. An empty value is stored
+as a NULL key.
+"""
+
+import threading
+
+from django.db import transaction
+
+from .models import Location, Referrer, UserAgent
+
+
+# Entries kept per table before the cache is cleared
+CACHE_SIZE = 10000
+
+# ProfileAnalytics foreign key, dimension table, table column -> decoded attribute
+DIMENSIONS = (
+    ('agent', UserAgent, {'value': 'user_agent'}),
+    ('source', Referrer, {'url': 'referrer'}),
+    ('location', Location, {'country': 'country', 'city': 'city'}),
+)
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def clear_cache():
+    """Forget every cached dimension key."""
+    with _lock:
+        _cache.clear()
+
+
+def resolve(events):
+    """
+    Set the dimension foreign keys of ``events`` from the decoded values
+    passed to their constructors (``user_agent``, ``referrer``,
+    ``country``, ``city``), creating dimension rows as needed.
+    """
+    pending = [event for event in events if event.__dict__.get('_pending_dimensions')]
+    if not pending:
+        return
+
+    for field, model, columns in DIMENSIONS:
+        wanted = []
+        for event in pending:
+            values = event.__dict__['_pending_dimensions']
+            if not any(attr in values for attr in columns.values()):
+                continue
+            key = tuple(
+                (getattr(event, attr) or '')[:model._meta.get_field(column).max_length]
+                for column, attr in columns.items()
+            )
+            wanted.append((event, key if any(key) else None))
+
+        ids = _ids(model, tuple(columns), {key for _, key in wanted if key})
+        for event, key in wanted:
+            setattr(event, f'{field}_id', ids[key] if key else None)
+
+    for event in pending:
+        del event.__dict__['_pending_dimensions']
+
+
+def _ids(model, columns, keys):
+    """Map each key (a tuple of column values) to its row id in ``model``."""
+    with _lock:
+        cache = _cache.setdefault(model, {})
+        ids = {key: cache[key] for key in keys if key in cache}
+
+    missing = keys - ids.keys()
+    if missing:
+        found = _select(model, columns, missing)
+        new = missing - found.keys()
+        if new:
+            model.objects.bulk_create(
+                [model(**dict(zip(columns, key))) for key in new],
+                ignore_conflicts=True
+            )
+            found.update(_select(model, columns, new))
+        ids.update(found)
+        # Rows created in a transaction that rolls back must not be cached
+        transaction.on_commit(lambda: _remember(model, found))
+    return ids
+
+
+def _select(model, columns, keys):
+    lookup = {
+        f'{column}__in': {key[index] for key in keys}
+        for index, column in enumerate(columns)
+    }
+    found = {}
+    for *key, pk in model.objects.filter(**lookup).values_list(*columns, 'pk'):
+        key = tuple(key)
+        if key in keys:
+            found[key] = pk
+    return found
+
+
+def _remember(model, ids):
+    with _lock:
+        cache = _cache.setdefault(model, {})
+        if len(cache) + len(ids) > CACHE_SIZE:
+            cache.clear()
+        cache.update(ids)
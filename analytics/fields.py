@@ -0,0 +1,50 @@
+"""
+Model fields for compact analytics storage.
+"""
+
+from django.db import models
+
+
+class CodeField(models.PositiveSmallIntegerField):
+    """
+    Stores a fixed set of string values as small integer codes.
+
+    ``codes`` maps each value to its code. The field reads and writes the
+    string values, so filters, ``values()`` and ``get_FOO_display`` work
+    exactly as with a CharField; only the column holds the code. Codes
+    must never be reused for a different value.
+    """
+
+    def __init__(self, *args, codes=None, **kwargs):
+        self.codes = dict(codes or {})
+        self.values_by_code = {code: value for value, code in self.codes.items()}
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['codes'] = self.codes
+        return name, path, args, kwargs
+
+    @property
+    def validators(self):
+        # The integer range validators do not apply to the string values
+        return list(self._validators)
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return self.values_by_code.get(value, value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, str):
+            return value
+        return self.values_by_code.get(int(value), value)
+
+    def get_prep_value(self, value):
+        if value is None or hasattr(value, 'resolve_expression'):
+            return value
+        value = str(value)
+        try:
+            return self.codes[value]
+        except KeyError:
+            raise ValueError(f'{self.name} has no code for {value!r}.')
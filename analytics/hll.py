@@ -0,0 +1,134 @@
+"""
+HyperLogLog sketches for approximate unique-visitor counts.
+
+A sketch estimates how many distinct values were added to it, in a few
+kilobytes at most, and two sketches merge into the sketch of the union
+of their values. DailyAnalyticsSummary keeps one sketch of the visitor
+hashes per card and day, so unique visitors over any range of days,
+cards, users or organizations are counted by merging summary rows
+rather than by a COUNT(DISTINCT) over raw events.
+
+With the default precision of 12 the standard error is about 1.6%.
+Sketches of a few hundred visitors are stored sparsely (three bytes per
+register set) and switch to the dense 4 KB form once that is smaller.
+"""
+
+import hashlib
+import math
+import struct
+
+
+PRECISION = 12
+
+SPARSE = 1
+DENSE = 2
+SPARSE_ENTRY = struct.Struct('>HB')
+
+
+class HyperLogLog:
+    """A HyperLogLog sketch with ``2 ** precision`` registers."""
+
+    def __init__(self, precision=PRECISION):
+        if not 4 <= precision <= 16:
+            raise ValueError('HyperLogLog precision must be between 4 and 16.')
+        self.precision = precision
+        self.size = 1 << precision
+        self.sparse = {}
+        self.registers = None   # bytearray once dense
+
+    def add(self, value):
+        """Add a string ``value`` to the sketch."""
+        digest = hashlib.blake2b(value.encode(), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        bits = 64 - self.precision
+        index = hashed >> bits
+        rank = bits - (hashed & ((1 << bits) - 1)).bit_length() + 1
+        self._set(index, rank)
+
+    def update(self, other):
+        """Merge ``other`` into this sketch."""
+        if other.precision != self.precision:
+            raise ValueError('Cannot merge HyperLogLog sketches of different precision.')
+        if other.registers is not None:
+            if self.registers is None:
+                self._densify()
+            self.registers = bytearray(map(max, self.registers, other.registers))
+        else:
+            for index, rank in other.sparse.items():
+                self._set(index, rank)
+
+    def count(self):
+        """Estimate the number of distinct values added."""
+        if self.registers is not None:
+            ranks = self.registers
+            zeros = ranks.count(0)
+        else:
+            ranks = self.sparse.values()
+            zeros = self.size - len(self.sparse)
+        total = zeros + sum(2.0 ** -rank for rank in ranks if rank)
+
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size * self.size / total
+        if estimate <= 2.5 * self.size and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = self.size * math.log(self.size / zeros)
+        return round(estimate)
+
+    def __len__(self):
+        return self.count()
+
+    def to_bytes(self):
+        """Serialize the sketch; an empty sketch is ``b''``."""
+        if self.registers is not None:
+            return bytes((DENSE, self.precision)) + bytes(self.registers)
+        if not self.sparse:
+            return b''
+        return bytes((SPARSE, self.precision)) + b''.join(
+            SPARSE_ENTRY.pack(index, self.sparse[index]) for index in sorted(self.sparse)
+        )
+
+    @classmethod
+    def from_bytes(cls, data, precision=PRECISION):
+        """Load a sketch written by ``to_bytes``. Raises ValueError for bad data."""
+        data = bytes(data or b'')
+        if not data:
+            return cls(precision)
+        if len(data) < 2:
+            raise ValueError('Truncated HyperLogLog sketch.')
+
+        sketch = cls(data[1])
+        if data[0] == DENSE:
+            if len(data) != 2 + sketch.size:
+                raise ValueError('Truncated HyperLogLog sketch.')
+            sketch.registers = bytearray(data[2:])
+        elif data[0] == SPARSE:
+            if (len(data) - 2) % SPARSE_ENTRY.size:
+                raise ValueError('Truncated HyperLogLog sketch.')
+            sketch.sparse = dict(SPARSE_ENTRY.iter_unpack(data[2:]))
+        else:
+            raise ValueError(f'Unknown HyperLogLog sketch format {data[0]}.')
+        return sketch
+
+    def _set(self, index, rank):
+        if self.registers is not None:
+            if rank > self.registers[index]:
+                self.registers[index] = rank
+        elif rank > self.sparse.get(index, 0):
+            self.sparse[index] = rank
+            if len(self.sparse) * SPARSE_ENTRY.size > self.size:
+                self._densify()
+
+    def _densify(self):
+        self.registers = bytearray(self.size)
+        for index, rank in self.sparse.items():
+            self.registers[index] = rank
+        self.sparse = {}
+
+
+def merge(sketches, precision=PRECISION):
+    """Merge an iterable of serialized sketches into one HyperLogLog."""
+    merged = HyperLogLog(precision)
+    for data in sketches:
+        if data:
+            merged.update(HyperLogLog.from_bytes(data))
+    return merged
@@ -0,0 +1,366 @@
+"""
+Analytics event ingestion.
+
+Views hand interaction events to ``record_event``; the configured sink
+decides when they reach the database. The default sink buffers events
+in-process and writes them with ``bulk_create`` once the buffer fills up,
+after a flush interval, and when the worker shuts down, so profile pages
+never wait on analytics writes. Every write also adds the events to the
+live counters (``live.apply``) in the same transaction.
+
+Sinks (``ANALYTICS_EVENT_SINK``):
+- ``BufferedEventSink``: in-memory buffer per worker process. A batch
+  that fails to write is spooled for ``flush_analytics`` instead.
+- ``SpoolEventSink``: append-only spool file per worker process; survives
+  crashes and is drained by ``manage.py flush_analytics``.
+- ``SyncEventSink``: writes every event immediately (tests, debugging).
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections, transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import dimensions, live
+from .models import DrainedSpool, ProfileAnalytics, RollupCheckpoint
+
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# REQUEST HELPERS
+# =============================================================================
+
+def get_client_ip(request):
+    """Get client IP address, honouring the first X-Forwarded-For hop."""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '0.0.0.0')
+
+
+def hash_ip(ip):
+    """Hash an IP address for privacy-preserving unique visitor counting."""
+    return hashlib.sha256(ip.encode()).hexdigest()[:32]
+
+
+def detect_device_type(user_agent):
+    """Detect device type from user agent."""
+    user_agent = user_agent.lower()
+    if 'mobile' in user_agent or 'android' in user_agent and 'mobile' in user_agent:
+        return 'MOBILE'
+    elif 'tablet' in user_agent or 'ipad' in user_agent:
+        return 'TABLET'
+    elif 'windows' in user_agent or 'macintosh' in user_agent or 'linux' in user_agent:
+        return 'DESKTOP'
+    return 'OTHER'
+
+
+def build_event(card, interaction_type, request, metadata=None, referrer=''):
+    """
+    Build an unsaved ProfileAnalytics event from a request.
+    Raises ValueError for unknown interaction types.
+    """
+    if interaction_type not in ProfileAnalytics.InteractionType.values:
+        raise ValueError(f'Unknown interaction type: {interaction_type}')
+
+    user_agent = request.META.get('HTTP_USER_AGENT', '')[:255]
+    return ProfileAnalytics(
+        card_id=getattr(card, 'pk', card),
+        interaction_type=interaction_type,
+        metadata=metadata or {},
+        visitor_ip_hash=hash_ip(get_client_ip(request)),
+        user_agent=user_agent,
+        referrer=(referrer or '')[:200],
+        device_type=detect_device_type(user_agent),
+        timestamp=timezone.now(),
+    )
+
+
+# =============================================================================
+# SINKS
+# =============================================================================
+
+class SyncEventSink:
+    """Write each event as soon as it is recorded."""
+
+    def record(self, event):
+        with transaction.atomic():
+            event.save()
+            live.apply([event])
+
+    def flush(self):
+        return 0
+
+
+class BufferedEventSink:
+    """
+    Buffer events in memory and write them in batches.
+
+    A batch is written when ``ANALYTICS_BUFFER_SIZE`` events are pending,
+    every ``ANALYTICS_FLUSH_INTERVAL`` seconds by a background thread, and
+    at interpreter exit.
+    """
+
+    def __init__(self):
+        self.max_size = settings.ANALYTICS_BUFFER_SIZE
+        self.interval = settings.ANALYTICS_FLUSH_INTERVAL
+        self.lock = threading.Lock()
+        self.pending = []
+        self.flusher = None
+        atexit.register(self.flush)
+
+    def record(self, event):
+        with self.lock:
+            self.pending.append(event)
+            full = len(self.pending) >= self.max_size
+        self.start_flusher()
+        if full:
+            self.flush()
+
+    def take(self):
+        with self.lock:
+            events, self.pending = self.pending, []
+        return events
+
+    def flush(self):
+        events = self.take()
+        if events:
+            self.write(events)
+        return len(events)
+
+    def write(self, events):
+        # Encoded first: once resolved, the values are only read back from the database
+        records = [SpoolEventSink.encode(event) for event in events]
+        try:
+            dimensions.resolve(events)
+            with transaction.atomic():
+                ProfileAnalytics.objects.bulk_create(events, batch_size=self.max_size)
+                live.apply(events)
+        except Exception:
+            logger.exception('Failed to write %d analytics events; spooling them', len(events))
+            spill(records)
+
+    def start_flusher(self):
+        if self.flusher is not None and self.flusher.is_alive():
+            return
+        self.flusher = threading.Thread(
+            target=self.run_flusher, name='analytics-flusher', daemon=True
+        )
+        self.flusher.start()
+
+    def run_flusher(self):
+        while True:
+            time.sleep(self.interval)
+            if self.pending:
+                self.flush()
+                close_old_connections()
+
+
+class SpoolEventSink(BufferedEventSink):
+    """
+    Append events to a per-process spool file before writing them.
+
+    Events survive a worker crash: spool files left behind by dead
+    processes are drained by ``manage.py flush_analytics``.
+    """
+
+    FIELDS = (
+        'interaction_type', 'metadata', 'visitor_ip_hash', 'user_agent',
+        'referrer', 'country', 'city', 'device_type',
+    )
+
+    def __init__(self):
+        super().__init__()
+        self.directory = Path(settings.ANALYTICS_SPOOL_DIR)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def path(self):
+        # Resolved per call so forked workers never share a parent's file
+        return spool_path(self.directory, os.getpid())
+
+    def record(self, event):
+        line = json.dumps(self.encode(event))
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as spool:
+                spool.write(line + '\n')
+            self.pending.append(event)
+            full = len(self.pending) >= self.max_size
+        self.start_flusher()
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            if not self.pending:
+                return 0
+            draining = self.path.with_name(f'events-{uuid.uuid4().hex}.draining')
+            self.path.rename(draining)
+            self.pending = []
+        return drain_spool(draining)
+
+    @classmethod
+    def encode(cls, event):
+        data = {name: getattr(event, name) for name in cls.FIELDS}
+        data['card_id'] = str(event.card_id)
+        data['timestamp'] = event.timestamp.isoformat()
+        return data
+
+    @classmethod
+    def decode(cls, data):
+        # Spool files written before events were made compact carry these
+        for name in ('id', 'browser', 'os'):
+            data.pop(name, None)
+        data['timestamp'] = datetime.fromisoformat(data['timestamp'])
+        return ProfileAnalytics(**data)
+
+
+def spool_path(directory, pid):
+    return Path(directory) / f'events-{pid}.jsonl'
+
+
+def spill(records):
+    """
+    Save events whose write failed, encoded by ``SpoolEventSink.encode``,
+    as a spool file that ``flush_analytics`` drains later. They are only
+    lost if that fails too.
+    """
+    directory = Path(settings.ANALYTICS_SPOOL_DIR)
+    name = f'events-{uuid.uuid4().hex}'
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        # Written under another suffix first so no drain reads half a file
+        partial = directory / f'{name}.partial'
+        with open(partial, 'w', encoding='utf-8') as spool:
+            for record in records:
+                spool.write(json.dumps(record) + '\n')
+        partial.rename(directory / f'{name}.draining')
+    except Exception:
+        logger.exception('Dropped %d analytics events that could not be spooled', len(records))
+
+
+def drain_spool(path):
+    """
+    Write every event in a spool file to the database and remove the file.
+    A file whose events were written by an earlier or concurrent drain is
+    only removed. The file is kept if the write fails so it can be retried.
+
+    The DrainedSpool marker outlives the file (``purge_drained_spools``
+    removes it later): a drain that read the file just before another one
+    removed it must still find the marker.
+
+    Events older than the rollup's overlap window move its checkpoint back
+    (see ``rewind_rollup``), so the next incremental rollup folds them in.
+    """
+    path = Path(path)
+    if path.suffix == '.jsonl':
+        # Give the file a name no other drain or process will reuse
+        draining = path.with_name(f'events-{uuid.uuid4().hex}.draining')
+        path.rename(draining)
+        path = draining
+
+    with open(path, encoding='utf-8') as spool:
+        events = [SpoolEventSink.decode(json.loads(line)) for line in spool if line.strip()]
+    try:
+        # Outside the transaction: a rollback would leave rolled-back
+        # dimension keys in the per-process cache
+        dimensions.resolve(events)
+        with transaction.atomic():
+            _, created = DrainedSpool.objects.get_or_create(name=path.name)
+            if created:
+                ProfileAnalytics.objects.bulk_create(
+                    events, batch_size=settings.ANALYTICS_BUFFER_SIZE
+                )
+                live.apply(events)
+                rewind_rollup(events)
+    except Exception:
+        logger.exception('Failed to drain analytics spool %s', path)
+        return 0
+    path.unlink(missing_ok=True)
+    return len(events) if created else 0
+
+
+def purge_drained_spools(now=None):
+    """
+    Delete DrainedSpool markers older than ANALYTICS_SPOOL_MARKER_DAYS,
+    long after any drain that could still hold their file has finished.
+    Returns the number deleted.
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=settings.ANALYTICS_SPOOL_MARKER_DAYS)
+    deleted, _ = DrainedSpool.objects.filter(drained_at__lt=cutoff).delete()
+    return deleted
+
+
+def rewind_rollup(events):
+    """
+    Move the incremental rollup's checkpoint back to the earliest of
+    ``events`` when the rollup has already passed it by more than
+    ANALYTICS_ROLLUP_OVERLAP_SECONDS and would otherwise never re-read it.
+    """
+    from .rollup import CHECKPOINT_NAME
+
+    if not events:
+        return
+    earliest = min(event.timestamp for event in events)
+    overlap = timedelta(seconds=settings.ANALYTICS_ROLLUP_OVERLAP_SECONDS)
+    RollupCheckpoint.objects.filter(
+        name=CHECKPOINT_NAME, last_timestamp__gt=earliest + overlap
+    ).update(last_timestamp=earliest)
+
+
+# =============================================================================
+# PUBLIC API
+# =============================================================================
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def get_sink():
+    """Return the process-wide sink configured by ANALYTICS_EVENT_SINK."""
+    global _sink
+    if _sink is None:
+        with _sink_lock:
+            if _sink is None:
+                _sink = import_string(settings.ANALYTICS_EVENT_SINK)()
+    return _sink
+
+
+@receiver(setting_changed)
+def reset_sink(setting, **kwargs):
+    global _sink
+    if setting.startswith('ANALYTICS_'):
+        if _sink is not None:
+            _sink.flush()
+        _sink = None
+
+
+def record_event(card, interaction_type, request, metadata=None, referrer=''):
+    """
+    Record an interaction with ``card`` (an NFCCard or its primary key).
+    Raises ValueError for unknown interaction types.
+    """
+    event = build_event(card, interaction_type, request, metadata, referrer)
+    get_sink().record(event)
+    return event
+
+
+def flush():
+    """Write any buffered events now. Returns the number written."""
+    return get_sink().flush()
@@ -0,0 +1,194 @@
+"""
+Live per-hour analytics counters.
+
+Every batch of events written by the sinks in analytics/ingest.py is
+also counted here, per card, hour and HourlyAnalyticsSummary column, so
+same-day numbers do not wait for a rollup. ``apply`` adds a batch's
+counts to the hourly rows for their hours with F() increments, in the
+transaction that inserts the events: the counts are committed exactly
+when the events are, and a batch that fails to write counts nothing.
+
+An hour stays live until ANALYTICS_LIVE_GRACE_SECONDS after it ends
+(see ``finalized_before``). From then on the rollup owns its hourly rows
+and recomputes them exactly from the raw events, and counts for it are
+no longer added on top. Live hours carry no unique view counts until
+they are finalized.
+
+``today`` reports the current day's numbers from the hourly rows,
+without reading raw events.
+
+The same write adds each card's counts to its all-time totals on NFCCard
+(``total_views`` and the other COUNTER_FIELDS), whatever the hour, so
+``view_count`` and the dashboards read a column instead of counting
+events. ``rebuild_card_counters`` recomputes the totals from the events
+and is safe to run while events are being written (see there).
+"""
+
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from cards.models import NFCCard
+from .models import HourlyAnalyticsSummary, ProfileAnalytics
+
+
+# Interaction type -> HourlyAnalyticsSummary column
+INTERACTION_COLUMNS = {
+    'VIEW': 'total_views',
+    'CONTACT_SAVE': 'contact_saves',
+    'PHONE_CLICK': 'phone_clicks',
+    'EMAIL_CLICK': 'email_clicks',
+    'WEBSITE_CLICK': 'website_clicks',
+    'SOCIAL_CLICK': 'social_clicks',
+    'SHARE': 'shares',
+}
+
+# Device type of a view -> HourlyAnalyticsSummary column
+DEVICE_COLUMNS = {
+    'MOBILE': 'mobile_views',
+    'DESKTOP': 'desktop_views',
+    'TABLET': 'tablet_views',
+}
+
+COLUMNS = [*INTERACTION_COLUMNS.values(), *DEVICE_COLUMNS.values()]
+
+# Interaction type -> NFCCard counter column
+CARD_COLUMNS = {
+    **INTERACTION_COLUMNS,
+    'QR_DOWNLOAD': 'qr_downloads',
+    'CUSTOM_LINK_CLICK': 'custom_link_clicks',
+}
+
+# Cards updated per bulk_update by rebuild_card_counters
+REBUILD_BATCH_SIZE = 1000
+
+
+def hour_start(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def finalized_before(now=None):
+    """Hours starting before this moment are no longer live; the rollup owns them."""
+    now = now or timezone.now()
+    return hour_start(now - timedelta(seconds=settings.ANALYTICS_LIVE_GRACE_SECONDS))
+
+
+def count(events):
+    """
+    Count ``events`` per (card, hour) in HourlyAnalyticsSummary columns and
+    per card in NFCCard counter columns. Returns (hourly, totals).
+    """
+    hourly = defaultdict(Counter)
+    totals = defaultdict(Counter)
+    for event in events:
+        card_column = CARD_COLUMNS.get(event.interaction_type)
+        if card_column is None:
+            continue
+        # Spooled events carry the id as a string
+        card_id = NFCCard._meta.pk.to_python(event.card_id)
+        totals[card_id][card_column] += 1
+        column = INTERACTION_COLUMNS.get(event.interaction_type)
+        if column is not None:
+            counts = hourly[(card_id, hour_start(event.timestamp))]
+            counts[column] += 1
+            if event.interaction_type == 'VIEW' and event.device_type in DEVICE_COLUMNS:
+                counts[DEVICE_COLUMNS[event.device_type]] += 1
+    return hourly, totals
+
+
+def apply(events):
+    """
+    Add the counts of ``events`` to the hourly rows of live hours and to
+    the card totals. Call it in the transaction that inserts the events.
+    """
+    hourly, totals = count(events)
+    boundary = finalized_before()
+    for (card_id, hour), columns in hourly.items():
+        if hour >= boundary:
+            _add_hourly(card_id, hour, columns)
+    # In primary key order, as rebuild_card_counters locks them
+    for card_id in sorted(totals):
+        NFCCard.objects.filter(pk=card_id).update(
+            **{name: F(name) + count for name, count in totals[card_id].items()}
+        )
+
+
+def _add_hourly(card_id, hour, columns):
+    summaries = HourlyAnalyticsSummary.objects.filter(card_id=card_id, hour=hour)
+    increments = {name: F(name) + count for name, count in columns.items()}
+    if summaries.update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            HourlyAnalyticsSummary.objects.create(card_id=card_id, hour=hour, **columns)
+    except IntegrityError:
+        # Another batch created the row first
+        summaries.update(**increments)
+
+
+def today(cards=None):
+    """
+    Today's totals for ``cards`` (an NFCCard queryset; None for every
+    card) as {column: count}, from the hourly rows.
+    """
+    since = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    hourly = HourlyAnalyticsSummary.objects.filter(hour__gte=since)
+    if cards is not None:
+        hourly = hourly.filter(card__in=cards)
+    return {
+        name: value or 0
+        for name, value in hourly.aggregate(**{name: Sum(name) for name in COLUMNS}).items()
+    }
+
+
+def rebuild_card_counters(cards=None):
+    """
+    Recompute the interaction totals of ``cards`` (an NFCCard queryset;
+    None for every card) from the raw events. Returns the number of
+    cards updated.
+
+    Cards are rebuilt in batches, each locked before its events are
+    counted. A batch of events committed before the lock is counted and
+    its increments are overwritten; one still being written waits for the
+    lock and adds its counts afterwards, so no event is counted twice or
+    missed while the web workers keep running.
+    """
+    cards = NFCCard.objects.all() if cards is None else cards
+    card_ids = cards.order_by('pk').values_list('pk', flat=True)
+
+    updated = 0
+    batch = []
+    for card_id in card_ids.iterator(chunk_size=REBUILD_BATCH_SIZE):
+        batch.append(card_id)
+        if len(batch) == REBUILD_BATCH_SIZE:
+            updated += _rebuild_batch(batch)
+            batch = []
+    if batch:
+        updated += _rebuild_batch(batch)
+    return updated
+
+
+def _rebuild_batch(card_ids):
+    with transaction.atomic():
+        # Not a key update, so inserting events for these cards is not blocked
+        locked = list(
+            NFCCard.objects.filter(pk__in=card_ids).order_by('pk')
+            .select_for_update(no_key=True).only('pk')
+        )
+        totals = defaultdict(dict)
+        rows = (
+            ProfileAnalytics.objects.filter(card_id__in=card_ids).order_by()
+            .values_list('card_id', 'interaction_type').annotate(count=Count('pk'))
+        )
+        for card_id, interaction_type, count in rows:
+            if interaction_type in CARD_COLUMNS:
+                totals[card_id][CARD_COLUMNS[interaction_type]] = count
+        for card in locked:
+            for name in NFCCard.COUNTER_FIELDS:
+                setattr(card, name, totals[card.pk].get(name, 0))
+        return NFCCard.objects.bulk_update(locked, NFCCard.COUNTER_FIELDS)
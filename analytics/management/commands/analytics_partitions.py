@@ -0,0 +1,82 @@
+"""
+Maintain the analytics event store: create upcoming monthly partitions
+and expire events past the retention. Run daily.
+
+Usage:
+    python manage.py analytics_partitions --convert    # PostgreSQL, once
+    python manage.py analytics_partitions
+    python manage.py analytics_partitions --retention-months 13 --action archive --dry-run
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics import partitions
+
+
+class Command(BaseCommand):
+    help = 'Create upcoming analytics partitions and expire old events.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--convert',
+            action='store_true',
+            help='Convert the event table to a monthly partitioned table first (PostgreSQL only).'
+        )
+        parser.add_argument(
+            '--ahead',
+            type=int,
+            help=f'Months of partitions to create ahead. Defaults to {settings.ANALYTICS_PARTITIONS_AHEAD}.'
+        )
+        parser.add_argument(
+            '--retention-months',
+            type=int,
+            help='Months of events to keep; 0 keeps everything. Defaults to ANALYTICS_RETENTION_MONTHS.'
+        )
+        parser.add_argument(
+            '--action',
+            choices=partitions.ACTIONS,
+            help='What to do with expired events. Defaults to ANALYTICS_RETENTION_ACTION.'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would change without changing anything.'
+        )
+
+    def handle(self, *args, **options):
+        action = options['action'] or settings.ANALYTICS_RETENTION_ACTION
+        if action not in partitions.ACTIONS:
+            raise CommandError(f'Unknown retention action "{action}".')
+        dry_run = options['dry_run']
+        prefix = 'Would' if dry_run else 'Did'
+
+        if options['convert']:
+            if not partitions.supported():
+                raise CommandError('Partitioning needs PostgreSQL; expiry works on rows instead.')
+            if partitions.is_partitioned():
+                self.stdout.write('The event table is already partitioned.')
+            elif dry_run:
+                self.stdout.write('Would convert the event table to monthly partitions.')
+            else:
+                partitions.convert(months_ahead=options['ahead'])
+                self.stdout.write(self.style.SUCCESS('Converted the event table to monthly partitions.'))
+
+        if partitions.is_partitioned():
+            for name in partitions.ensure_partitions(months_ahead=options['ahead'], dry_run=dry_run):
+                self.stdout.write(f'{prefix} create {name}')
+            expired = partitions.expire_partitions(
+                options['retention_months'], action, dry_run=dry_run
+            )
+            for name, path in expired:
+                self.stdout.write(f'{prefix} {action} {name}' + (f' -> {path}' if path else ''))
+            summary = f'{len(expired)} partitions expired.'
+        else:
+            count, path = partitions.expire_rows(
+                options['retention_months'], action, dry_run=dry_run
+            )
+            if path:
+                self.stdout.write(f'Archived to {path}')
+            summary = f'{count} events {"to expire" if dry_run else "expired"}.'
+
+        self.stdout.write(self.style.SUCCESS(summary))
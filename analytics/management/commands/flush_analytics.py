@@ -0,0 +1,48 @@
+"""
+Drain analytics spool files left behind by stopped or crashed workers,
+and batches the buffered sink could not write.
+
+Usage:
+    python manage.py flush_analytics
+"""
+
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from analytics.ingest import drain_spool, purge_drained_spools
+
+
+class Command(BaseCommand):
+    help = 'Write events from orphaned analytics spool files to the database.'
+
+    def handle(self, *args, **options):
+        directory = Path(settings.ANALYTICS_SPOOL_DIR)
+        if not directory.exists():
+            self.stdout.write('No spool directory; nothing to flush.')
+            return
+
+        written = 0
+        for path in sorted(directory.iterdir()):
+            if path.suffix == '.jsonl' and self.is_live(path):
+                continue  # Still owned by a running worker
+            if path.suffix in ('.jsonl', '.draining'):
+                written += drain_spool(path)
+        purge_drained_spools()
+
+        self.stdout.write(self.style.SUCCESS(f'Flushed {written} analytics events.'))
+
+    def is_live(self, path):
+        try:
+            pid = int(path.stem.rsplit('-', 1)[1])
+        except (IndexError, ValueError):
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
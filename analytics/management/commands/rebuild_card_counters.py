@@ -0,0 +1,40 @@
+"""
+Recompute the interaction totals stored on each NFCCard from the raw events.
+
+Usage:
+    python manage.py rebuild_card_counters
+    python manage.py rebuild_card_counters --card abc12345
+
+Events removed by ANALYTICS_RETENTION_MONTHS are no longer counted, so
+with retention on a rebuild lowers the totals to the retained window.
+
+Safe to run while the web workers keep recording events: cards are locked
+in batches while they are recounted (see analytics.live).
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.live import rebuild_card_counters
+from cards.models import NFCCard
+
+
+class Command(BaseCommand):
+    help = 'Recompute the view and interaction counters on cards from analytics events.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--card',
+            action='append',
+            dest='cards',
+            help='Only rebuild the card with this URL slug. May be repeated.'
+        )
+
+    def handle(self, *args, **options):
+        cards = None
+        if options['cards']:
+            cards = NFCCard.objects.filter(url_slug__in=options['cards'])
+            if cards.count() != len(set(options['cards'])):
+                raise CommandError('One or more card slugs do not exist.')
+
+        updated = rebuild_card_counters(cards)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt counters for {updated} cards.'))
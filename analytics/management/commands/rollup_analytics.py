@@ -0,0 +1,73 @@
+"""
+Fold raw analytics events into the summary tables.
+
+Usage:
+    python manage.py rollup_analytics
+    python manage.py rollup_analytics --start 2026-01-01 --end 2026-01-31
+    python manage.py rollup_analytics --start 2026-01-01 --card abc12345
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from analytics import rollup
+
+
+class Command(BaseCommand):
+    help = 'Roll up ProfileAnalytics events into daily, user and organization summaries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            help='Rebuild summaries from this date (YYYY-MM-DD) instead of running incrementally.'
+        )
+        parser.add_argument(
+            '--end',
+            help='Last date (YYYY-MM-DD) to rebuild. Defaults to today.'
+        )
+        parser.add_argument(
+            '--card',
+            action='append',
+            dest='cards',
+            help='Limit a rebuild to the card with this URL slug. May be repeated.'
+        )
+
+    def handle(self, *args, **options):
+        if not options['start']:
+            if options['end'] or options['cards']:
+                raise CommandError('--end and --card require --start.')
+            written = rollup.run_incremental()
+            self.stdout.write(self.style.SUCCESS(
+                f'Incremental rollup complete: {written} daily summaries updated.'
+            ))
+            return
+
+        start = self.parse_date(options['start'])
+        end = self.parse_date(options['end']) if options['end'] else timezone.now().date()
+        if end < start:
+            raise CommandError('--end must not be before --start.')
+
+        card_ids = None
+        if options['cards']:
+            from cards.models import NFCCard
+            card_ids = list(
+                NFCCard.objects.filter(url_slug__in=options['cards']).values_list('pk', flat=True)
+            )
+            if len(card_ids) != len(set(options['cards'])):
+                raise CommandError('One or more card slugs do not exist.')
+
+        try:
+            written = rollup.rebuild_range(start, end, card_ids=card_ids)
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {start} to {end}: {written} daily summaries written.'
+        ))
+
+    def parse_date(self, value):
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f'Invalid date "{value}", expected YYYY-MM-DD.')
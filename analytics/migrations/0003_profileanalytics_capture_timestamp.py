@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:47
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_rollupcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profileanalytics',
+            name='timestamp',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:40
+
+import analytics.fields
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Replace the event table with the compact ``analytics_event`` table.
+    The old table is kept as LegacyProfileAnalytics until 0005 has copied
+    its rows across.
+    """
+
+    dependencies = [
+        ('analytics', '0003_profileanalytics_capture_timestamp'),
+        ('cards', '0007_printbatch'),
+    ]
+
+    operations = [
+        # Pin the old table name so the rename below leaves the table alone
+        migrations.AlterModelTable(
+            name='profileanalytics',
+            table='analytics_profileanalytics',
+        ),
+        migrations.RenameModel(
+            old_name='ProfileAnalytics',
+            new_name='LegacyProfileAnalytics',
+        ),
+        migrations.AlterField(
+            model_name='legacyprofileanalytics',
+            name='card',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cards.nfccard'),
+        ),
+        migrations.CreateModel(
+            name='UserAgent',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('value', models.CharField(max_length=255, unique=True)),
+                ('browser', models.CharField(blank=True, max_length=50)),
+                ('os', models.CharField(blank=True, max_length=50)),
+            ],
+            options={
+                'verbose_name': 'user agent',
+                'verbose_name_plural': 'user agents',
+            },
+        ),
+        migrations.CreateModel(
+            name='Referrer',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('url', models.CharField(max_length=200, unique=True)),
+            ],
+            options={
+                'verbose_name': 'referrer',
+                'verbose_name_plural': 'referrers',
+            },
+        ),
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('country', models.CharField(blank=True, max_length=100)),
+                ('city', models.CharField(blank=True, max_length=100)),
+            ],
+            options={
+                'verbose_name': 'location',
+                'verbose_name_plural': 'locations',
+                'unique_together': {('country', 'city')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ProfileAnalytics',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('interaction_type', analytics.fields.CodeField(choices=[('VIEW', 'Profile View'), ('CONTACT_SAVE', 'Save Contact'), ('PHONE_CLICK', 'Phone Click'), ('EMAIL_CLICK', 'Email Click'), ('WEBSITE_CLICK', 'Website Click'), ('SOCIAL_CLICK', 'Social Link Click'), ('SHARE', 'Profile Share'), ('QR_DOWNLOAD', 'QR Code Download'), ('CUSTOM_LINK_CLICK', 'Custom Link Click')], codes={'CONTACT_SAVE': 2, 'CUSTOM_LINK_CLICK': 9, 'EMAIL_CLICK': 4, 'PHONE_CLICK': 3, 'QR_DOWNLOAD': 8, 'SHARE': 7, 'SOCIAL_CLICK': 6, 'VIEW': 1, 'WEBSITE_CLICK': 5}, default='VIEW')),
+                ('metadata', models.JSONField(blank=True, default=dict, help_text='Additional interaction data (e.g., which social link was clicked)')),
+                ('visitor_ip_hash', models.CharField(blank=True, help_text='Hashed IP address for unique visitor counting', max_length=64)),
+                ('device_type', analytics.fields.CodeField(choices=[('MOBILE', 'Mobile'), ('TABLET', 'Tablet'), ('DESKTOP', 'Desktop'), ('OTHER', 'Other')], codes={'DESKTOP': 3, 'MOBILE': 1, 'OTHER': 0, 'TABLET': 2}, default='OTHER')),
+                ('timestamp', models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False)),
+                ('agent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='analytics.useragent')),
+                ('card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analytics', to='cards.nfccard')),
+                ('location', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='analytics.location')),
+                ('source', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='analytics.referrer')),
+            ],
+            options={
+                'verbose_name': 'profile analytics',
+                'verbose_name_plural': 'profile analytics',
+                'db_table': 'analytics_event',
+                'ordering': ['-timestamp'],
+                'indexes': [models.Index(fields=['card', 'interaction_type'], name='analytics_event_card_type_idx'), models.Index(fields=['card', 'timestamp'], name='analytics_event_card_time_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DrainedSpool',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('drained_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'drained spool',
+                'verbose_name_plural': 'drained spools',
+            },
+        ),
+    ]
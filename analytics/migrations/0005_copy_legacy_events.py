@@ -0,0 +1,232 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:40
+
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import migrations, transaction
+
+
+# Events copied per transaction. Each chunk is deleted from the old table
+# as it is copied, so an interrupted migration resumes where it stopped.
+CHUNK_SIZE = 5000
+
+LEGACY_COLUMNS = (
+    'id', 'card_id', 'interaction_type', 'metadata', 'visitor_ip_hash',
+    'user_agent', 'referrer', 'country', 'city', 'device_type', 'browser',
+    'os', 'timestamp',
+)
+
+
+def intern(model, columns, rows, using):
+    """
+    Map each of ``rows`` (a dict of key tuple -> extra column values) to
+    its id in the dimension table ``model``, creating missing rows.
+    """
+    keys = {key for key in rows if any(key)}
+    if not keys:
+        return {}
+
+    def select():
+        lookup = {
+            f'{column}__in': {key[index] for key in keys}
+            for index, column in enumerate(columns)
+        }
+        return {
+            tuple(row[:-1]): row[-1]
+            for row in model.objects.using(using).filter(**lookup).values_list(*columns, 'pk')
+            if tuple(row[:-1]) in keys
+        }
+
+    found = select()
+    new = keys - found.keys()
+    if new:
+        model.objects.using(using).bulk_create(
+            [model(**dict(zip(columns, key)), **rows[key]) for key in new],
+            ignore_conflicts=True
+        )
+        found = select()
+    return found
+
+
+# Fixed names: the SQL below must not follow later changes to the models
+LEGACY_TABLE = 'analytics_profileanalytics'
+TABLE = 'analytics_event'
+# Monthly partitions created past the current month; later months are
+# added by `manage.py analytics_partitions` (the default partition holds
+# anything in between)
+MONTHS_AHEAD = 3
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_like_legacy(apps, schema_editor):
+    """
+    If the old table was partitioned (``analytics_partitions --convert``),
+    partition the new one too before events are copied into it, with
+    monthly partitions from the oldest old event on. The new table is
+    still empty, so it is recreated rather than converted.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    qn = connection.ops.quote_name
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute('SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)', [LEGACY_TABLE])
+        row = cursor.fetchone()
+        if not row or row[0] != 'p':
+            return
+        cursor.execute(f'SELECT MIN("timestamp") FROM {qn(LEGACY_TABLE)}')
+        oldest = cursor.fetchone()[0]
+
+        cursor.execute(
+            'SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint '
+            'WHERE conrelid = to_regclass(%s)',
+            [TABLE]
+        )
+        constraints = cursor.fetchall()
+        primary_key = next(name for name, kind, _ in constraints if kind == 'p')
+        foreign_keys = [(name, definition) for name, kind, definition in constraints if kind == 'f']
+        cursor.execute(
+            'SELECT indexname, indexdef FROM pg_indexes '
+            'WHERE schemaname = current_schema() AND tablename = %s AND indexname <> %s',
+            [TABLE, primary_key]
+        )
+        indexes = cursor.fetchall()
+
+        # Free the table, key and index names for the partitioned table
+        unpartitioned = f'{TABLE}_unpartitioned'
+        cursor.execute(f'ALTER TABLE {qn(TABLE)} RENAME TO {qn(unpartitioned)}')
+        cursor.execute(f'ALTER TABLE {qn(unpartitioned)} DROP CONSTRAINT {qn(primary_key)}')
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {qn(name)}')
+
+        cursor.execute(
+            f'CREATE TABLE {qn(TABLE)} (LIKE {qn(unpartitioned)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE ("timestamp")'
+        )
+        cursor.execute(
+            f'ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(primary_key)} PRIMARY KEY (id, "timestamp")'
+        )
+        # LIKE does not copy the identity column; a plain sequence takes
+        # over the identity's name once the old table is dropped
+        sequence = f'{TABLE}_id_partitioned_seq'
+        cursor.execute(f'CREATE SEQUENCE {qn(sequence)} OWNED BY {qn(TABLE)}.id')
+        cursor.execute(f'ALTER TABLE {qn(TABLE)} ALTER COLUMN id SET DEFAULT nextval(%s)', [sequence])
+        for _, definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(name)} {definition}')
+
+        cursor.execute(f'CREATE TABLE {qn(TABLE + "_default")} PARTITION OF {qn(TABLE)} DEFAULT')
+        now = datetime.now(dt_timezone.utc)
+        month = (oldest or now).astimezone(dt_timezone.utc)
+        month = datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+        last = add_months(datetime(now.year, now.month, 1, tzinfo=dt_timezone.utc), MONTHS_AHEAD)
+        while month <= last:
+            cursor.execute(
+                f'CREATE TABLE {qn(f"{TABLE}_p{month.year:04d}_{month.month:02d}")} '
+                f'PARTITION OF {qn(TABLE)} FOR VALUES FROM (%s) TO (%s)',
+                [month, add_months(month, 1)]
+            )
+            month = add_months(month, 1)
+
+        cursor.execute(f'DROP TABLE {qn(unpartitioned)}')
+        cursor.execute(f'ALTER SEQUENCE {qn(sequence)} RENAME TO {qn(TABLE + "_id_seq")}')
+
+
+def copy_events(apps, schema_editor):
+    using = schema_editor.connection.alias
+    Legacy = apps.get_model('analytics', 'LegacyProfileAnalytics')
+    Event = apps.get_model('analytics', 'ProfileAnalytics')
+    UserAgent = apps.get_model('analytics', 'UserAgent')
+    Referrer = apps.get_model('analytics', 'Referrer')
+    Location = apps.get_model('analytics', 'Location')
+    devices = Event._meta.get_field('device_type').codes
+
+    while True:
+        with transaction.atomic(using=using):
+            rows = list(
+                Legacy.objects.using(using).order_by('timestamp', 'id').values(*LEGACY_COLUMNS)[:CHUNK_SIZE]
+            )
+            if not rows:
+                break
+            for row in rows:
+                row['agent'] = (row['user_agent'][:255],)
+                row['source'] = (row['referrer'][:200],)
+                row['location'] = (row['country'], row['city'])
+
+            agents = intern(UserAgent, ('value',), {
+                row['agent']: {'browser': row['browser'], 'os': row['os']} for row in rows
+            }, using)
+            sources = intern(Referrer, ('url',), {row['source']: {} for row in rows}, using)
+            locations = intern(Location, ('country', 'city'), {row['location']: {} for row in rows}, using)
+
+            Event.objects.using(using).bulk_create([
+                Event(
+                    card_id=row['card_id'],
+                    interaction_type=row['interaction_type'],
+                    metadata=row['metadata'],
+                    visitor_ip_hash=row['visitor_ip_hash'],
+                    agent_id=agents.get(row['agent']),
+                    source_id=sources.get(row['source']),
+                    location_id=locations.get(row['location']),
+                    device_type=row['device_type'] if row['device_type'] in devices else 'OTHER',
+                    timestamp=row['timestamp'],
+                )
+                for row in rows
+            ])
+            Legacy.objects.using(using).filter(pk__in=[row['id'] for row in rows]).delete()
+
+
+def restore_events(apps, schema_editor):
+    using = schema_editor.connection.alias
+    Legacy = apps.get_model('analytics', 'LegacyProfileAnalytics')
+    Event = apps.get_model('analytics', 'ProfileAnalytics')
+
+    while True:
+        with transaction.atomic(using=using):
+            events = list(
+                Event.objects.using(using).order_by('id').values(
+                    'id', 'card_id', 'interaction_type', 'metadata', 'visitor_ip_hash',
+                    'agent__value', 'agent__browser', 'agent__os', 'source__url',
+                    'location__country', 'location__city', 'device_type', 'timestamp',
+                )[:CHUNK_SIZE]
+            )
+            if not events:
+                break
+            Legacy.objects.using(using).bulk_create([
+                Legacy(
+                    card_id=event['card_id'],
+                    interaction_type=event['interaction_type'],
+                    metadata=event['metadata'],
+                    visitor_ip_hash=event['visitor_ip_hash'],
+                    user_agent=event['agent__value'] or '',
+                    referrer=event['source__url'] or '',
+                    country=event['location__country'] or '',
+                    city=event['location__city'] or '',
+                    device_type=event['device_type'],
+                    browser=event['agent__browser'] or '',
+                    os=event['agent__os'] or '',
+                    timestamp=event['timestamp'],
+                )
+                for event in events
+            ])
+            Event.objects.using(using).filter(pk__in=[event['id'] for event in events]).delete()
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('analytics', '0004_compact_events'),
+    ]
+
+    operations = [
+        # Unapplying 0004 drops the new table, partitioned or not
+        migrations.RunPython(partition_like_legacy, migrations.RunPython.noop),
+        migrations.RunPython(copy_events, restore_events),
+    ]
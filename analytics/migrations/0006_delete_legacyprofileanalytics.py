@@ -0,0 +1,16 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0005_copy_legacy_events'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='LegacyProfileAnalytics',
+        ),
+    ]
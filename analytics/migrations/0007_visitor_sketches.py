@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0006_delete_legacyprofileanalytics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyanalyticssummary',
+            name='visitor_sketch',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+        migrations.AddField(
+            model_name='organizationanalytics',
+            name='total_unique_views',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='organizationanalytics',
+            name='unique_views_last_30_days',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='organizationanalytics',
+            name='unique_views_last_90_days',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='useranalyticssummary',
+            name='unique_views_last_30_days',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='useranalyticssummary',
+            name='unique_views_last_90_days',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
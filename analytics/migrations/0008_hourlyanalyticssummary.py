@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0007_visitor_sketches'),
+        ('cards', '0007_printbatch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlyAnalyticsSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(db_index=True)),
+                ('total_views', models.PositiveIntegerField(default=0)),
+                ('unique_views', models.PositiveIntegerField(default=0)),
+                ('contact_saves', models.PositiveIntegerField(default=0)),
+                ('phone_clicks', models.PositiveIntegerField(default=0)),
+                ('email_clicks', models.PositiveIntegerField(default=0)),
+                ('website_clicks', models.PositiveIntegerField(default=0)),
+                ('social_clicks', models.PositiveIntegerField(default=0)),
+                ('shares', models.PositiveIntegerField(default=0)),
+                ('mobile_views', models.PositiveIntegerField(default=0)),
+                ('desktop_views', models.PositiveIntegerField(default=0)),
+                ('tablet_views', models.PositiveIntegerField(default=0)),
+                ('card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_summaries', to='cards.nfccard')),
+            ],
+            options={
+                'verbose_name': 'hourly analytics summary',
+                'verbose_name_plural': 'hourly analytics summaries',
+                'ordering': ['-hour'],
+                'unique_together': {('card', 'hour')},
+            },
+        ),
+    ]
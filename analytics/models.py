@@ -5,13 +5,70 @@ Provides insights for users and admins.
 
 import uuid
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from .fields import CodeField
+
+
+class UserAgent(models.Model):
+    """A distinct User-Agent string seen on profile events."""
+    
+    id = models.AutoField(primary_key=True)
+    value = models.CharField(max_length=255, unique=True)
+    browser = models.CharField(max_length=50, blank=True)
+    os = models.CharField(max_length=50, blank=True)
+    
+    class Meta:
+        verbose_name = _('user agent')
+        verbose_name_plural = _('user agents')
+    
+    def __str__(self):
+        return self.value
+
+
+class Referrer(models.Model):
+    """A distinct referring URL seen on profile events."""
+    
+    id = models.AutoField(primary_key=True)
+    url = models.CharField(max_length=200, unique=True)
+    
+    class Meta:
+        verbose_name = _('referrer')
+        verbose_name_plural = _('referrers')
+    
+    def __str__(self):
+        return self.url
+
+
+class Location(models.Model):
+    """A distinct (country, city) pair seen on profile events."""
+    
+    id = models.AutoField(primary_key=True)
+    country = models.CharField(max_length=100, blank=True)
+    city = models.CharField(max_length=100, blank=True)
+    
+    class Meta:
+        verbose_name = _('location')
+        verbose_name_plural = _('locations')
+        unique_together = ['country', 'city']
+    
+    def __str__(self):
+        return ', '.join(part for part in (self.city, self.country) if part)
+
 
 class ProfileAnalytics(models.Model):
     """
     Track individual interactions with NFC card profiles.
     Captures views, clicks, and other engagements.
+    
+    Rows are kept compact: interaction and device types are stored as
+    small integer codes, and user agent, referrer and location strings are
+    interned into the UserAgent, Referrer and Location tables (see
+    analytics/dimensions.py). The ``user_agent``, ``referrer``,
+    ``country``, ``city``, ``browser`` and ``os`` properties read the
+    decoded values, and the first four can be passed to the constructor;
+    they are interned when the event is saved.
     """
     
     class InteractionType(models.TextChoices):
@@ -25,7 +82,26 @@ class ProfileAnalytics(models.Model):
         QR_DOWNLOAD = 'QR_DOWNLOAD', _('QR Code Download')
         CUSTOM_LINK_CLICK = 'CUSTOM_LINK_CLICK', _('Custom Link Click')
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Stored codes; never renumber or reuse them
+    INTERACTION_CODES = {
+        'VIEW': 1,
+        'CONTACT_SAVE': 2,
+        'PHONE_CLICK': 3,
+        'EMAIL_CLICK': 4,
+        'WEBSITE_CLICK': 5,
+        'SOCIAL_CLICK': 6,
+        'SHARE': 7,
+        'QR_DOWNLOAD': 8,
+        'CUSTOM_LINK_CLICK': 9,
+    }
+    DEVICE_CODES = {
+        'OTHER': 0,
+        'MOBILE': 1,
+        'TABLET': 2,
+        'DESKTOP': 3,
+    }
+    
+    id = models.BigAutoField(primary_key=True)
     
     # Link to card
     card = models.ForeignKey(
@@ -35,8 +111,8 @@ class ProfileAnalytics(models.Model):
     )
     
     # Interaction details
-    interaction_type = models.CharField(
-        max_length=30,
+    interaction_type = CodeField(
+        codes=INTERACTION_CODES,
         choices=InteractionType.choices,
         default=InteractionType.VIEW
     )
@@ -54,16 +130,33 @@ class ProfileAnalytics(models.Model):
         blank=True,
         help_text=_('Hashed IP address for unique visitor counting')
     )
-    user_agent = models.CharField(max_length=255, blank=True)
-    referrer = models.URLField(blank=True)
+    agent = models.ForeignKey(
+        UserAgent,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    source = models.ForeignKey(
+        Referrer,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
     
     # Location (derived from IP, anonymized)
-    country = models.CharField(max_length=100, blank=True)
-    city = models.CharField(max_length=100, blank=True)
+    location = models.ForeignKey(
+        Location,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
     
     # Device information
-    device_type = models.CharField(
-        max_length=20,
+    device_type = CodeField(
+        codes=DEVICE_CODES,
         choices=[
             ('MOBILE', 'Mobile'),
             ('TABLET', 'Tablet'),
@@ -72,23 +165,77 @@ class ProfileAnalytics(models.Model):
         ],
         default='OTHER'
     )
-    browser = models.CharField(max_length=50, blank=True)
-    os = models.CharField(max_length=50, blank=True)
     
-    # Timestamp
-    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Timestamp (set when the event is captured, not when it is flushed)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
     
     class Meta:
         verbose_name = _('profile analytics')
         verbose_name_plural = _('profile analytics')
+        # A new name: the table it replaced may still exist as detached partitions
+        db_table = 'analytics_event'
         ordering = ['-timestamp']
         indexes = [
-            models.Index(fields=['card', 'interaction_type']),
-            models.Index(fields=['card', 'timestamp']),
+            models.Index(fields=['card', 'interaction_type'], name='analytics_event_card_type_idx'),
+            models.Index(fields=['card', 'timestamp'], name='analytics_event_card_time_idx'),
         ]
     
     def __str__(self):
         return f"{self.card.url_slug} - {self.interaction_type} - {self.timestamp}"
+    
+    def save(self, *args, **kwargs):
+        from .dimensions import resolve
+        resolve([self])
+        super().save(*args, **kwargs)
+    
+    def _dimension_value(self, name, decode):
+        pending = self.__dict__.get('_pending_dimensions')
+        if pending and name in pending:
+            return pending[name]
+        return decode()
+    
+    def _set_dimension_value(self, name, value):
+        self.__dict__.setdefault('_pending_dimensions', {})[name] = value or ''
+    
+    @property
+    def user_agent(self):
+        return self._dimension_value('user_agent', lambda: self.agent.value if self.agent_id else '')
+    
+    @user_agent.setter
+    def user_agent(self, value):
+        self._set_dimension_value('user_agent', value)
+    
+    @property
+    def referrer(self):
+        return self._dimension_value('referrer', lambda: self.source.url if self.source_id else '')
+    
+    @referrer.setter
+    def referrer(self, value):
+        self._set_dimension_value('referrer', value)
+    
+    @property
+    def country(self):
+        return self._dimension_value('country', lambda: self.location.country if self.location_id else '')
+    
+    @country.setter
+    def country(self, value):
+        self._set_dimension_value('country', value)
+    
+    @property
+    def city(self):
+        return self._dimension_value('city', lambda: self.location.city if self.location_id else '')
+    
+    @city.setter
+    def city(self, value):
+        self._set_dimension_value('city', value)
+    
+    @property
+    def browser(self):
+        return self.agent.browser if self.agent_id else ''
+    
+    @property
+    def os(self):
+        return self.agent.os if self.agent_id else ''
 
 
 class DailyAnalyticsSummary(models.Model):
@@ -110,6 +257,10 @@ class DailyAnalyticsSummary(models.Model):
     total_views = models.PositiveIntegerField(default=0)
     unique_views = models.PositiveIntegerField(default=0)
     
+    # HyperLogLog sketch of the day's visitors, merged for unique counts
+    # over longer ranges (see analytics/hll.py)
+    visitor_sketch = models.BinaryField(default=b'', blank=True, editable=False)
+    
     # Interaction counts
     contact_saves = models.PositiveIntegerField(default=0)
     phone_clicks = models.PositiveIntegerField(default=0)
@@ -159,6 +310,46 @@ class DailyAnalyticsSummary(models.Model):
         return round((self.total_interactions / self.total_views) * 100, 2)
 
 
+class HourlyAnalyticsSummary(models.Model):
+    """
+    Aggregated hourly analytics, the finest rollup tier.
+    Backs hour-granularity time series (see analytics/series.py).
+    """
+    
+    card = models.ForeignKey(
+        'cards.NFCCard',
+        on_delete=models.CASCADE,
+        related_name='hourly_summaries'
+    )
+    hour = models.DateTimeField(db_index=True)
+    
+    # View counts
+    total_views = models.PositiveIntegerField(default=0)
+    unique_views = models.PositiveIntegerField(default=0)
+    
+    # Interaction counts
+    contact_saves = models.PositiveIntegerField(default=0)
+    phone_clicks = models.PositiveIntegerField(default=0)
+    email_clicks = models.PositiveIntegerField(default=0)
+    website_clicks = models.PositiveIntegerField(default=0)
+    social_clicks = models.PositiveIntegerField(default=0)
+    shares = models.PositiveIntegerField(default=0)
+    
+    # Device breakdown
+    mobile_views = models.PositiveIntegerField(default=0)
+    desktop_views = models.PositiveIntegerField(default=0)
+    tablet_views = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = _('hourly analytics summary')
+        verbose_name_plural = _('hourly analytics summaries')
+        ordering = ['-hour']
+        unique_together = ['card', 'hour']
+    
+    def __str__(self):
+        return f"{self.card.url_slug} - {self.hour:%Y-%m-%d %H:00}"
+
+
 class UserAnalyticsSummary(models.Model):
     """
     Aggregated analytics summary for a user (across all their cards).
@@ -181,6 +372,10 @@ class UserAnalyticsSummary(models.Model):
     views_last_30_days = models.PositiveIntegerField(default=0)
     views_previous_30_days = models.PositiveIntegerField(default=0)
     
+    # Approximate unique visitors
+    unique_views_last_30_days = models.PositiveIntegerField(default=0)
+    unique_views_last_90_days = models.PositiveIntegerField(default=0)
+    
     # Trends
     views_trend_percentage = models.FloatField(default=0)
     
@@ -222,6 +417,11 @@ class OrganizationAnalytics(models.Model):
     total_views = models.PositiveIntegerField(default=0)
     views_last_30_days = models.PositiveIntegerField(default=0)
     
+    # Approximate unique visitors across the organization's cards
+    total_unique_views = models.PositiveIntegerField(default=0)
+    unique_views_last_30_days = models.PositiveIntegerField(default=0)
+    unique_views_last_90_days = models.PositiveIntegerField(default=0)
+    
     # Top performing cards
     top_cards = models.JSONField(default=list)
     
@@ -234,3 +434,41 @@ class OrganizationAnalytics(models.Model):
     
     def __str__(self):
         return f"Analytics for {self.organization.name}"
+
+
+class RollupCheckpoint(models.Model):
+    """
+    High-water mark for incremental rollups.
+    Records how far into ProfileAnalytics a rollup has folded events.
+    """
+    
+    name = models.CharField(max_length=50, primary_key=True)
+    last_timestamp = models.DateTimeField(null=True, blank=True)
+    
+    # Last updated
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = _('rollup checkpoint')
+        verbose_name_plural = _('rollup checkpoints')
+    
+    def __str__(self):
+        return f"{self.name} @ {self.last_timestamp}"
+
+
+class DrainedSpool(models.Model):
+    """
+    A spool file whose events have been written.
+    Recorded in the same transaction as the events so a drain that is
+    interrupted before the file is removed is not written twice.
+    """
+    
+    name = models.CharField(max_length=100, unique=True)
+    drained_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('drained spool')
+        verbose_name_plural = _('drained spools')
+    
+    def __str__(self):
+        return self.name
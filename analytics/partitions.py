@@ -0,0 +1,375 @@
+"""
+Partitioned event store and retention for ProfileAnalytics.
+
+On PostgreSQL the event table can be converted (``manage.py
+analytics_partitions --convert``) into a table range-partitioned by month
+on ``timestamp``, with a default partition catching anything outside the
+monthly ones. Each month is then its own table with its own small
+indexes, and expiring a month is a metadata-only DETACH instead of a
+mass DELETE that leaves the table and its indexes bloated.
+
+PostgreSQL requires the partition key in the primary key, so the
+partitioned table's key is (id, timestamp). Django keeps treating ``id``
+as the primary key; ids are drawn from one sequence, so they stay unique.
+
+``manage.py analytics_partitions`` (run daily from cron) then:
+
+- creates the partitions for the coming ANALYTICS_PARTITIONS_AHEAD months,
+  and for any month whose events landed in the default partition;
+- expires partitions older than ANALYTICS_RETENTION_MONTHS by
+  ANALYTICS_RETENTION_ACTION: ``detach`` (keep the month as a standalone
+  table), ``archive`` (write it as gzipped CSV to storage, then drop it)
+  or ``drop``.
+
+Anywhere else (SQLite, or PostgreSQL before converting), expiry works on
+rows instead: old events are archived (for ``archive`` and ``detach``)
+and deleted in batches. Queries, rollups and ingestion go through the
+parent table and work the same in both modes.
+"""
+
+import csv
+import gzip
+import io
+import json
+import re
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ProfileAnalytics
+
+
+ACTIONS = ('detach', 'archive', 'drop')
+
+DELETE_CHUNK_SIZE = 5000
+ARCHIVE_CHUNK_SIZE = 2000
+ARCHIVE_DIR = 'analytics/archive'
+
+# Archive column -> ProfileAnalytics lookup
+ARCHIVE_COLUMNS = {
+    'id': 'id',
+    'card_id': 'card_id',
+    'interaction_type': 'interaction_type',
+    'metadata': 'metadata',
+    'visitor_ip_hash': 'visitor_ip_hash',
+    'user_agent': 'agent__value',
+    'referrer': 'source__url',
+    'country': 'location__country',
+    'city': 'location__city',
+    'device_type': 'device_type',
+    'timestamp': 'timestamp',
+}
+
+TABLE = ProfileAnalytics._meta.db_table
+SEQUENCE = f'{TABLE}_id_seq'
+DEFAULT_PARTITION = f'{TABLE}_default'
+PARTITION_NAME = re.compile(rf'^{TABLE}_p(\d{{4}})_(\d{{2}})$')
+
+
+def _qn(name):
+    return connection.ops.quote_name(name)
+
+
+def supported():
+    """True when the database can partition the event table."""
+    return connection.vendor == 'postgresql'
+
+
+def is_partitioned():
+    """True when the event table is a partitioned table."""
+    if not supported():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)', [TABLE])
+        row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+# =============================================================================
+# MONTHS
+# =============================================================================
+
+def month_start(moment):
+    """The first instant (UTC) of the month containing ``moment``."""
+    moment = moment.astimezone(dt_timezone.utc)
+    return datetime(moment.year, moment.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month.year:04d}_{month.month:02d}'
+
+
+def retention_cutoff(retention_months=None, now=None):
+    """
+    Events before this instant are expired, or None when every event is
+    kept. Whole months are kept, so the cutoff is a month boundary.
+    """
+    if retention_months is None:
+        retention_months = settings.ANALYTICS_RETENTION_MONTHS
+    if not retention_months:
+        return None
+    return add_months(month_start(now or timezone.now()), -retention_months)
+
+
+def list_partitions():
+    """Map each monthly partition's first instant to its table name."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE pg_inherits.inhparent = to_regclass(%s)',
+            [TABLE]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = {}
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            month = datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc)
+            partitions[month] = name
+    return partitions
+
+
+# =============================================================================
+# CONVERSION
+# =============================================================================
+
+def convert(months_ahead=None, now=None, since=None):
+    """
+    Turn the event table into a table partitioned by month, copying every
+    existing event into its partition. Runs in one transaction holding an
+    exclusive lock on the table, so schedule it for a quiet moment.
+    Monthly partitions start from the oldest event, or from ``since``
+    when that is older (for events about to be loaded).
+    """
+    if not supported():
+        raise NotImplementedError(f'{connection.vendor} does not support table partitioning.')
+    if is_partitioned():
+        return
+
+    legacy = f'{TABLE}_unpartitioned'
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {_qn(TABLE)} IN ACCESS EXCLUSIVE MODE')
+
+        cursor.execute(
+            'SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint '
+            'WHERE conrelid = to_regclass(%s)',
+            [TABLE]
+        )
+        constraints = cursor.fetchall()
+        primary_key = next(name for name, kind, _ in constraints if kind == 'p')
+        foreign_keys = [(name, definition) for name, kind, definition in constraints if kind == 'f']
+
+        cursor.execute(
+            'SELECT indexname, indexdef FROM pg_indexes '
+            'WHERE schemaname = current_schema() AND tablename = %s AND indexname <> %s',
+            [TABLE, primary_key]
+        )
+        indexes = cursor.fetchall()
+
+        # Free the table, key and index names for the partitioned table
+        cursor.execute(f'ALTER TABLE {_qn(TABLE)} RENAME TO {_qn(legacy)}')
+        cursor.execute(f'ALTER TABLE {_qn(legacy)} DROP CONSTRAINT {_qn(primary_key)}')
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {_qn(name)}')
+
+        cursor.execute(
+            f'CREATE TABLE {_qn(TABLE)} (LIKE {_qn(legacy)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE ("timestamp")'
+        )
+        cursor.execute(
+            f'ALTER TABLE {_qn(TABLE)} ADD CONSTRAINT {_qn(primary_key)} PRIMARY KEY (id, "timestamp")'
+        )
+        # LIKE does not copy the identity column, so ids continue from a
+        # plain sequence that takes over the identity's name once it is dropped
+        sequence = f'{TABLE}_id_partitioned_seq'
+        cursor.execute(f'CREATE SEQUENCE {_qn(sequence)} OWNED BY {_qn(TABLE)}.id')
+        cursor.execute(
+            f'SELECT setval(%s, COALESCE(MAX(id), 0) + 1, false) FROM {_qn(legacy)}', [sequence]
+        )
+        cursor.execute(
+            f'ALTER TABLE {_qn(TABLE)} ALTER COLUMN id SET DEFAULT nextval(%s)', [sequence]
+        )
+        for _, definition in indexes:
+            # The definitions name the table, which is now the partitioned one
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {_qn(TABLE)} ADD CONSTRAINT {_qn(name)} {definition}')
+
+        cursor.execute(f'CREATE TABLE {_qn(DEFAULT_PARTITION)} PARTITION OF {_qn(TABLE)} DEFAULT')
+        cursor.execute(f'SELECT MIN("timestamp") FROM {_qn(legacy)}')
+        oldest = cursor.fetchone()[0]
+
+        now = now or timezone.now()
+        month = month_start(min(filter(None, (oldest, since)), default=now))
+        last = add_months(month_start(now), _months_ahead(months_ahead))
+        while month <= last:
+            _create_partition(cursor, month)
+            month = add_months(month, 1)
+
+        cursor.execute(f'INSERT INTO {_qn(TABLE)} SELECT * FROM {_qn(legacy)}')
+        cursor.execute(f'DROP TABLE {_qn(legacy)}')
+        cursor.execute(f'ALTER SEQUENCE {_qn(sequence)} RENAME TO {_qn(SEQUENCE)}')
+
+
+def _months_ahead(months_ahead):
+    return settings.ANALYTICS_PARTITIONS_AHEAD if months_ahead is None else months_ahead
+
+
+def _create_partition(cursor, month):
+    """
+    Create the partition for ``month``. Events for that month already in
+    the default partition are moved into it before it is attached, as
+    PostgreSQL refuses to attach a range the default partition has rows for.
+    """
+    name, start, end = partition_name(month), month, add_months(month, 1)
+    cursor.execute(f'LOCK TABLE {_qn(DEFAULT_PARTITION)} IN ACCESS EXCLUSIVE MODE')
+    cursor.execute(
+        f'CREATE TABLE {_qn(name)} (LIKE {_qn(TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+    )
+    cursor.execute(
+        f'WITH moved AS ('
+        f'DELETE FROM {_qn(DEFAULT_PARTITION)} WHERE "timestamp" >= %s AND "timestamp" < %s '
+        f'RETURNING *) INSERT INTO {_qn(name)} SELECT * FROM moved',
+        [start, end]
+    )
+    cursor.execute(
+        f'ALTER TABLE {_qn(TABLE)} ATTACH PARTITION {_qn(name)} FOR VALUES FROM (%s) TO (%s)',
+        [start, end]
+    )
+    return name
+
+
+# =============================================================================
+# MAINTENANCE
+# =============================================================================
+
+def ensure_partitions(months_ahead=None, now=None, dry_run=False):
+    """
+    Create missing partitions from the current month to ``months_ahead``
+    months ahead, plus any month with events in the default partition.
+    Returns the names of the partitions created.
+    """
+    current = month_start(now or timezone.now())
+    wanted = {add_months(current, offset) for offset in range(_months_ahead(months_ahead) + 1)}
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT DISTINCT date_trunc('month', \"timestamp\" AT TIME ZONE 'UTC') "
+            f'FROM {_qn(DEFAULT_PARTITION)}'
+        )
+        wanted.update(row[0].replace(tzinfo=dt_timezone.utc) for row in cursor.fetchall())
+
+    missing = sorted(wanted - set(list_partitions()))
+    if dry_run:
+        return [partition_name(month) for month in missing]
+
+    created = []
+    for month in missing:
+        with transaction.atomic(), connection.cursor() as cursor:
+            created.append(_create_partition(cursor, month))
+    return created
+
+
+def expire_partitions(retention_months=None, action=None, now=None, dry_run=False):
+    """
+    Detach, archive or drop the monthly partitions that end before the
+    retention cutoff. Returns [(partition name, archive path or None)].
+    """
+    action = action or settings.ANALYTICS_RETENTION_ACTION
+    cutoff = retention_cutoff(retention_months, now)
+    if cutoff is None:
+        return []
+
+    expired = []
+    for month, name in sorted(list_partitions().items()):
+        if add_months(month, 1) > cutoff:
+            continue
+        path = None
+        if not dry_run:
+            if action == 'archive':
+                # Archived through the parent table, while the dimensions can be joined
+                path = archive_events(
+                    ProfileAnalytics.objects.filter(
+                        timestamp__gte=month, timestamp__lt=add_months(month, 1)
+                    ),
+                    name
+                )
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f'ALTER TABLE {_qn(TABLE)} DETACH PARTITION {_qn(name)}')
+            if action in ('archive', 'drop'):
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DROP TABLE {_qn(name)}')
+        expired.append((name, path))
+    return expired
+
+
+def expire_rows(retention_months=None, action=None, now=None, dry_run=False):
+    """
+    Row-based expiry for unpartitioned tables: archive events before the
+    retention cutoff (unless ``action`` is ``drop``), then delete them in
+    batches. Returns (number of events, archive path or None).
+    """
+    action = action or settings.ANALYTICS_RETENTION_ACTION
+    cutoff = retention_cutoff(retention_months, now)
+    if cutoff is None:
+        return 0, None
+
+    old = ProfileAnalytics.objects.filter(timestamp__lt=cutoff)
+    if dry_run:
+        return old.count(), None
+
+    path = None
+    if action != 'drop':
+        # There is no table to detach a month into, so keep the rows in an archive
+        path = archive_events(old, f'{TABLE}_before_{cutoff:%Y_%m}')
+
+    deleted = 0
+    while True:
+        ids = list(old.values_list('pk', flat=True)[:DELETE_CHUNK_SIZE])
+        if not ids:
+            break
+        count, _ = ProfileAnalytics.objects.filter(pk__in=ids).delete()
+        deleted += count
+    return deleted, path
+
+
+def archive_events(events, name):
+    """
+    Write the ProfileAnalytics queryset ``events`` to gzipped CSV in
+    storage, with dimension values decoded; returns the path.
+    """
+    rows = events.order_by('timestamp').values_list(
+        *ARCHIVE_COLUMNS.values()
+    ).iterator(chunk_size=ARCHIVE_CHUNK_SIZE)
+    return _write_archive(name, list(ARCHIVE_COLUMNS), rows)
+
+
+def _write_archive(name, columns, rows):
+    """Write rows as gzipped CSV to ``ARCHIVE_DIR/<name>.csv.gz``; returns the path."""
+    with tempfile.TemporaryFile() as output:
+        with gzip.GzipFile(fileobj=output, mode='wb') as compressed:
+            text = io.TextIOWrapper(compressed, encoding='utf-8', newline='')
+            writer = csv.writer(text)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow([
+                    json.dumps(value) if isinstance(value, (dict, list)) else value
+                    for value in row
+                ])
+            text.flush()
+            text.detach()
+        output.seek(0)
+        return default_storage.save(f'{ARCHIVE_DIR}/{name}.csv.gz', File(output))
+
@@ -0,0 +1,492 @@
+"""
+Rollup engine for analytics.
+
+Folds raw ProfileAnalytics events into HourlyAnalyticsSummary and
+DailyAnalyticsSummary rows per (card, hour) and (card, day) using grouped
+SQL aggregates, then refreshes the per-user and per-organization
+summaries from the daily rows. Every affected (card, day) pair, and each
+of its hours, is recomputed from the raw events, so a rollup can be
+re-run any number of times and always converges on the same result.
+Hours that are still live are left to the live counters (see
+analytics/live.py) until they are finalized.
+
+Each daily row also keeps a HyperLogLog sketch of its visitors. Unique
+visitors over longer ranges, and across cards, users and organizations,
+are estimated by merging those sketches (``unique_visitors``) rather
+than by counting distinct visitors over the raw events.
+"""
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+from .hll import HyperLogLog, merge
+from .models import (
+    ProfileAnalytics, DailyAnalyticsSummary, HourlyAnalyticsSummary,
+    UserAnalyticsSummary, OrganizationAnalytics, RollupCheckpoint
+)
+
+
+CHECKPOINT_NAME = 'daily'
+TOP_N = 10
+TOP_CARDS = 5
+CHUNK_SIZE = 500
+
+Interaction = ProfileAnalytics.InteractionType
+IS_VIEW = Q(interaction_type=Interaction.VIEW)
+
+# DailyAnalyticsSummary column -> filter over raw events
+COUNTERS = {
+    'total_views': IS_VIEW,
+    'contact_saves': Q(interaction_type=Interaction.CONTACT_SAVE),
+    'phone_clicks': Q(interaction_type=Interaction.PHONE_CLICK),
+    'email_clicks': Q(interaction_type=Interaction.EMAIL_CLICK),
+    'website_clicks': Q(interaction_type=Interaction.WEBSITE_CLICK),
+    'social_clicks': Q(interaction_type=Interaction.SOCIAL_CLICK),
+    'shares': Q(interaction_type=Interaction.SHARE),
+    'mobile_views': IS_VIEW & Q(device_type='MOBILE'),
+    'desktop_views': IS_VIEW & Q(device_type='DESKTOP'),
+    'tablet_views': IS_VIEW & Q(device_type='TABLET'),
+}
+
+# DailyAnalyticsSummary JSON column -> ProfileAnalytics dimension
+DIMENSIONS = {
+    'top_countries': 'location__country',
+    'top_cities': 'location__city',
+    'top_referrers': 'source__url',
+}
+
+SUMMARY_FIELDS = ['unique_views', 'visitor_sketch', *COUNTERS, *DIMENSIONS]
+HOURLY_FIELDS = ['unique_views', *COUNTERS]
+
+INTERACTION_FIELDS = [
+    'contact_saves', 'phone_clicks', 'email_clicks',
+    'website_clicks', 'social_clicks', 'shares',
+]
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _day_bounds(start_date, end_date):
+    """Return aware datetimes covering [start_date, end_date] inclusive."""
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(start_date, time.min), tz)
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min), tz)
+    return start, end
+
+
+def _counters():
+    """Aggregates for the unique view count and every COUNTERS column."""
+    return {
+        'unique_views': Count(
+            'visitor_ip_hash',
+            filter=IS_VIEW & ~Q(visitor_ip_hash=''),
+            distinct=True
+        ),
+        **{name: Count('id', filter=condition) for name, condition in COUNTERS.items()},
+    }
+
+
+def _aggregate_hourly(events):
+    """Compute HourlyAnalyticsSummary rows for every (card, hour) in ``events``."""
+    return [
+        HourlyAnalyticsSummary(**row)
+        for row in events.annotate(hour=TruncHour('timestamp')).order_by().values(
+            'card_id', 'hour'
+        ).annotate(**_counters())
+    ]
+
+
+def _aggregate_daily(events):
+    """
+    Compute DailyAnalyticsSummary rows for every (card, day) in ``events``.
+    Issues one grouped query for the counters plus one per dimension.
+    """
+    by_day = events.annotate(day=TruncDate('timestamp')).order_by()
+
+    rows = {}
+    for row in by_day.values('card_id', 'day').annotate(**_counters()):
+        key = (row.pop('card_id'), row.pop('day'))
+        rows[key] = DailyAnalyticsSummary(card_id=key[0], date=key[1], **row)
+
+    sketches = defaultdict(HyperLogLog)
+    for card_id, day, visitor in by_day.filter(IS_VIEW).exclude(visitor_ip_hash='').values_list(
+        'card_id', 'day', 'visitor_ip_hash'
+    ).distinct().iterator(chunk_size=CHUNK_SIZE):
+        sketches[(card_id, day)].add(visitor)
+    for key, sketch in sketches.items():
+        rows[key].visitor_sketch = sketch.to_bytes()
+
+    for field, dimension in DIMENSIONS.items():
+        tallies = defaultdict(list)
+        # Also skips events without the dimension (a NULL key)
+        for row in by_day.filter(IS_VIEW, **{f'{dimension}__gt': ''}).values(
+            'card_id', 'day', dimension
+        ).annotate(n=Count('id')):
+            tallies[(row['card_id'], row['day'])].append((row[dimension], row['n']))
+
+        for key, values in tallies.items():
+            values.sort(key=lambda item: (-item[1], item[0]))
+            setattr(rows[key], field, dict(values[:TOP_N]))
+
+    return list(rows.values())
+
+
+def _upsert_hourly(summaries):
+    HourlyAnalyticsSummary.objects.bulk_create(
+        summaries,
+        batch_size=CHUNK_SIZE,
+        update_conflicts=True,
+        unique_fields=['card', 'hour'],
+        update_fields=HOURLY_FIELDS,
+    )
+
+
+def _upsert_daily(summaries):
+    DailyAnalyticsSummary.objects.bulk_create(
+        summaries,
+        batch_size=CHUNK_SIZE,
+        update_conflicts=True,
+        unique_fields=['card', 'date'],
+        update_fields=SUMMARY_FIELDS,
+    )
+
+
+def rollup_cards(card_ids, start_date, end_date):
+    """
+    Recompute daily summaries, and hourly ones for finalized hours, for
+    ``card_ids`` over [start_date, end_date]. Returns the number of daily
+    rows written.
+    """
+    from .live import finalized_before
+
+    start, end = _day_bounds(start_date, end_date)
+    finalized = finalized_before()
+    written = 0
+    for chunk in _chunks(card_ids):
+        events = ProfileAnalytics.objects.filter(
+            card_id__in=chunk,
+            timestamp__gte=start,
+            timestamp__lt=end
+        )
+        _upsert_hourly(_aggregate_hourly(events.filter(timestamp__lt=finalized)))
+        summaries = _aggregate_daily(events)
+        _upsert_daily(summaries)
+        written += len(summaries)
+    return written
+
+
+def rebuild_range(start_date, end_date, card_ids=None):
+    """
+    Rebuild daily summaries for a date range from scratch.
+
+    Existing rows in the range are replaced, so days whose events have
+    since been removed drop out. Pass ``card_ids`` to limit the rebuild.
+    Raises ValueError for a range reaching back past the event retention,
+    whose summaries could no longer be rebuilt.
+    """
+    from .live import finalized_before
+    from .partitions import retention_cutoff
+
+    start, end = _day_bounds(start_date, end_date)
+    cutoff = retention_cutoff()
+    if cutoff and start < cutoff:
+        raise ValueError(
+            f'Events before {cutoff:%Y-%m-%d} have been expired; '
+            f'summaries before that date cannot be rebuilt.'
+        )
+    events = ProfileAnalytics.objects.filter(timestamp__gte=start, timestamp__lt=end)
+    stale = DailyAnalyticsSummary.objects.filter(date__gte=start_date, date__lte=end_date)
+    stale_hours = HourlyAnalyticsSummary.objects.filter(
+        hour__gte=start, hour__lt=min(end, finalized_before())
+    )
+    if card_ids is not None:
+        events = events.filter(card_id__in=card_ids)
+        stale = stale.filter(card_id__in=card_ids)
+        stale_hours = stale_hours.filter(card_id__in=card_ids)
+
+    with transaction.atomic():
+        affected = set(stale.values_list('card_id', flat=True))
+        affected.update(events.values_list('card_id', flat=True).distinct())
+        stale.delete()
+        stale_hours.delete()
+        written = rollup_cards(affected, start_date, end_date)
+        refresh_summaries(affected)
+    return written
+
+
+def run_incremental(now=None):
+    """
+    Fold events recorded since the last run into the summary tables.
+
+    Events are selected by ``timestamp`` above the stored high-water mark,
+    re-reading an overlap window so late-arriving events are not missed,
+    and every hour that was still live at the last run so it is finalized.
+    Returns the number of daily summary rows written.
+    """
+    from .live import finalized_before
+
+    now = now or timezone.now()
+    overlap = timedelta(seconds=settings.ANALYTICS_ROLLUP_OVERLAP_SECONDS)
+
+    with transaction.atomic():
+        checkpoint, _ = RollupCheckpoint.objects.select_for_update().get_or_create(
+            name=CHECKPOINT_NAME
+        )
+        events = ProfileAnalytics.objects.filter(timestamp__lte=now)
+        if checkpoint.last_timestamp:
+            events = events.filter(timestamp__gte=min(
+                checkpoint.last_timestamp - overlap,
+                finalized_before(checkpoint.last_timestamp)
+            ))
+
+        dirty = events.annotate(day=TruncDate('timestamp')).order_by().values_list(
+            'card_id', 'day'
+        ).distinct()
+        cards_by_day = defaultdict(set)
+        for card_id, day in dirty:
+            cards_by_day[day].add(card_id)
+
+        written = 0
+        for day, card_ids in sorted(cards_by_day.items()):
+            written += rollup_cards(card_ids, day, day)
+
+        affected = set().union(*cards_by_day.values()) if cards_by_day else set()
+        refresh_summaries(affected)
+
+        checkpoint.last_timestamp = now
+        checkpoint.save()
+    return written
+
+
+def refresh_summaries(card_ids):
+    """Refresh user and organization summaries touched by ``card_ids``."""
+    from cards.models import NFCCard
+
+    user_ids, org_ids = set(), set()
+    for chunk in _chunks(card_ids):
+        for user_id, org_id in NFCCard.objects.filter(
+            pk__in=chunk, user__isnull=False
+        ).values_list('user_id', 'user__organization_id'):
+            user_ids.add(user_id)
+            if org_id:
+                org_ids.add(org_id)
+
+    refresh_user_summaries(user_ids)
+    refresh_organization_summaries(org_ids)
+
+
+def _interaction_total():
+    expression = F(INTERACTION_FIELDS[0])
+    for name in INTERACTION_FIELDS[1:]:
+        expression = expression + F(name)
+    return expression
+
+
+def _period_bounds():
+    today = timezone.now().date()
+    current_start = today - timedelta(days=30)
+    previous_start = today - timedelta(days=60)
+    return current_start, previous_start
+
+
+def unique_visitors(summaries):
+    """Estimate the unique visitors across a DailyAnalyticsSummary queryset."""
+    return merge(
+        summaries.order_by().values_list('visitor_sketch', flat=True).iterator(chunk_size=CHUNK_SIZE)
+    ).count()
+
+
+def _unique_visitors_by(summaries, group):
+    """
+    Estimate unique visitors per value of ``group`` in ``summaries``:
+    {value: {'total': n, 30: n, 90: n}}, the numbers being all time and
+    the last 30 and 90 days.
+    """
+    today = timezone.now().date()
+    windows = {'total': None, 30: today - timedelta(days=30), 90: today - timedelta(days=90)}
+
+    merged = defaultdict(lambda: {name: HyperLogLog() for name in windows})
+    for key, day, data in summaries.order_by().values_list(
+        group, 'date', 'visitor_sketch'
+    ).iterator(chunk_size=CHUNK_SIZE):
+        if not data:
+            continue
+        sketch = HyperLogLog.from_bytes(data)
+        for name, since in windows.items():
+            if since is None or day >= since:
+                merged[key][name].update(sketch)
+
+    return {
+        key: {name: sketch.count() for name, sketch in sketches.items()}
+        for key, sketches in merged.items()
+    }
+
+
+def refresh_user_summaries(user_ids):
+    """Recompute UserAnalyticsSummary rows from the daily summaries."""
+    current_start, previous_start = _period_bounds()
+
+    for chunk in _chunks(user_ids):
+        daily = DailyAnalyticsSummary.objects.filter(card__user_id__in=chunk)
+        totals = daily.order_by().values('card__user_id').annotate(
+            views=Sum('total_views'),
+            saves=Sum('contact_saves'),
+            interactions=Sum(_interaction_total()),
+            current=Sum('total_views', filter=Q(date__gte=current_start)),
+            previous=Sum(
+                'total_views',
+                filter=Q(date__gte=previous_start, date__lt=current_start)
+            ),
+        )
+        # The hour of the latest view, from the hourly rollup rather than
+        # the raw events
+        last_views = dict(
+            HourlyAnalyticsSummary.objects.filter(
+                card__user_id__in=chunk, total_views__gt=0
+            ).order_by().values('card__user_id').annotate(
+                last=Max('hour')
+            ).values_list('card__user_id', 'last')
+        )
+        uniques = _unique_visitors_by(daily, 'card__user_id')
+
+        summaries = []
+        for row in totals:
+            user_id = row['card__user_id']
+            unique = uniques.get(user_id, {})
+            current = row['current'] or 0
+            previous = row['previous'] or 0
+            if previous:
+                trend = round((current - previous) / previous * 100, 1)
+            else:
+                trend = 100.0 if current else 0
+            summaries.append(UserAnalyticsSummary(
+                user_id=user_id,
+                total_views=row['views'] or 0,
+                total_unique_views=unique.get('total', 0),
+                total_contact_saves=row['saves'] or 0,
+                total_interactions=row['interactions'] or 0,
+                views_last_30_days=current,
+                views_previous_30_days=previous,
+                unique_views_last_30_days=unique.get(30, 0),
+                unique_views_last_90_days=unique.get(90, 0),
+                views_trend_percentage=trend,
+                last_view_at=last_views.get(user_id),
+            ))
+
+        # Users left without any daily rows (e.g. after rebuild_range) are zeroed
+        UserAnalyticsSummary.objects.filter(user_id__in=chunk).exclude(
+            user_id__in=[summary.user_id for summary in summaries]
+        ).update(
+            total_views=0, total_unique_views=0, total_contact_saves=0,
+            total_interactions=0, views_last_30_days=0, views_previous_30_days=0,
+            unique_views_last_30_days=0, unique_views_last_90_days=0,
+            views_trend_percentage=0, last_view_at=None, updated_at=timezone.now(),
+        )
+
+        UserAnalyticsSummary.objects.bulk_create(
+            summaries,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=[
+                'total_views', 'total_unique_views', 'total_contact_saves',
+                'total_interactions', 'views_last_30_days',
+                'views_previous_30_days', 'unique_views_last_30_days',
+                'unique_views_last_90_days', 'views_trend_percentage',
+                'last_view_at', 'updated_at',
+            ],
+        )
+
+
+def refresh_organization_summaries(org_ids=None):
+    """
+    Recompute OrganizationAnalytics rows.
+    Refreshes every organization when ``org_ids`` is None.
+    """
+    from accounts.models import User
+    from cards.models import NFCCard
+    from organizations.models import Organization
+
+    if org_ids is None:
+        org_ids = Organization.objects.values_list('pk', flat=True)
+    current_start, _ = _period_bounds()
+
+    for chunk in _chunks(org_ids):
+        members = {
+            row['organization_id']: row
+            for row in User.objects.filter(organization_id__in=chunk).order_by().values(
+                'organization_id'
+            ).annotate(
+                total=Count('id'),
+                active=Count('id', filter=Q(is_active=True))
+            )
+        }
+        cards = {
+            row['user__organization_id']: row
+            for row in NFCCard.objects.filter(
+                user__organization_id__in=chunk
+            ).order_by().values('user__organization_id').annotate(
+                total=Count('id'),
+                active=Count('id', filter=Q(status=NFCCard.Status.ACTIVE))
+            )
+        }
+        daily = DailyAnalyticsSummary.objects.filter(card__user__organization_id__in=chunk)
+        uniques = _unique_visitors_by(daily, 'card__user__organization_id')
+        per_card = daily.order_by().values('card__user__organization_id', 'card_id', 'card__url_slug').annotate(
+            views=Sum('total_views'),
+            current=Sum('total_views', filter=Q(date__gte=current_start)),
+        )
+
+        views = defaultdict(lambda: {'total': 0, 'current': 0, 'cards': []})
+        for row in per_card:
+            org = views[row['card__user__organization_id']]
+            org['total'] += row['views'] or 0
+            org['current'] += row['current'] or 0
+            if row['current']:
+                org['cards'].append({
+                    'card_id': str(row['card_id']),
+                    'url_slug': row['card__url_slug'],
+                    'views': row['current'],
+                })
+
+        summaries = []
+        for org_id in chunk:
+            member_row = members.get(org_id, {})
+            card_row = cards.get(org_id, {})
+            view_row = views.get(org_id, {'total': 0, 'current': 0, 'cards': []})
+            unique = uniques.get(org_id, {})
+            top = sorted(view_row['cards'], key=lambda item: -item['views'])[:TOP_CARDS]
+            summaries.append(OrganizationAnalytics(
+                organization_id=org_id,
+                total_users=member_row.get('total', 0),
+                active_users=member_row.get('active', 0),
+                total_cards=card_row.get('total', 0),
+                active_cards=card_row.get('active', 0),
+                total_views=view_row['total'],
+                views_last_30_days=view_row['current'],
+                total_unique_views=unique.get('total', 0),
+                unique_views_last_30_days=unique.get(30, 0),
+                unique_views_last_90_days=unique.get(90, 0),
+                top_cards=top,
+            ))
+
+        OrganizationAnalytics.objects.bulk_create(
+            summaries,
+            update_conflicts=True,
+            unique_fields=['organization'],
+            update_fields=[
+                'total_users', 'active_users', 'total_cards', 'active_cards',
+                'total_views', 'views_last_30_days', 'total_unique_views',
+                'unique_views_last_30_days', 'unique_views_last_90_days',
+                'top_cards', 'updated_at',
+            ],
+        )
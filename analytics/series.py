@@ -0,0 +1,166 @@
+"""
+Time-series queries over the analytics rollup tables.
+
+``time_series`` returns dense, zero-filled series of summary metrics for
+a card, a user's cards or an organization's cards, bucketed by hour,
+day, week (starting Monday) or month. Hours are read from
+HourlyAnalyticsSummary and everything else from DailyAnalyticsSummary,
+never from raw events. Unique views per week or month, or across several
+cards, are estimated by merging the daily visitor sketches; hourly
+unique views are summed across cards.
+
+A computed series is cached in the ``analytics`` namespace for
+ANALYTICS_SERIES_CACHE_SECONDS per (scope, range, granularity), holding
+every metric, so a dashboard can draw all of its charts from one query.
+"""
+
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+
+from nfc_platform.caching import namespace
+
+from .hll import HyperLogLog
+from .models import DailyAnalyticsSummary, HourlyAnalyticsSummary
+from .rollup import COUNTERS
+
+
+GRANULARITIES = ('hour', 'day', 'week', 'month')
+
+METRICS = ('total_views', 'unique_views', *(name for name in COUNTERS if name != 'total_views'))
+
+# Scope -> lookup from a summary row to the scope's primary key
+SCOPES = {
+    'card': 'card_id',
+    'user': 'card__user_id',
+    'organization': 'card__user__organization_id',
+}
+
+
+def bucket_start(moment, granularity):
+    """The start of the bucket holding ``moment`` (a date, or a datetime for hours)."""
+    if granularity == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    if granularity == 'week':
+        return moment - timedelta(days=moment.weekday())
+    if granularity == 'month':
+        return moment.replace(day=1)
+    return moment
+
+
+def buckets(start, end, granularity):
+    """
+    Every bucket start covering the dates [start, end], in order.
+    Hours are aware datetimes in the current time zone; other buckets are dates.
+    """
+    from nfc_platform.exports import datetime_bounds
+
+    if granularity == 'hour':
+        moment, until = datetime_bounds(start, end)
+        step = timedelta(hours=1)
+    else:
+        moment, until = bucket_start(start, granularity), end + timedelta(days=1)
+
+    result = []
+    while moment < until:
+        result.append(moment)
+        if granularity == 'hour':
+            moment += step
+        elif granularity == 'month':
+            moment = date(moment.year + moment.month // 12, moment.month % 12 + 1, 1)
+        else:
+            moment += timedelta(days=7 if granularity == 'week' else 1)
+    return result
+
+
+def time_series(scope, scope_id, start, end, granularity='day', metrics=None):
+    """
+    Series of ``metrics`` (default: all of METRICS) for the ``scope``
+    ('card', 'user' or 'organization') with primary key ``scope_id``
+    over the dates [start, end].
+
+    Returns {'scope', 'id', 'granularity', 'start', 'end', 'buckets',
+    'series'}, where 'buckets' lists the ISO bucket starts and 'series'
+    maps each metric to one value per bucket. Raises ValueError for an
+    unknown scope, granularity or metric, or a range that is reversed or
+    has more than ANALYTICS_SERIES_MAX_POINTS buckets.
+    """
+    if scope not in SCOPES:
+        raise ValueError(f'Unknown scope "{scope}"; expected one of {", ".join(SCOPES)}.')
+    if granularity not in GRANULARITIES:
+        raise ValueError(
+            f'Unknown granularity "{granularity}"; expected one of {", ".join(GRANULARITIES)}.'
+        )
+    metrics = list(metrics or METRICS)
+    unknown = [name for name in metrics if name not in METRICS]
+    if unknown:
+        raise ValueError(f'Unknown metric "{unknown[0]}"; expected any of {", ".join(METRICS)}.')
+    if start > end:
+        raise ValueError('"start" must not be after "end".')
+
+    days = (end - start).days + 1
+    points = {'hour': days * 24, 'day': days, 'week': days // 7 + 1, 'month': days // 28 + 1}[granularity]
+    if points > settings.ANALYTICS_SERIES_MAX_POINTS:
+        raise ValueError(
+            f'The range has {points} {granularity}s; at most '
+            f'{settings.ANALYTICS_SERIES_MAX_POINTS} points can be returned.'
+        )
+
+    data = namespace('analytics').get_or_set(
+        f'series:{scope}:{scope_id}:{start}:{end}:{granularity}',
+        lambda: _compute(scope, scope_id, start, end, granularity),
+        settings.ANALYTICS_SERIES_CACHE_SECONDS
+    )
+
+    return {
+        'scope': scope,
+        'id': str(scope_id),
+        'granularity': granularity,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'buckets': data['buckets'],
+        'series': {name: data['series'][name] for name in metrics},
+    }
+
+
+def _compute(scope, scope_id, start, end, granularity):
+    labels = buckets(start, end, granularity)
+    index = {label: position for position, label in enumerate(labels)}
+    series = {name: [0] * len(labels) for name in METRICS}
+    lookup = {SCOPES[scope]: scope_id}
+
+    if granularity == 'hour':
+        since, until = labels[0], labels[-1] + timedelta(hours=1)
+        rows = HourlyAnalyticsSummary.objects.filter(
+            hour__gte=since, hour__lt=until, **lookup
+        ).order_by().values('hour').annotate(**{name: Sum(name) for name in METRICS})
+        for row in rows:
+            position = index[row.pop('hour')]
+            for name, value in row.items():
+                series[name][position] = value or 0
+    else:
+        daily = DailyAnalyticsSummary.objects.filter(date__gte=start, date__lte=end, **lookup)
+        # Per-day sums are few, so they are bucketed here rather than in SQL
+        exact_uniques = scope == 'card' and granularity == 'day'
+        summed = METRICS if exact_uniques else [name for name in METRICS if name != 'unique_views']
+        for row in daily.order_by().values('date').annotate(**{name: Sum(name) for name in summed}):
+            position = index[bucket_start(row.pop('date'), granularity)]
+            for name, value in row.items():
+                series[name][position] += value or 0
+
+        if not exact_uniques:
+            sketches = defaultdict(HyperLogLog)
+            for day, data in daily.order_by().values_list('date', 'visitor_sketch').iterator(
+                chunk_size=2000
+            ):
+                if data:
+                    sketches[bucket_start(day, granularity)].update(HyperLogLog.from_bytes(data))
+            for label, sketch in sketches.items():
+                series['unique_views'][index[label]] = sketch.count()
+
+    return {
+        'buckets': [label.isoformat() for label in labels],
+        'series': series,
+    }
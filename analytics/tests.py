@@ -1,3 +1,395 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from cards.models import NFCCard
+from nfc_platform.testing import LOCMEM_CACHES, clear_caches
+from . import hll, ingest, live, rollup, series
+from .live import hour_start
+from .models import (
+    DailyAnalyticsSummary, DrainedSpool, HourlyAnalyticsSummary, ProfileAnalytics,
+    RollupCheckpoint, UserAnalyticsSummary
+)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AnalyticsTestCase(TestCase):
+    """A user with one card, and helpers to record events on it."""
+
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user('owner@example.com', 'pass12345')
+        self.card = NFCCard.objects.create(user=self.user, qr_code='qrcodes/x.png')
+
+    def event(self, timestamp, interaction_type='VIEW', visitor='visitor', card=None, **kwargs):
+        return ProfileAnalytics.objects.create(
+            card=card or self.card,
+            interaction_type=interaction_type,
+            visitor_ip_hash=visitor,
+            timestamp=timestamp,
+            **kwargs
+        )
+
+
+@override_settings(ANALYTICS_EVENT_SINK='analytics.ingest.SyncEventSink')
+class UserSummaryTests(AnalyticsTestCase):
+
+    def test_last_view_comes_from_the_hourly_rollup(self):
+        viewed = timezone.now() - timedelta(days=2)
+        self.event(viewed)
+        self.event(viewed - timedelta(hours=5), interaction_type='CONTACT_SAVE')
+        rollup.rebuild_range(timezone.localdate(viewed), timezone.localdate(viewed))
+
+        summary = UserAnalyticsSummary.objects.get(user=self.user)
+        self.assertEqual(summary.total_views, 1)
+        self.assertEqual(summary.total_contact_saves, 1)
+        self.assertEqual(summary.last_view_at, hour_start(viewed))
+
+    def test_users_without_daily_rows_are_zeroed_by_a_rebuild(self):
+        viewed = timezone.now() - timedelta(days=2)
+        self.event(viewed)
+        rollup.rebuild_range(timezone.localdate(viewed), timezone.localdate(viewed))
+        self.assertEqual(UserAnalyticsSummary.objects.get(user=self.user).total_views, 1)
+
+        ProfileAnalytics.objects.all().delete()
+        rollup.rebuild_range(timezone.localdate(viewed), timezone.localdate(viewed))
+
+        summary = UserAnalyticsSummary.objects.get(user=self.user)
+        self.assertEqual(summary.total_views, 0)
+        self.assertEqual(summary.views_last_30_days, 0)
+        self.assertIsNone(summary.last_view_at)
+
+
+@override_settings(ANALYTICS_BUFFER_SIZE=3, ANALYTICS_FLUSH_INTERVAL=3600)
+class SpoolTestCase(AnalyticsTestCase):
+    """A temporary spool directory, and helpers to write unsaved events to it."""
+
+    def setUp(self):
+        super().setUp()
+        spool_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(spool_dir.cleanup)
+        self.spool_dir = Path(spool_dir.name)
+        self.enterContext(override_settings(ANALYTICS_SPOOL_DIR=spool_dir.name))
+
+    def unsaved(self, timestamp=None, interaction_type='VIEW', **kwargs):
+        return ProfileAnalytics(
+            card_id=self.card.pk,
+            interaction_type=interaction_type,
+            visitor_ip_hash='visitor',
+            user_agent='Mozilla/5.0 (iPhone)',
+            referrer='https://example.com/',
+            timestamp=timestamp or timezone.now(),
+            **kwargs
+        )
+
+    def write_spool(self, name, events):
+        path = self.spool_dir / name
+        with open(path, 'w', encoding='utf-8') as spool:
+            for event in events:
+                spool.write(json.dumps(ingest.SpoolEventSink.encode(event)) + '\n')
+        return path
+
+
+class EventSinkTests(SpoolTestCase):
+
+    def test_buffered_sink_writes_full_batches(self):
+        sink = ingest.BufferedEventSink()
+        sink.record(self.unsaved())
+        sink.record(self.unsaved())
+        self.assertEqual(ProfileAnalytics.objects.count(), 0)
+
+        sink.record(self.unsaved())
+        self.assertEqual(ProfileAnalytics.objects.count(), 3)
+        self.assertEqual(sink.pending, [])
+
+    def test_buffered_sink_flush_writes_pending_events(self):
+        sink = ingest.BufferedEventSink()
+        sink.record(self.unsaved())
+        self.assertEqual(sink.flush(), 1)
+        self.assertEqual(sink.flush(), 0)
+
+        event = ProfileAnalytics.objects.get()
+        self.assertEqual(event.user_agent, 'Mozilla/5.0 (iPhone)')
+        self.assertEqual(event.referrer, 'https://example.com/')
+
+    def test_spool_sink_appends_before_writing(self):
+        sink = ingest.SpoolEventSink()
+        sink.record(self.unsaved())
+        self.assertEqual(ProfileAnalytics.objects.count(), 0)
+        with open(sink.path, encoding='utf-8') as spool:
+            self.assertEqual(len(spool.readlines()), 1)
+
+        self.assertEqual(sink.flush(), 1)
+        self.assertEqual(ProfileAnalytics.objects.count(), 1)
+        self.assertEqual(list(self.spool_dir.iterdir()), [])
+
+    def test_drain_spool_writes_events_and_removes_the_file(self):
+        path = self.write_spool('events-1.jsonl', [self.unsaved(), self.unsaved()])
+        self.assertEqual(ingest.drain_spool(path), 2)
+        self.assertEqual(ProfileAnalytics.objects.count(), 2)
+        self.assertEqual(list(self.spool_dir.iterdir()), [])
+
+    def test_a_drain_that_read_the_file_late_writes_nothing(self):
+        events = [self.unsaved(), self.unsaved()]
+        path = self.write_spool('events-race.draining', events)
+        self.assertEqual(ingest.drain_spool(path), 2)
+        # A second drain read the same file before the first removed it
+        self.write_spool('events-race.draining', events)
+        self.assertEqual(ingest.drain_spool(path), 0)
+        self.assertEqual(ProfileAnalytics.objects.count(), 2)
+        self.assertFalse(path.exists())
+
+    @override_settings(ANALYTICS_SPOOL_MARKER_DAYS=7)
+    def test_old_drain_markers_are_purged(self):
+        DrainedSpool.objects.create(name='events-old.draining')
+        DrainedSpool.objects.create(name='events-new.draining')
+        DrainedSpool.objects.filter(name='events-old.draining').update(
+            drained_at=timezone.now() - timedelta(days=8)
+        )
+        self.assertEqual(ingest.purge_drained_spools(), 1)
+        self.assertEqual(list(DrainedSpool.objects.values_list('name', flat=True)), ['events-new.draining'])
+
+    def test_failed_buffered_write_is_spooled_for_flush_analytics(self):
+        sink = ingest.BufferedEventSink()
+        sink.record(self.unsaved())
+        sink.record(self.unsaved())
+        with mock.patch.object(ProfileAnalytics.objects, 'bulk_create', side_effect=DatabaseError), \
+                self.assertLogs('analytics.ingest', 'ERROR'):
+            self.assertEqual(sink.flush(), 2)
+        self.assertEqual(ProfileAnalytics.objects.count(), 0)
+        self.assertEqual([path.suffix for path in self.spool_dir.iterdir()], ['.draining'])
+
+        output = io.StringIO()
+        call_command('flush_analytics', stdout=output)
+        self.assertIn('Flushed 2 analytics events.', output.getvalue())
+        self.assertEqual(ProfileAnalytics.objects.count(), 2)
+        self.assertEqual(list(self.spool_dir.iterdir()), [])
+
+    def test_drain_spool_only_removes_an_already_written_file(self):
+        path = self.write_spool('events-done.draining', [self.unsaved()])
+        DrainedSpool.objects.create(name=path.name)
+        self.assertEqual(ingest.drain_spool(path), 0)
+        self.assertEqual(ProfileAnalytics.objects.count(), 0)
+        self.assertFalse(path.exists())
+
+    def test_drain_spool_keeps_the_file_when_the_write_fails(self):
+        path = self.write_spool('events-bad.draining', [self.unsaved()])
+        path.write_text(path.read_text().replace('"VIEW"', '"UNKNOWN"'))
+        with self.assertLogs('analytics.ingest', 'ERROR'):
+            self.assertEqual(ingest.drain_spool(path), 0)
+        self.assertTrue(path.exists())
+        self.assertEqual(ProfileAnalytics.objects.count(), 0)
+
+    def test_late_events_move_the_rollup_checkpoint_back(self):
+        rollup.run_incremental()
+        late = timezone.now() - timedelta(hours=2)
+        ingest.drain_spool(self.write_spool('events-1.jsonl', [self.unsaved(late)]))
+
+        checkpoint = RollupCheckpoint.objects.get(name=rollup.CHECKPOINT_NAME)
+        self.assertEqual(checkpoint.last_timestamp, late)
+        rollup.run_incremental()
+        self.assertEqual(
+            DailyAnalyticsSummary.objects.get(card=self.card, date=timezone.localdate(late)).total_views, 1
+        )
+
+    def test_recent_events_leave_the_rollup_checkpoint(self):
+        rollup.run_incremental()
+        before = RollupCheckpoint.objects.get(name=rollup.CHECKPOINT_NAME).last_timestamp
+        ingest.drain_spool(self.write_spool('events-1.jsonl', [self.unsaved()]))
+        self.assertEqual(
+            RollupCheckpoint.objects.get(name=rollup.CHECKPOINT_NAME).last_timestamp, before
+        )
+
+
+class LiveCounterTests(SpoolTestCase):
+
+    def totals(self):
+        self.card.refresh_from_db()
+        hourly = HourlyAnalyticsSummary.objects.filter(card=self.card).first()
+        return self.card.total_views, hourly.total_views if hourly else 0
+
+    def test_counters_are_written_with_the_events(self):
+        sink = ingest.BufferedEventSink()
+        sink.record(self.unsaved(device_type='MOBILE'))
+        sink.record(self.unsaved(interaction_type='QR_DOWNLOAD'))
+        self.assertEqual(self.totals(), (0, 0))
+
+        sink.flush()
+        self.assertEqual(self.totals(), (1, 1))
+        self.assertEqual(self.card.qr_downloads, 1)
+        self.assertEqual(HourlyAnalyticsSummary.objects.get().mobile_views, 1)
+        self.assertEqual(live.today()['total_views'], 1)
+
+    def test_a_failed_write_counts_nothing_until_it_is_drained(self):
+        sink = ingest.BufferedEventSink()
+        sink.record(self.unsaved())
+        with mock.patch.object(live, '_add_hourly', side_effect=DatabaseError), \
+                self.assertLogs('analytics.ingest', 'ERROR'):
+            sink.flush()
+        # The events rolled back with their counts
+        self.assertEqual(ProfileAnalytics.objects.count(), 0)
+        self.assertEqual(self.totals(), (0, 0))
+
+        call_command('flush_analytics', stdout=io.StringIO())
+        self.assertEqual(ProfileAnalytics.objects.count(), 1)
+        self.assertEqual(self.totals(), (1, 1))
+
+    def test_finalized_hours_only_count_towards_card_totals(self):
+        late = timezone.now() - timedelta(hours=3)
+        ingest.drain_spool(self.write_spool('events-late.jsonl', [self.unsaved(late)]))
+        self.assertEqual(self.totals(), (1, 0))
+
+    def test_rebuild_repairs_drift_and_later_events_add_on(self):
+        sink = ingest.BufferedEventSink()
+        sink.record(self.unsaved())
+        sink.record(self.unsaved(interaction_type='SHARE'))
+        sink.flush()
+        NFCCard.objects.filter(pk=self.card.pk).update(total_views=40, shares=0)
+
+        self.assertEqual(live.rebuild_card_counters(), 1)
+        self.card.refresh_from_db()
+        self.assertEqual((self.card.total_views, self.card.shares), (1, 1))
+
+        sink.record(self.unsaved())
+        sink.flush()
+        self.assertEqual(self.totals()[0], 2)
+
+
+class HyperLogLogTests(SimpleTestCase):
+
+    def sketch(self, values):
+        sketch = hll.HyperLogLog()
+        for value in values:
+            sketch.add(value)
+        return sketch
+
+    def test_small_sketches_stay_sparse(self):
+        sketch = self.sketch(f'visitor-{n}' for n in range(100))
+        self.assertIsNone(sketch.registers)
+        self.assertEqual(sketch.to_bytes()[0], hll.SPARSE)
+        self.assertLessEqual(len(sketch.to_bytes()), 2 + 100 * hll.SPARSE_ENTRY.size)
+        self.assertAlmostEqual(sketch.count(), 100, delta=2)
+
+    def test_sketch_turns_dense_once_that_is_smaller(self):
+        sketch = hll.HyperLogLog()
+        n = 0
+        while sketch.registers is None:
+            sketch.add(f'visitor-{n}')
+            n += 1
+        self.assertEqual(sketch.sparse, {})
+        self.assertGreater(n * hll.SPARSE_ENTRY.size, sketch.size)
+        self.assertEqual(len(sketch.to_bytes()), 2 + sketch.size)
+
+    def test_bytes_round_trip(self):
+        for count in (0, 50, 5000):
+            sketch = self.sketch(f'visitor-{n}' for n in range(count))
+            with self.subTest(count=count):
+                loaded = hll.HyperLogLog.from_bytes(sketch.to_bytes())
+                self.assertEqual(loaded.to_bytes(), sketch.to_bytes())
+                self.assertEqual(loaded.count(), sketch.count())
+
+    def test_bad_bytes_are_rejected(self):
+        dense = self.sketch(f'visitor-{n}' for n in range(5000)).to_bytes()
+        for data in (b'\x02', dense[:-1], b'\x01\x0c\x00\x01', b'\x09\x0c'):
+            with self.subTest(data=data[:4]), self.assertRaises(ValueError):
+                hll.HyperLogLog.from_bytes(data)
+
+    def test_merge_equals_the_sketch_of_the_union(self):
+        for first, second in ((range(0, 300), range(200, 500)), (range(0, 6000), range(4000, 9000))):
+            with self.subTest(size=len(first)):
+                a = self.sketch(f'v{n}' for n in first)
+                b = self.sketch(f'v{n}' for n in second)
+                union = self.sketch(f'v{n}' for n in (*first, *second))
+                merged = hll.merge([a.to_bytes(), b'', b.to_bytes()])
+                self.assertEqual(merged.count(), union.count())
+                if union.registers is not None:
+                    self.assertEqual(merged.registers, union.registers)
+                else:
+                    self.assertEqual(merged.sparse, union.sparse)
+
+    def test_estimate_is_within_the_expected_error(self):
+        sketch = self.sketch(f'visitor-{n}' for n in range(10000))
+        # Three standard errors at precision 12
+        self.assertAlmostEqual(sketch.count(), 10000, delta=10000 * 3 * 1.04 / 64)
+
+    def test_precision_must_match_to_merge(self):
+        with self.assertRaises(ValueError):
+            hll.HyperLogLog(12).update(hll.HyperLogLog(10))
+
+
+class TimeSeriesTests(AnalyticsTestCase):
+
+    def summary(self, day, views, visitors=(), card=None, **counts):
+        sketch = hll.HyperLogLog()
+        for visitor in visitors:
+            sketch.add(visitor)
+        return DailyAnalyticsSummary.objects.create(
+            card=card or self.card, date=day, total_views=views,
+            unique_views=len(visitors), visitor_sketch=sketch.to_bytes(), **counts
+        )
+
+    def test_week_buckets_are_zero_filled_and_merge_visitors(self):
+        self.summary(date(2026, 9, 3), 5, ['a', 'b'], contact_saves=1)
+        self.summary(date(2026, 9, 4), 2, ['b', 'c'])
+        self.summary(date(2026, 9, 15), 3, ['a'])
+
+        result = series.time_series(
+            'card', self.card.pk, date(2026, 9, 2), date(2026, 9, 20), 'week',
+            ['total_views', 'unique_views', 'contact_saves']
+        )
+        self.assertEqual(result['buckets'], ['2026-08-31', '2026-09-07', '2026-09-14'])
+        self.assertEqual(result['series'], {
+            'total_views': [7, 0, 3],
+            'unique_views': [3, 0, 1],
+            'contact_saves': [1, 0, 0],
+        })
+
+    def test_month_buckets_are_zero_filled(self):
+        self.summary(date(2026, 7, 20), 4, ['a'])
+        self.summary(date(2026, 9, 1), 1, ['b'])
+        self.summary(date(2026, 9, 30), 9, ['c'])
+
+        result = series.time_series(
+            'user', self.user.pk, date(2026, 7, 15), date(2026, 9, 10), 'month', ['total_views']
+        )
+        self.assertEqual(result['buckets'], ['2026-07-01', '2026-08-01', '2026-09-01'])
+        self.assertEqual(result['series'], {'total_views': [4, 0, 1]})
+
+    def test_unique_views_across_cards_are_merged(self):
+        other = NFCCard.objects.create(user=self.user, qr_code='qrcodes/y.png')
+        self.summary(date(2026, 9, 3), 2, ['a', 'b'])
+        self.summary(date(2026, 9, 3), 2, ['b', 'c'], card=other)
+
+        result = series.time_series(
+            'user', self.user.pk, date(2026, 9, 3), date(2026, 9, 3), 'day'
+        )
+        self.assertEqual(result['series']['total_views'], [4])
+        self.assertEqual(result['series']['unique_views'], [3])
+
+    @override_settings(ANALYTICS_SERIES_MAX_POINTS=10)
+    def test_ranges_with_too_many_points_are_rejected(self):
+        series.time_series('card', self.card.pk, date(2026, 9, 1), date(2026, 9, 10), 'day')
+        with self.assertRaisesMessage(ValueError, 'The range has 11 days'):
+            series.time_series('card', self.card.pk, date(2026, 9, 1), date(2026, 9, 11), 'day')
+        with self.assertRaisesMessage(ValueError, 'The range has 24 hours'):
+            series.time_series('card', self.card.pk, date(2026, 9, 1), date(2026, 9, 1), 'hour')
+
+    def test_bad_arguments_are_rejected(self):
+        for args in (
+            ('team', self.card.pk, date(2026, 9, 1), date(2026, 9, 2), 'day'),
+            ('card', self.card.pk, date(2026, 9, 1), date(2026, 9, 2), 'year'),
+            ('card', self.card.pk, date(2026, 9, 2), date(2026, 9, 1), 'day'),
+        ):
+            with self.subTest(args=args), self.assertRaises(ValueError):
+                series.time_series(*args)
+        with self.assertRaises(ValueError):
+            series.time_series('card', self.card.pk, date(2026, 9, 1), date(2026, 9, 2), metrics=['nope'])
@@ -3,15 +3,15 @@ Views for analytics app.
 """
 
 import json
-import hashlib
 from django.views import View
 from django.views.generic import TemplateView
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponseBadRequest
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import get_object_or_404
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from cards.models import NFCCard
+from .ingest import record_event
 from .models import ProfileAnalytics, DailyAnalyticsSummary
 
 
@@ -28,30 +28,18 @@ class TrackInteractionView(View):
             
             card = get_object_or_404(NFCCard, pk=card_id)
             
-            # Get visitor info
-            ip = self.get_client_ip(request)
-            ip_hash = hashlib.sha256(ip.encode()).hexdigest()[:32]
-            user_agent = request.META.get('HTTP_USER_AGENT', '')[:255]
-            
-            ProfileAnalytics.objects.create(
-                card=card,
-                interaction_type=interaction_type,
+            record_event(
+                card,
+                interaction_type,
+                request,
                 metadata=metadata,
-                visitor_ip_hash=ip_hash,
-                user_agent=user_agent,
-                referrer=metadata.get('referrer', '')[:200] if metadata.get('referrer') else ''
+                referrer=metadata.get('referrer', '')
             )
             
             return JsonResponse({'status': 'success'})
             
         except Exception as e:
             return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
-    
-    def get_client_ip(self, request):
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            return x_forwarded_for.split(',')[0]
-        return request.META.get('REMOTE_ADDR', '0.0.0.0')
 
 
 class AnalyticsDashboardView(LoginRequiredMixin, TemplateView):
@@ -87,15 +75,25 @@ class AnalyticsDashboardView(LoginRequiredMixin, TemplateView):
         
         totals = analytics.aggregate(
             total_views=Sum('total_views'),
-            unique_views=Sum('unique_views'),
             contact_saves=Sum('contact_saves'),
             phone_clicks=Sum('phone_clicks'),
             email_clicks=Sum('email_clicks')
         )
+        # Daily unique counts do not add up; merge the visitor sketches instead
+        from .rollup import unique_visitors
+        totals['unique_views'] = unique_visitors(analytics)
+        totals['unique_views_90_days'] = unique_visitors(DailyAnalyticsSummary.objects.filter(
+            card__in=cards,
+            date__gte=(timezone.now() - timedelta(days=90)).date()
+        ))
         
         context['totals'] = totals
         context['daily_stats'] = analytics.order_by('date')
         
+        # Same-day numbers, from the live hourly tier
+        from .live import today
+        context['today'] = today(None if user.is_super_admin else cards)
+        
         return context
 
 
@@ -134,61 +132,63 @@ class CardAnalyticsView(LoginRequiredMixin, TemplateView):
         
         context['recent_views'] = ProfileAnalytics.objects.filter(
             card=card
-        ).order_by('-timestamp')[:50]
+        ).select_related('agent', 'source', 'location').order_by('-timestamp')[:50]
+        
+        from .live import today
+        from .series import time_series
+        context['today'] = today(NFCCard.objects.filter(pk=card.pk))
+        end = timezone.localdate()
+        context['time_series'] = time_series('card', card.pk, end - timedelta(days=30), end)
         
         return context
 
 
 class ExportAnalyticsView(LoginRequiredMixin, View):
-    """Export analytics data as CSV."""
+    """
+    Export daily analytics as CSV, streamed.
+    Accepts start/end (default: the last 30 days), organization (super
+    admins) and gzip query parameters; see nfc_platform/exports.py.
+    """
     
     def get(self, request):
-        import csv
-        from datetime import timedelta
-        from django.utils import timezone
+        from nfc_platform import exports
         
         user = request.user
         
-        # Get user's cards
+        try:
+            start, end = exports.date_range(request, default_days=30)
+            organization = exports.requested_organization(request)
+        except exports.ExportError as e:
+            return HttpResponseBadRequest(str(e))
+        
+        # Scope to the user's cards, joined rather than an IN list of cards
+        summaries = DailyAnalyticsSummary.objects.all()
         if user.is_super_admin:
-            cards = NFCCard.objects.all()
-        elif user.is_admin and user.organization:
-            org_users = user.organization.members.all()
-            cards = NFCCard.objects.filter(user__in=org_users)
+            if organization:
+                summaries = summaries.filter(card__user__organization=organization)
+        elif user.is_admin and organization:
+            summaries = summaries.filter(card__user__organization=organization)
         else:
-            cards = user.cards.all()
-        
-        # Get last 30 days
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-        
-        analytics = DailyAnalyticsSummary.objects.filter(
-            card__in=cards,
-            date__gte=thirty_days_ago.date()
-        ).order_by('card', 'date')
-        
-        # Create CSV response
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="analytics_export.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
-            'Card', 'Date', 'Total Views', 'Unique Views',
-            'Contact Saves', 'Phone Clicks', 'Email Clicks',
-            'Website Clicks', 'Social Clicks', 'Shares'
-        ])
-        
-        for stat in analytics:
-            writer.writerow([
-                stat.card.url_slug,
-                stat.date,
-                stat.total_views,
-                stat.unique_views,
-                stat.contact_saves,
-                stat.phone_clicks,
-                stat.email_clicks,
-                stat.website_clicks,
-                stat.social_clicks,
-                stat.shares
-            ])
-        
-        return response
+            summaries = summaries.filter(card__user=user)
+        
+        if start:
+            summaries = summaries.filter(date__gte=start)
+        if end:
+            summaries = summaries.filter(date__lte=end)
+        
+        rows = summaries.order_by('card', 'date').values_list(
+            'card__url_slug', 'date', 'total_views', 'unique_views',
+            'contact_saves', 'phone_clicks', 'email_clicks',
+            'website_clicks', 'social_clicks', 'shares'
+        ).iterator(chunk_size=exports.CHUNK_SIZE)
+        
+        return exports.stream_csv(
+            'analytics_export.csv',
+            [
+                'Card', 'Date', 'Total Views', 'Unique Views',
+                'Contact Saves', 'Phone Clicks', 'Email Clicks',
+                'Website Clicks', 'Social Clicks', 'Shares'
+            ],
+            rows,
+            compress=exports.wants_gzip(request)
+        )
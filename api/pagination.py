@@ -0,0 +1,141 @@
+"""
+Cursor pagination, sparse fieldsets and conditional responses for API lists.
+
+``KeysetCursorPagination`` pages a queryset with the keyset paginator in
+nfc_platform/pagination.py, so polling deep into a list costs the same
+as reading its first page. Responses look like DRF's own cursor
+pagination: {'next', 'previous', 'results'}, with ``next`` and
+``previous`` as links carrying a ``cursor`` parameter.
+
+``SparseListMixin`` lets a client ask for only some fields
+(``?fields=id,url_slug``). Each field names the columns it is computed
+from, and only those columns are selected. Every list response carries
+an ETag of its content, and a request whose If-None-Match matches it gets
+an empty 304.
+"""
+
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from nfc_platform.pagination import DEFAULT_ORDERING, InvalidCursor, KeysetPaginator
+
+
+class KeysetCursorPagination(BasePagination):
+    """Keyset pagination by ``view.ordering`` (default: newest first)."""
+
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    ordering = DEFAULT_ORDERING
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        paginator = KeysetPaginator(
+            queryset, self.get_page_size(request), getattr(view, 'ordering', None) or self.ordering
+        )
+        try:
+            self.page = paginator.page(request.query_params.get(self.cursor_query_param) or None)
+        except InvalidCursor:
+            raise NotFound('Invalid cursor.')
+        return self.page.object_list
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(
+            data, self.page.next_cursor, self.page.previous_cursor
+        ))
+
+    def get_paginated_data(self, results, next_cursor, previous_cursor):
+        return {
+            'next': self.get_link(next_cursor),
+            'previous': self.get_link(previous_cursor),
+            'results': results,
+        }
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+
+class SparseListMixin:
+    """
+    An APIView listing objects with ``list_response``.
+
+    ``fields`` maps each output field to (columns it is computed from,
+    function of the object returning its value). Without ``?fields=``
+    every field is returned. ``cache_control`` is applied to responses.
+    """
+
+    fields = {}
+    ordering = DEFAULT_ORDERING
+    pagination_class = KeysetCursorPagination
+    cache_control = {'no_cache': True}
+
+    def selected_fields(self, request):
+        """The requested field names, in order. Raises ValueError."""
+        requested = request.query_params.get('fields', '')
+        names = list(dict.fromkeys(name.strip() for name in requested.split(',') if name.strip()))
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ValueError(
+                f'Unknown field "{unknown[0]}"; expected any of {", ".join(self.fields)}.'
+            )
+        return names or list(self.fields)
+
+    def list_response(self, request, queryset, cache=None):
+        """
+        One page of ``queryset`` as a conditional response. With ``cache``
+        (a caching Namespace), pages are cached there per fields, page
+        size and cursor.
+        """
+        try:
+            names = self.selected_fields(request)
+        except ValueError as error:
+            return Response({'error': str(error)}, status=400)
+
+        columns = {column for name in names for column in self.fields[name][0]}
+        columns.update(name.lstrip('-') for name in self.ordering)
+        paginator = self.pagination_class()
+
+        def build():
+            rows = paginator.paginate_queryset(queryset.only(*columns), request, view=self)
+            return {
+                'results': [{name: self.fields[name][1](obj) for name in names} for obj in rows],
+                'next': paginator.page.next_cursor,
+                'previous': paginator.page.previous_cursor,
+            }
+
+        if cache is None:
+            page = build()
+        else:
+            paginator.request = request
+            cursor = request.query_params.get(paginator.cursor_query_param, '')
+            key = f'api:{",".join(names)}:{paginator.get_page_size(request)}:{cursor}'
+            page = cache.get_or_set(key, build)
+
+        data = paginator.get_paginated_data(page['results'], page['next'], page['previous'])
+        etag = quote_etag(hashlib.md5(
+            json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder).encode()
+        ).hexdigest())
+
+        response = get_conditional_response(request, etag=etag) or Response(data)
+        response['ETag'] = etag
+        patch_cache_control(response, **self.cache_control)
+        return response
@@ -1,3 +1,173 @@
-from django.test import TestCase
+import tempfile
+import uuid
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import User
+from cards.models import NFCCard
+from nfc_platform.testing import LOCMEM_CACHES, clear_caches
+from organizations.models import Organization
+from themes.models import Theme
+from .views import CardListAPIView
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SECURE_SSL_REDIRECT=False)
+class APITestCase(TestCase):
+    """Two organizations with an admin and a member each."""
+
+    def setUp(self):
+        clear_caches()
+        self.acme = Organization.objects.create(name='Acme', max_users=10, max_cards=10)
+        self.globex = Organization.objects.create(name='Globex', max_users=10, max_cards=10)
+        self.admin = self.user('admin@acme.com', self.acme, User.Role.ADMIN)
+        self.member = self.user('member@acme.com', self.acme)
+        self.outsider = self.user('member@globex.com', self.globex)
+        self.card = NFCCard.objects.create(user=self.member, qr_code='qrcodes/x.png')
+
+    def user(self, email, organization=None, role=User.Role.USER):
+        return User.objects.create_user(email, 'pass12345', organization=organization, role=role)
+
+
+class AnalyticsSeriesAPITests(APITestCase):
+
+    url = reverse('api:analytics_series')
+
+    def get(self, user, **params):
+        self.client.force_login(user)
+        return self.client.get(self.url, params)
+
+    def test_users_see_their_own_series(self):
+        response = self.get(self.member, start='2026-09-01', end='2026-09-07')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], str(self.member.pk))
+        self.assertEqual(len(response.json()['buckets']), 7)
+
+    def test_anonymous_requests_are_refused(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_access_to_other_scopes(self):
+        cases = [
+            # (viewer, scope, id, status)
+            (self.member, 'card', self.card.pk, 200),
+            (self.outsider, 'card', self.card.pk, 403),
+            (self.admin, 'card', self.card.pk, 200),
+            (self.outsider, 'user', self.member.pk, 403),
+            (self.admin, 'user', self.member.pk, 200),
+            (self.admin, 'user', self.outsider.pk, 403),
+            (self.member, 'organization', self.acme.pk, 403),
+            (self.admin, 'organization', self.acme.pk, 200),
+            (self.admin, 'organization', self.globex.pk, 403),
+            (self.user('root@example.com', role=User.Role.SUPER_ADMIN), 'organization', self.globex.pk, 200),
+        ]
+        for viewer, scope, scope_id, status in cases:
+            with self.subTest(viewer=viewer.email, scope=scope):
+                response = self.get(viewer, scope=scope, id=scope_id)
+                self.assertEqual(response.status_code, status)
+
+    def test_missing_objects_are_404(self):
+        for scope in ('card', 'user', 'organization'):
+            with self.subTest(scope=scope):
+                self.assertEqual(self.get(self.admin, scope=scope, id=uuid.uuid4()).status_code, 404)
+        self.assertEqual(self.get(self.admin, scope='card').status_code, 404)
+
+    def test_bad_parameters_are_400(self):
+        for params in (
+            {'scope': 'card', 'id': 'not-a-uuid'},
+            {'scope': 'team'},
+            {'granularity': 'year'},
+            {'metrics': 'nope'},
+            {'start': '2026-09-10', 'end': '2026-09-01'},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self.get(self.member, **params).status_code, 400)
+
+    @override_settings(ANALYTICS_SERIES_MAX_POINTS=10)
+    def test_too_many_points_is_400(self):
+        response = self.get(self.member, start='2026-09-01', end='2026-09-11')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('at most 10 points', response.json()['error'])
+
+
+class SparseListAPITests(APITestCase):
+
+    url = reverse('api:cards')
+
+    def setUp(self):
+        super().setUp()
+        for _ in range(2):
+            NFCCard.objects.create(user=self.member, qr_code='qrcodes/x.png')
+        self.client.force_login(self.member)
+
+    def card_queries(self, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, params)
+        return response, [query['sql'] for query in queries if 'cards_nfccard' in query['sql']]
+
+    def test_fields_select_only_their_columns(self):
+        response, queries = self.card_queries({'fields': 'url_slug,public_url'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(
+            set(response.json()['results'][0]), {'url_slug', 'public_url'}
+        )
+        selected = queries[0].split(' FROM ')[0]
+        for column in ('url_slug', 'created_at', '"id"'):
+            self.assertIn(column, selected)
+        for column in ('card_uid', 'status', 'total_views', 'qr_code'):
+            self.assertNotIn(column, selected)
+
+    def test_every_field_is_returned_without_a_selection(self):
+        response, queries = self.card_queries({})
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(len(response.json()['results']), 3)
+        self.assertEqual(list(response.json()['results'][0]), list(CardListAPIView.fields))
+
+    def test_unknown_field_is_400(self):
+        response = self.client.get(self.url, {'fields': 'url_slug,owner'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Unknown field "owner"', response.json()['error'])
+
+    def test_if_none_match_returns_304_until_the_page_changes(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+        NFCCard.objects.create(user=self.member, qr_code='qrcodes/x.png')
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_cursor_pages_through_the_list(self):
+        first = self.client.get(self.url, {'page_size': 2, 'fields': 'id'}).json()
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).json()
+        self.assertIsNone(second['next'])
+        ids = [row['id'] for row in first['results'] + second['results']]
+        self.assertEqual(sorted(ids), sorted(str(card.pk) for card in self.member.cards.all()))
+        self.assertEqual(self.client.get(self.url, {'cursor': 'bogus'}).status_code, 404)
+
+    def test_cached_theme_pages_honour_fields(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        Theme.objects.create(name='Gold', slug='gold')
+
+        url = reverse('api:themes')
+        self.assertEqual(self.client.get(url, {'fields': 'slug'}).json()['results'], [{'slug': 'gold'}])
+
+        def theme_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, {'fields': 'name'})
+            self.assertEqual(response.json()['results'], [{'name': 'Gold'}])
+            return [query['sql'] for query in queries if 'themes_theme' in query['sql']]
+
+        # Another selection is another cached page, read with its own columns
+        queries = theme_queries()
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('slug', queries[0].split(' FROM ')[0])
+        self.assertEqual(theme_queries(), [])
@@ -19,7 +19,11 @@ urlpatterns = [
     # Analytics API
     path('analytics/track/', views.TrackEventAPIView.as_view(), name='track'),
     path('analytics/summary/', views.AnalyticsSummaryAPIView.as_view(), name='analytics_summary'),
+    path('analytics/series/', views.AnalyticsSeriesAPIView.as_view(), name='analytics_series'),
     
     # Themes API
     path('themes/', views.ThemeListAPIView.as_view(), name='themes'),
+    
+    # Operations
+    path('cache/stats/', views.CacheStatsAPIView.as_view(), name='cache_stats'),
 ]
@@ -11,7 +11,8 @@ from django.shortcuts import get_object_or_404
 from profiles.models import UserProfile
 from cards.models import NFCCard
 from themes.models import Theme
-from analytics.models import ProfileAnalytics
+
+from .pagination import SparseListMixin
 
 
 class ProfileAPIView(APIView):
@@ -69,23 +70,21 @@ class ProfileUpdateAPIView(APIView):
         })
 
 
-class CardListAPIView(APIView):
-    """List user's cards."""
+class CardListAPIView(SparseListMixin, APIView):
+    """List user's cards, newest first (cursor-paginated; ``?fields=`` selects fields)."""
     permission_classes = [IsAuthenticated]
+    cache_control = {'private': True, 'no_cache': True}
+    fields = {
+        'id': (('id',), lambda card: str(card.id)),
+        'url_slug': (('url_slug',), lambda card: card.url_slug),
+        'status': (('status',), lambda card: card.status),
+        'is_active': (('status', 'expiry_date'), lambda card: card.is_active),
+        'public_url': (('url_slug',), lambda card: card.public_url),
+        'view_count': (('total_views',), lambda card: card.view_count),
+    }
     
     def get(self, request):
-        cards = NFCCard.objects.filter(user=request.user)
-        return Response([
-            {
-                'id': str(card.id),
-                'url_slug': card.url_slug,
-                'status': card.status,
-                'is_active': card.is_active,
-                'public_url': card.public_url,
-                'view_count': card.view_count,
-            }
-            for card in cards
-        ])
+        return self.list_response(request, NFCCard.objects.filter(user=request.user))
 
 
 class CardDetailAPIView(APIView):
@@ -111,7 +110,7 @@ class TrackEventAPIView(APIView):
     permission_classes = [AllowAny]
     
     def post(self, request):
-        import hashlib
+        from analytics.ingest import record_event
         
         card_id = request.data.get('card_id')
         event_type = request.data.get('event', 'VIEW').upper()
@@ -119,21 +118,12 @@ class TrackEventAPIView(APIView):
         
         try:
             card = NFCCard.objects.get(pk=card_id)
-            
-            ip = request.META.get('REMOTE_ADDR', '0.0.0.0')
-            ip_hash = hashlib.sha256(ip.encode()).hexdigest()[:32]
-            
-            ProfileAnalytics.objects.create(
-                card=card,
-                interaction_type=event_type,
-                metadata=metadata,
-                visitor_ip_hash=ip_hash,
-                user_agent=request.META.get('HTTP_USER_AGENT', '')[:255]
-            )
-            
+            record_event(card, event_type, request, metadata=metadata)
             return Response({'status': 'success'})
         except NFCCard.DoesNotExist:
             return Response({'error': 'Card not found'}, status=404)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
 
 
 class AnalyticsSummaryAPIView(APIView):
@@ -144,42 +134,163 @@ class AnalyticsSummaryAPIView(APIView):
         from django.db.models import Sum
         from django.utils import timezone
         from datetime import timedelta
-        from analytics.models import DailyAnalyticsSummary
+        from analytics.models import DailyAnalyticsSummary, OrganizationAnalytics
+        from analytics.live import today
+        from analytics.rollup import unique_visitors
         
-        cards = NFCCard.objects.filter(user=request.user)
+        user = request.user
+        cards = NFCCard.objects.filter(user=user)
         
         # Last 30 days
         thirty_days_ago = timezone.now() - timedelta(days=30)
-        
-        stats = DailyAnalyticsSummary.objects.filter(
+        daily = DailyAnalyticsSummary.objects.filter(
             card__in=cards,
             date__gte=thirty_days_ago.date()
-        ).aggregate(
+        )
+        
+        stats = daily.aggregate(
             total_views=Sum('total_views'),
-            unique_views=Sum('unique_views'),
             contact_saves=Sum('contact_saves'),
             phone_clicks=Sum('phone_clicks'),
             email_clicks=Sum('email_clicks')
         )
+        # Approximate, merged from the daily visitor sketches
+        stats['unique_views'] = unique_visitors(daily)
+        stats['unique_views_90_days'] = unique_visitors(DailyAnalyticsSummary.objects.filter(
+            card__in=cards,
+            date__gte=(timezone.now() - timedelta(days=90)).date()
+        ))
+        stats['today'] = today(cards)
+        
+        if user.is_admin and user.organization_id:
+            org_stats = OrganizationAnalytics.objects.filter(
+                organization_id=user.organization_id
+            ).values(
+                'total_views', 'views_last_30_days', 'total_unique_views',
+                'unique_views_last_30_days', 'unique_views_last_90_days'
+            ).first()
+            stats['organization'] = org_stats
         
         return Response(stats)
 
 
-class ThemeListAPIView(APIView):
-    """List available themes."""
+class AnalyticsSeriesAPIView(APIView):
+    """
+    Time series of analytics metrics (see analytics/series.py).
+    
+    Query parameters:
+    - scope: card, user (default) or organization
+    - id: the card, user or organization id; defaults to the requesting
+      user, or their organization
+    - start, end: YYYY-MM-DD; defaults to the last 30 days (today for
+      hourly series)
+    - granularity: hour, day (default), week or month
+    - metrics: comma-separated metric names; defaults to all
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        from django.utils import timezone
+        from analytics.series import time_series
+        from nfc_platform import exports
+        
+        scope = request.query_params.get('scope', 'user')
+        granularity = request.query_params.get('granularity', 'day')
+        metrics = [name for name in request.query_params.get('metrics', '').split(',') if name]
+        
+        try:
+            start, end = exports.date_range(request, default_days=0 if granularity == 'hour' else 30)
+            end = end or timezone.localdate()
+            scope_id = self.scope_id(request, scope)
+        except (exports.ExportError, ValueError) as e:
+            return Response({'error': str(e)}, status=400)
+        except PermissionError as e:
+            return Response({'error': str(e)}, status=403)
+        if scope_id is None:
+            return Response({'error': 'Not found'}, status=404)
+        
+        try:
+            return Response(time_series(scope, scope_id, start, end, granularity, metrics))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+    
+    def scope_id(self, request, scope):
+        """
+        Primary key of the requested card, user or organization, or None
+        if it does not exist. Raises PermissionError if the requesting user
+        may not see it, and ValueError for a malformed id or unknown scope.
+        """
+        from django.core.exceptions import ValidationError
+        from accounts.models import User
+        from organizations.models import Organization
+        
+        user = request.user
+        requested = request.query_params.get('id', '').strip()
+        
+        try:
+            if scope == 'card':
+                card = NFCCard.objects.filter(pk=requested).values(
+                    'pk', 'user_id', 'user__organization_id'
+                ).first() if requested else None
+                if card is None:
+                    return None
+                owner, organization = card['user_id'], card['user__organization_id']
+                scope_id = card['pk']
+            elif scope == 'user':
+                if not requested or requested == str(user.pk):
+                    return user.pk
+                member = User.objects.filter(pk=requested).values('pk', 'organization_id').first()
+                if member is None:
+                    return None
+                owner, organization = member['pk'], member['organization_id']
+                scope_id = member['pk']
+            elif scope == 'organization':
+                scope_id = requested or user.organization_id
+                if scope_id is None or not Organization.objects.filter(pk=scope_id).exists():
+                    return None
+                owner, organization = None, scope_id
+            else:
+                raise ValueError(f'Unknown scope "{scope}".')
+        except ValidationError:
+            raise ValueError(f'"{requested}" is not a valid id.')
+        
+        if user.is_super_admin or owner == user.pk:
+            return scope_id
+        if user.is_admin and organization and str(organization) == str(user.organization_id):
+            return scope_id
+        raise PermissionError('You do not have access to these analytics.')
+
+
+class ThemeListAPIView(SparseListMixin, APIView):
+    """List available themes by name (cursor-paginated; ``?fields=`` selects fields)."""
     permission_classes = [AllowAny]
+    ordering = ('name', 'id')
+    fields = {
+        'id': (('id',), lambda theme: str(theme.id)),
+        'name': (('name',), lambda theme: theme.name),
+        'slug': (('slug',), lambda theme: theme.slug),
+        'description': (('description',), lambda theme: theme.description),
+        'primary_color': (('primary_color',), lambda theme: theme.primary_color),
+        'is_premium': (('is_premium',), lambda theme: theme.is_premium),
+        'dark_mode': (('dark_mode',), lambda theme: theme.dark_mode),
+    }
     
     def get(self, request):
+        from nfc_platform.caching import namespace
+        
+        # Pages are cached until any theme changes
         themes = Theme.objects.filter(is_active=True, is_public=True)
-        return Response([
-            {
-                'id': str(theme.id),
-                'name': theme.name,
-                'slug': theme.slug,
-                'description': theme.description,
-                'primary_color': theme.primary_color,
-                'is_premium': theme.is_premium,
-                'dark_mode': theme.dark_mode,
-            }
-            for theme in themes
-        ])
+        return self.list_response(request, themes, cache=namespace('themes'))
+
+
+class CacheStatsAPIView(APIView):
+    """Cache hits, misses and fills per namespace in the worker answering (super admins only)."""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        import os
+        from nfc_platform.caching import stats
+        
+        if not request.user.is_super_admin:
+            return Response({'error': 'You do not have access to cache statistics.'}, status=403)
+        return Response({'pid': os.getpid(), 'namespaces': stats()})
@@ -4,7 +4,7 @@ Admin configuration for cards app.
 
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import NFCCard, CardAssignment
+from .models import NFCCard, CardAssignment, QRAsset, ProvisioningBatch, PrintBatch
 
 
 @admin.register(NFCCard)
@@ -84,3 +84,42 @@ class CardAssignmentAdmin(admin.ModelAdmin):
     search_fields = ('card__url_slug', 'assigned_to__email')
     readonly_fields = ('id', 'assigned_at')
     raw_id_fields = ('card', 'assigned_to', 'assigned_by')
+
+
+@admin.register(QRAsset)
+class QRAssetAdmin(admin.ModelAdmin):
+    """Admin for rendered QR code variants."""
+    
+    list_display = ('card', 'size', 'color', 'format', 'created_at')
+    list_filter = ('format', 'size')
+    search_fields = ('card__url_slug', 'sha256')
+    readonly_fields = ('path', 'sha256', 'created_at')
+    raw_id_fields = ('card',)
+
+
+@admin.register(ProvisioningBatch)
+class ProvisioningBatchAdmin(admin.ModelAdmin):
+    """Admin for bulk provisioning batches."""
+    
+    list_display = ('organization', 'status', 'processed', 'total', 'created_by', 'created_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('organization__name',)
+    readonly_fields = (
+        'id', 'status', 'total', 'processed', 'errors', 'source', 'manifest',
+        'created_at', 'finished_at'
+    )
+    raw_id_fields = ('organization', 'created_by', 'theme')
+
+
+@admin.register(PrintBatch)
+class PrintBatchAdmin(admin.ModelAdmin):
+    """Admin for batch print sheets."""
+    
+    list_display = ('organization', 'status', 'page_size', 'processed', 'total', 'created_by', 'created_at')
+    list_filter = ('status', 'page_size', 'created_at')
+    search_fields = ('organization__name',)
+    readonly_fields = (
+        'id', 'card_ids', 'status', 'total', 'processed', 'error', 'file',
+        'created_at', 'finished_at'
+    )
+    raw_id_fields = ('organization', 'created_by')
@@ -5,7 +5,7 @@ Handles NFC card creation and updates.
 
 from django import forms
 from django.core.exceptions import ValidationError
-from .models import NFCCard
+from .models import NFCCard, PrintBatch
 
 
 class NFCCardForm(forms.ModelForm):
@@ -69,3 +69,85 @@ class NFCCardForm(forms.ModelForm):
                 raise ValidationError('This URL is already taken. Please choose another.')
         
         return slug
+
+
+class ProvisionCardsForm(forms.Form):
+    """Upload form for bulk card provisioning."""
+    
+    csv_file = forms.FileField(
+        label='Cards CSV',
+        help_text='Columns: email (required), card_uid. One row per card.',
+        widget=forms.ClearableFileInput(attrs={
+            'class': 'w-full px-4 py-3 bg-white border border-slate-200 rounded-xl text-sm text-slate-700',
+            'accept': '.csv,text/csv',
+        })
+    )
+    theme = forms.ModelChoiceField(
+        queryset=None,
+        required=False,
+        empty_label='Default theme',
+        widget=forms.Select(attrs={
+            'class': 'w-full px-4 py-3 bg-white border border-slate-200 rounded-xl text-sm text-slate-700 focus:ring-2 focus:ring-primary/20 focus:border-primary outline-none transition-all'
+        })
+    )
+    
+    def __init__(self, *args, **kwargs):
+        from themes.models import Theme
+        super().__init__(*args, **kwargs)
+        self.fields['theme'].queryset = Theme.objects.filter(is_active=True)
+    
+    def clean_csv_file(self):
+        csv_file = self.cleaned_data['csv_file']
+        if not csv_file.name.lower().endswith('.csv'):
+            raise ValidationError('Please upload a .csv file.')
+        return csv_file
+
+
+class PrintSheetForm(forms.Form):
+    """
+    Options for a batch print sheet PDF. The cards come from the posted
+    ``cards`` ids (in that order), or are every card of the organization.
+    """
+    
+    page_size = forms.ChoiceField(
+        choices=PrintBatch.PageSize.choices,
+        initial=PrintBatch.PageSize.A4,
+        widget=forms.Select(attrs={
+            'class': 'w-full px-4 py-3 bg-white border border-slate-200 rounded-xl text-sm text-slate-700 focus:ring-2 focus:ring-primary/20 focus:border-primary outline-none transition-all'
+        })
+    )
+    crop_marks = forms.BooleanField(required=False, initial=True)
+    
+    def __init__(self, *args, organization=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.organization = organization
+    
+    def clean(self):
+        import uuid
+        from django.conf import settings
+        
+        cleaned_data = super().clean()
+        cards = NFCCard.objects.filter(user__organization=self.organization)
+        
+        selected = self.data.getlist('cards') if hasattr(self.data, 'getlist') else []
+        if selected:
+            try:
+                selected = list(dict.fromkeys(str(uuid.UUID(value)) for value in selected))
+            except ValueError:
+                raise ValidationError('Invalid card selection.')
+            found = {
+                str(pk) for pk in cards.filter(pk__in=selected).values_list('pk', flat=True)
+            }
+            card_ids = [card_id for card_id in selected if card_id in found]
+        else:
+            card_ids = [str(pk) for pk in cards.order_by('created_at', 'pk').values_list('pk', flat=True)]
+        
+        if not card_ids:
+            raise ValidationError('There are no cards to print.')
+        if len(card_ids) > settings.PRINT_MAX_CARDS:
+            raise ValidationError(
+                f'A print batch can hold at most {settings.PRINT_MAX_CARDS} cards; '
+                f'{len(card_ids)} were selected.'
+            )
+        cleaned_data['card_ids'] = card_ids
+        return cleaned_data
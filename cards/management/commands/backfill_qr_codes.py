@@ -0,0 +1,65 @@
+"""
+Render and store QR code assets for existing cards.
+
+Usage:
+    python manage.py backfill_qr_codes
+    python manage.py backfill_qr_codes --size 1024 --format svg
+    python manage.py backfill_qr_codes --size 256 --color "#d4af37" --format webp
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef, Value
+from django.db.models.functions import Concat
+
+from cards import qr
+from cards.models import NFCCard, QRAsset
+
+
+class Command(BaseCommand):
+    help = 'Pre-render a QR code variant for every card that does not have it yet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, help=f'Pixel size. Defaults to {qr.DEFAULT_SIZE}.')
+        parser.add_argument('--color', help=f'Hex colour. Defaults to {qr.DEFAULT_COLOR}.')
+        parser.add_argument(
+            '--format',
+            dest='fmt',
+            choices=sorted(qr.FORMATS),
+            help=f'Image format. Defaults to {qr.DEFAULT_FORMAT}.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of cards loaded per query.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            size, color, fmt = qr.normalize_variant(options['size'], options['color'], options['fmt'])
+        except qr.InvalidVariant as e:
+            raise CommandError(str(e))
+        is_default = (size, color, fmt) == qr.normalize_variant()
+
+        # A variant only counts if it encodes the card's current public_url
+        existing = QRAsset.objects.filter(
+            card=OuterRef('pk'),
+            url=Concat(Value(f'{settings.SITE_URL}/u/'), OuterRef('url_slug')),
+            size=size, color=color, format=fmt
+        )
+        cards = NFCCard.objects.exclude(Exists(existing)).only('pk', 'url_slug', 'qr_code')
+
+        created = 0
+        for card in cards.iterator(chunk_size=options['batch_size']):
+            asset = qr.get_asset(card, size, color, fmt)
+            if is_default and card.qr_code.name != asset.path:
+                # Point legacy per-card files at the shared content-addressed copy
+                NFCCard.objects.filter(pk=card.pk).update(qr_code=asset.path)
+            created += 1
+            if created % options['batch_size'] == 0:
+                self.stdout.write(f'{created} QR codes rendered...')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered {created} {size}px {color} {fmt} QR codes.'
+        ))
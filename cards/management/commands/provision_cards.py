@@ -0,0 +1,74 @@
+"""
+Provision cards in bulk for an organization from a CSV file.
+
+The CSV needs an ``email`` column (an organization member per card) and
+may have a ``card_uid`` column.
+
+Usage:
+    python manage.py provision_cards acme-corp cards.csv
+    python manage.py provision_cards acme-corp cards.csv --theme gold --manifest out.csv
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cards.provisioning import ProvisioningError, parse_csv, provision_cards, write_manifest
+
+
+class Command(BaseCommand):
+    help = 'Create cards and assignments for every row of a CSV file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('organization', help='Slug of the organization.')
+        parser.add_argument('csv_path', help='Path to the CSV file.')
+        parser.add_argument('--theme', help='Slug of the theme for the new cards.')
+        parser.add_argument('--created-by', help='Email of the admin recorded as creator.')
+        parser.add_argument(
+            '--manifest',
+            help='Write the manifest CSV to this path instead of standard output.'
+        )
+
+    def handle(self, *args, **options):
+        from accounts.models import User
+        from organizations.models import Organization
+        from themes.models import Theme
+
+        organization = Organization.objects.filter(slug=options['organization']).first()
+        if organization is None:
+            raise CommandError(f'No organization with slug "{options["organization"]}".')
+
+        theme = None
+        if options['theme']:
+            theme = Theme.objects.filter(slug=options['theme']).first()
+            if theme is None:
+                raise CommandError(f'No theme with slug "{options["theme"]}".')
+
+        created_by = None
+        if options['created_by']:
+            created_by = User.objects.filter(email=options['created_by']).first()
+            if created_by is None:
+                raise CommandError(f'No user with email "{options["created_by"]}".')
+
+        try:
+            with open(options['csv_path'], encoding='utf-8-sig', newline='') as source:
+                rows = parse_csv(source.read())
+            manifest = provision_cards(
+                organization, rows,
+                created_by=created_by, theme=theme, progress=self.report
+            )
+        except OSError as e:
+            raise CommandError(str(e))
+        except ProvisioningError as e:
+            raise CommandError('\n'.join(e.errors))
+
+        if options['manifest']:
+            with open(options['manifest'], 'w', encoding='utf-8', newline='') as out:
+                out.write(write_manifest(manifest))
+        else:
+            self.stdout.write(write_manifest(manifest), ending='')
+
+        self.stderr.write(self.style.SUCCESS(
+            f'Provisioned {len(manifest)} cards for {organization}.'
+        ))
+
+    def report(self, done, total):
+        self.stderr.write(f'{done}/{total} cards provisioned...')
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0004_alter_nfccard_url_slug_help_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QRAsset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size', models.PositiveIntegerField()),
+                ('color', models.CharField(max_length=7)),
+                ('format', models.CharField(max_length=4)),
+                ('path', models.CharField(max_length=255)),
+                ('sha256', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='qr_assets', to='cards.nfccard')),
+            ],
+            options={
+                'verbose_name': 'QR asset',
+                'verbose_name_plural': 'QR assets',
+                'unique_together': {('card', 'size', 'color', 'format')},
+            },
+        ),
+    ]
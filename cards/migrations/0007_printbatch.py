@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:05
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0006_provisioningbatch'),
+        ('organizations', '0002_quota_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrintBatch',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('card_ids', models.JSONField(default=list)),
+                ('page_size', models.CharField(choices=[('A4', 'A4'), ('LETTER', 'Letter')], default='A4', max_length=10)),
+                ('crop_marks', models.BooleanField(default=True)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='PENDING', max_length=20)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('processed', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('file', models.FileField(blank=True, upload_to='print/')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='print_batches', to=settings.AUTH_USER_MODEL)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='print_batches', to='organizations.organization')),
+            ],
+            options={
+                'verbose_name': 'print batch',
+                'verbose_name_plural': 'print batches',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
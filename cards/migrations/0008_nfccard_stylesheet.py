@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0007_printbatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='nfccard',
+            name='stylesheet',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:36
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+# Interaction type -> NFCCard counter column
+CARD_COLUMNS = {
+    'VIEW': 'total_views',
+    'CONTACT_SAVE': 'contact_saves',
+    'PHONE_CLICK': 'phone_clicks',
+    'EMAIL_CLICK': 'email_clicks',
+    'WEBSITE_CLICK': 'website_clicks',
+    'SOCIAL_CLICK': 'social_clicks',
+    'SHARE': 'shares',
+    'QR_DOWNLOAD': 'qr_downloads',
+    'CUSTOM_LINK_CLICK': 'custom_link_clicks',
+}
+
+
+def count_events(apps, schema_editor):
+    using = schema_editor.connection.alias
+    NFCCard = apps.get_model('cards', 'NFCCard')
+    ProfileAnalytics = apps.get_model('analytics', 'ProfileAnalytics')
+
+    rows = ProfileAnalytics.objects.using(using).order_by().values_list(
+        'card_id', 'interaction_type'
+    ).annotate(count=Count('pk'))
+    totals = {}
+    for card_id, interaction_type, count in rows:
+        if interaction_type in CARD_COLUMNS:
+            totals.setdefault(card_id, {})[CARD_COLUMNS[interaction_type]] = count
+
+    for card_id, columns in totals.items():
+        NFCCard.objects.using(using).filter(pk=card_id).update(**columns)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0008_nfccard_stylesheet'),
+        ('analytics', '0008_hourlyanalyticssummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='nfccard',
+            name='contact_saves',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='nfccard',
+            name='custom_link_clicks',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='nfccard',
+            name='email_clicks',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='nfccard',
+            name='phone_clicks',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='nfccard',
+            name='qr_downloads',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='nfccard',
+            name='shares',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='nfccard',
+            name='social_clicks',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='nfccard',
+            name='total_views',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='nfccard',
+            name='website_clicks',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_events, migrations.RunPython.noop),
+    ]
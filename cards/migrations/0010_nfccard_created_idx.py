@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0009_nfccard_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='nfccard',
+            index=models.Index(fields=['created_at', 'id'], name='cards_nfccard_created_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+
+def drop_unkeyed_assets(apps, schema_editor):
+    # Rows from before the URL was part of the key may encode an old slug.
+    # They are a render cache: drop them and let get_asset render again.
+    QRAsset = apps.get_model('cards', 'QRAsset')
+    QRAsset.objects.filter(url='').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0010_nfccard_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='qrasset',
+            name='url',
+            field=models.CharField(default='', max_length=255),
+            preserve_default=False,
+        ),
+        migrations.RunPython(drop_unkeyed_assets, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='qrasset',
+            unique_together={('card', 'url', 'size', 'color', 'format')},
+        ),
+    ]
@@ -4,21 +4,19 @@ Each card has a unique slug for public access.
 """
 
 import uuid
-import secrets
-import string
-from django.db import models
+from django.db import models, transaction
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
 def generate_card_slug():
-    """Generate a unique, URL-safe slug for NFC cards."""
-    alphabet = string.ascii_lowercase + string.digits
-    while True:
-        slug = ''.join(secrets.choice(alphabet) for _ in range(8))
-        if not NFCCard.objects.filter(url_slug=slug).exists():
-            return slug
+    """
+    Generate a random, URL-safe slug for NFC cards.
+    Uniqueness is enforced when the card is inserted (see cards/slugs.py).
+    """
+    from .slugs import random_slug
+    return random_slug()
 
 
 class NFCCard(models.Model):
@@ -76,6 +74,8 @@ class NFCCard(models.Model):
         related_name='cards'
     )
     custom_css = models.TextField(blank=True)
+    # Digest of the compiled custom_css (see themes/stylesheets.py)
+    stylesheet = models.CharField(max_length=64, blank=True, editable=False)
     
     # Status and dates
     status = models.CharField(
@@ -101,57 +101,112 @@ class NFCCard(models.Model):
         null=True
     )
     
+    # Interaction totals, added to by analytics/live.py and recomputed by
+    # `manage.py rebuild_card_counters`; save() never writes them
+    total_views = models.PositiveBigIntegerField(default=0, editable=False)
+    contact_saves = models.PositiveBigIntegerField(default=0, editable=False)
+    phone_clicks = models.PositiveBigIntegerField(default=0, editable=False)
+    email_clicks = models.PositiveBigIntegerField(default=0, editable=False)
+    website_clicks = models.PositiveBigIntegerField(default=0, editable=False)
+    social_clicks = models.PositiveBigIntegerField(default=0, editable=False)
+    shares = models.PositiveBigIntegerField(default=0, editable=False)
+    qr_downloads = models.PositiveBigIntegerField(default=0, editable=False)
+    custom_link_clicks = models.PositiveBigIntegerField(default=0, editable=False)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    COUNTER_FIELDS = (
+        'total_views', 'contact_saves', 'phone_clicks', 'email_clicks',
+        'website_clicks', 'social_clicks', 'shares', 'qr_downloads',
+        'custom_link_clicks',
+    )
+    
     class Meta:
         verbose_name = _('NFC card')
         verbose_name_plural = _('NFC cards')
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the dashboard listings
+            models.Index(fields=['created_at', 'id'], name='cards_nfccard_created_idx'),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the owner so save() can move the card between org quotas
+        if 'user_id' in instance.__dict__:
+            instance._loaded_user_id = instance.user_id
+        # And the slug, so save() can drop the cached card at the old one
+        if 'url_slug' in instance.__dict__:
+            instance._loaded_url_slug = instance.url_slug
+        return instance
     
     def save(self, *args, **kwargs):
-        """Auto-generate slug and QR code."""
-        if not self.url_slug:
-            # Generate a random slug for public profile access
-            self.url_slug = generate_card_slug()
-            
-        # Auto-generate QR code if missing
-        if not self.qr_code and self.url_slug:
-            try:
-                import qrcode
-                from io import BytesIO
-                from django.core.files import File
-                from django.conf import settings
-
-                # Create QR code instance
-                qr = qrcode.QRCode(
-                    version=1,
-                    error_correction=qrcode.constants.ERROR_CORRECT_M,
-                    box_size=10,
-                    border=4,
-                )
-                
-                # Add data (public URL)
-                url = f"{settings.SITE_URL}/u/{self.url_slug}"
-                qr.add_data(url)
-                qr.make(fit=True)
-
-                # Create image
-                img = qr.make_image(fill_color="black", back_color="white")
-                
-                # Save to buffer
-                buffer = BytesIO()
-                img.save(buffer, format='PNG')
-                
-                # Save to model field
-                filename = f'qr_{self.url_slug}.png'
-                self.qr_code.save(filename, File(buffer), save=False)
-            except Exception as e:
-                # Log error or silence it to prevent save failure
-                print(f"Error generating QR code: {e}")
-
-        super().save(*args, **kwargs)
+        """Auto-generate slug and queue QR code generation."""
+        creating = self._state.adding
+
+        # Partial saves still bump updated_at, which versions cached pages
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not creating:
+            # Counters are incremented in the database; don't write back stale copies
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+                and field.attname not in deferred
+            ]
+        if update_fields is not None and 'updated_at' not in update_fields:
+            kwargs['update_fields'] = update_fields = [*update_fields, 'updated_at']
+
+        if update_fields is None or 'custom_css' in update_fields:
+            from themes.stylesheets import digest, minify, store
+            css = minify(self.custom_css)
+            if (digest(css) if css else '') != self.stylesheet:
+                self.stylesheet = store(css) if css else ''
+                if update_fields is not None:
+                    kwargs['update_fields'] = [*update_fields, 'stylesheet']
+
+        from organizations import quotas
+        previous_user_id = None if creating else getattr(self, '_loaded_user_id', self.user_id)
+
+        with transaction.atomic():
+            if self.url_slug:
+                super().save(*args, **kwargs)
+            else:
+                # Insert with a random slug; retry only on an actual collision
+                from .slugs import insert_unique, random_slugs
+                base_save = super().save
+                insert_unique(self, 'url_slug', random_slugs(), lambda: base_save(*args, **kwargs))
+
+            if previous_user_id != self.user_id:
+                quotas.card_moved(previous_user_id, self.user_id)
+        self._loaded_user_id = self.user_id
+        previous_slug = getattr(self, '_loaded_url_slug', None)
+        self._loaded_url_slug = self.url_slug
+        slug_changed = previous_slug is not None and previous_slug != self.url_slug
+        if slug_changed and self.qr_code:
+            # The stored QR code encodes the old /u/<slug> URL
+            NFCCard.objects.filter(pk=self.pk).update(qr_code='')
+            self.qr_code = ''
+
+        # Render the QR code off the request path (see cards/tasks.py)
+        if (creating or slug_changed) and not self.qr_code:
+            from jobs.models import Job
+            from .tasks import generate_qr_code
+            job = generate_qr_code.enqueue(self.pk)
+            if job.status == Job.Status.SUCCEEDED:
+                self.qr_code.name = job.result
+
+        from .resolver import invalidate_slugs
+        invalidate_slugs({self.url_slug, previous_slug})
+    
+    def delete(self, *args, **kwargs):
+        from .resolver import invalidate_slugs
+        invalidate_slugs([self.url_slug])
+        return super().delete(*args, **kwargs)
     
     def __str__(self):
         return f"Card {self.url_slug}"
@@ -183,7 +238,7 @@ class NFCCard(models.Model):
     @property
     def view_count(self):
         """Get total view count for this card."""
-        return self.analytics.filter(interaction_type='VIEW').count()
+        return self.total_views
     
     @property
     def public_url(self):
@@ -224,3 +279,161 @@ class CardAssignment(models.Model):
     
     def __str__(self):
         return f"Card {self.card.url_slug} assigned to {self.assigned_to.email}"
+
+
+class QRAsset(models.Model):
+    """
+    A rendered QR code variant for a card.
+    Files are content-addressed, so identical renders share one object.
+    The encoded URL is part of the variant: a new slug or SITE_URL renders anew.
+    """
+    
+    card = models.ForeignKey(
+        NFCCard,
+        on_delete=models.CASCADE,
+        related_name='qr_assets'
+    )
+    url = models.CharField(max_length=255)
+    size = models.PositiveIntegerField()
+    color = models.CharField(max_length=7)
+    format = models.CharField(max_length=4)
+    path = models.CharField(max_length=255)
+    sha256 = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('QR asset')
+        verbose_name_plural = _('QR assets')
+        unique_together = ['card', 'url', 'size', 'color', 'format']
+    
+    def __str__(self):
+        return f"QR {self.card.url_slug} {self.size}px {self.color} {self.format}"
+
+
+class ProvisioningBatch(models.Model):
+    """
+    A bulk card provisioning run for an organization.
+    Tracks progress and keeps the uploaded CSV and the resulting manifest.
+    """
+    
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', _('Pending')
+        RUNNING = 'RUNNING', _('Running')
+        COMPLETED = 'COMPLETED', _('Completed')
+        FAILED = 'FAILED', _('Failed')
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    organization = models.ForeignKey(
+        'organizations.Organization',
+        on_delete=models.CASCADE,
+        related_name='provisioning_batches'
+    )
+    created_by = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='provisioning_batches'
+    )
+    theme = models.ForeignKey(
+        'themes.Theme',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True
+    )
+    
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    
+    source = models.FileField(upload_to='provisioning/sources/')
+    manifest = models.FileField(upload_to='provisioning/manifests/', blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = _('provisioning batch')
+        verbose_name_plural = _('provisioning batches')
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Provisioning {self.organization} ({self.processed}/{self.total})"
+    
+    @property
+    def progress(self):
+        """Percentage of rows processed."""
+        if not self.total:
+            return 0
+        return int(self.processed * 100 / self.total)
+
+
+class PrintBatch(models.Model):
+    """
+    An imposed print sheet PDF of many cards, rendered in the background.
+    """
+    
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', _('Pending')
+        RUNNING = 'RUNNING', _('Running')
+        COMPLETED = 'COMPLETED', _('Completed')
+        FAILED = 'FAILED', _('Failed')
+    
+    class PageSize(models.TextChoices):
+        A4 = 'A4', _('A4')
+        LETTER = 'LETTER', _('Letter')
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    organization = models.ForeignKey(
+        'organizations.Organization',
+        on_delete=models.CASCADE,
+        related_name='print_batches'
+    )
+    created_by = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='print_batches'
+    )
+    
+    # Cards in print order
+    card_ids = models.JSONField(default=list)
+    page_size = models.CharField(
+        max_length=10,
+        choices=PageSize.choices,
+        default=PageSize.A4
+    )
+    crop_marks = models.BooleanField(default=True)
+    
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    
+    file = models.FileField(upload_to='print/', blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = _('print batch')
+        verbose_name_plural = _('print batches')
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Print sheet {self.organization} ({self.processed}/{self.total})"
+    
+    @property
+    def progress(self):
+        """Percentage of cards laid out."""
+        if not self.total:
+            return 0
+        return int(self.processed * 100 / self.total)
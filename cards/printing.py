@@ -0,0 +1,451 @@
+"""
+Batch print sheets.
+
+Lays cards out N-up on A4 or Letter sheets for a print shop: each card
+is drawn at CR80 size with its background extended into a bleed, crop
+marks at the trim lines, and the card's stored QR variant (rendered once
+through cards/qr.py, never per sheet). Cards are read from the database
+a page group at a time. ReportLab keeps a document's pages until it is
+saved, so each group is rendered as a PDF of its own and SheetWriter
+copies its pages into the output file before the next group is drawn:
+memory holds one group however large the batch. The PDF is written to a
+temporary file before being saved to storage.
+
+Used by PrintBatch and the ``render_print_batch`` task. The paragraph and
+table styles below are shared with the single-card export.
+"""
+
+import functools
+import io
+import tempfile
+from itertools import islice
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+
+# CR80 card, in millimetres
+CARD_WIDTH = 85.6
+CARD_HEIGHT = 53.98
+
+BLEED = 3
+GUTTER = 8          # between the bleed boxes of neighbouring cards
+MARK_OFFSET = 1     # gap between a bleed edge and its crop mark
+MARK_LENGTH = 3
+SAFE_MARGIN = 4     # keep text and QR this far inside the trim
+
+QR_WIDTH = 30
+
+# Pages laid out per database round trip
+PAGES_PER_CHUNK = 10
+
+PRINT_COLUMNS = (
+    'pk', 'url_slug', 'card_uid', 'user__email', 'user__profile__full_name',
+    'user__profile__designation', 'user__profile__company',
+    'theme__background_color', 'theme__text_color', 'theme__primary_color',
+)
+
+DEFAULT_BACKGROUND = '#ffffff'
+DEFAULT_TEXT = '#0f172a'
+DEFAULT_ACCENT = '#D4AF37'
+
+
+@functools.lru_cache(maxsize=None)
+def styles():
+    """
+    Paragraph and table styles shared by the card PDFs.
+    Returns a dict with 'title', 'heading' and 'table'.
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import TableStyle
+
+    sample = getSampleStyleSheet()
+    return {
+        'title': ParagraphStyle(
+            'Title',
+            parent=sample['Heading1'],
+            fontSize=24,
+            alignment=TA_CENTER,
+            spaceAfter=20,
+            textColor=colors.HexColor(DEFAULT_ACCENT)
+        ),
+        'heading': ParagraphStyle(
+            'CustomHeading',
+            parent=sample['Heading2'],
+            fontSize=14,
+            spaceAfter=10,
+            textColor=colors.HexColor('#333333')
+        ),
+        'table': TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f7f7f7')),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+            ('TOPPADDING', (0, 0), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#dddddd')),
+        ]),
+    }
+
+
+def page_dimensions(page_size):
+    """Return the (width, height) in points of a PrintBatch page size."""
+    from reportlab.lib.pagesizes import A4, LETTER
+
+    return {'A4': A4, 'LETTER': LETTER}[page_size]
+
+
+class SheetLayout:
+    """Where the cards go on a sheet: a centred grid of bleed boxes."""
+
+    def __init__(self, page_size):
+        from reportlab.lib.units import mm
+
+        self.width, self.height = page_dimensions(page_size)
+        self.card_width = CARD_WIDTH * mm
+        self.card_height = CARD_HEIGHT * mm
+        self.bleed = BLEED * mm
+        self.gutter = GUTTER * mm
+        self.margin = (MARK_OFFSET + MARK_LENGTH) * mm
+
+        slot_width = self.card_width + 2 * self.bleed
+        slot_height = self.card_height + 2 * self.bleed
+        self.columns = int(
+            (self.width - 2 * self.margin + self.gutter) // (slot_width + self.gutter)
+        )
+        self.rows = int(
+            (self.height - 2 * self.margin + self.gutter) // (slot_height + self.gutter)
+        )
+        if not self.columns or not self.rows:
+            raise ValueError(f'A card does not fit on a {page_size} sheet.')
+
+        grid_width = self.columns * (slot_width + self.gutter) - self.gutter
+        grid_height = self.rows * (slot_height + self.gutter) - self.gutter
+        self.left = (self.width - grid_width) / 2 + self.bleed
+        self.top = (self.height + grid_height) / 2 - self.bleed
+        self.step_x = slot_width + self.gutter
+        self.step_y = slot_height + self.gutter
+
+    @property
+    def per_page(self):
+        return self.columns * self.rows
+
+    def trim_origin(self, index):
+        """Bottom-left corner of the trim box of the ``index``-th card on a sheet."""
+        row, column = divmod(index, self.columns)
+        x = self.left + column * self.step_x
+        y = self.top - row * self.step_y - self.card_height
+        return x, y
+
+
+def _color(value, default):
+    from reportlab.lib import colors
+
+    try:
+        return colors.HexColor(value or default)
+    except ValueError:
+        return colors.HexColor(default)
+
+
+def _fit(canvas, text, font, size, width, min_size=5):
+    """Shrink ``text`` to ``width`` points, truncating below ``min_size``."""
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    while size > min_size and stringWidth(text, font, size) > width:
+        size -= 0.5
+    while text and stringWidth(text, font, size) > width:
+        text = text[:-2] + '…' if len(text) > 1 else ''
+    canvas.setFont(font, size)
+    return text
+
+
+def draw_crop_marks(canvas, layout, x, y):
+    """Draw crop marks at the four trim corners of the card at (x, y)."""
+    from reportlab.lib.units import mm
+
+    near = layout.bleed + MARK_OFFSET * mm
+    far = near + MARK_LENGTH * mm
+    right, top = x + layout.card_width, y + layout.card_height
+
+    canvas.setStrokeColorRGB(0, 0, 0)
+    canvas.setLineWidth(0.25)
+    for edge_x, direction in ((x, -1), (right, 1)):
+        for edge_y in (y, top):
+            # Horizontal mark along the trim line, then the vertical one
+            canvas.line(edge_x + direction * near, edge_y, edge_x + direction * far, edge_y)
+    for edge_y, direction in ((y, -1), (top, 1)):
+        for edge_x in (x, right):
+            canvas.line(edge_x, edge_y + direction * near, edge_x, edge_y + direction * far)
+
+
+def draw_card(canvas, layout, x, y, card, qr_image):
+    """Draw one card face with its trim box's bottom-left corner at (x, y)."""
+    from reportlab.lib.units import mm
+
+    (pk, url_slug, card_uid, email, full_name, designation, company,
+     background, text, accent) = card
+    width, height, bleed = layout.card_width, layout.card_height, layout.bleed
+
+    # Background and accent stripe run into the bleed
+    canvas.setFillColor(_color(background, DEFAULT_BACKGROUND))
+    canvas.rect(x - bleed, y - bleed, width + 2 * bleed, height + 2 * bleed, stroke=0, fill=1)
+    canvas.setFillColor(_color(accent, DEFAULT_ACCENT))
+    canvas.rect(x - bleed, y + height - 3 * mm, width + 2 * bleed, 3 * mm + bleed, stroke=0, fill=1)
+
+    safe = SAFE_MARGIN * mm
+    qr_width = QR_WIDTH * mm
+    qr_x = x + width - safe - qr_width
+    qr_y = y + (height - qr_width) / 2 - 2 * mm
+    if qr_image is not None:
+        canvas.drawImage(qr_image, qr_x, qr_y, width=qr_width, height=qr_width)
+
+    canvas.setFillColor(_color(text, DEFAULT_TEXT))
+    slug = _fit(canvas, url_slug, 'Courier', 6, qr_width)
+    canvas.drawCentredString(qr_x + qr_width / 2, y + safe - 1 * mm, slug)
+
+    column = qr_x - x - safe - 3 * mm
+    line_y = y + height - safe - 6 * mm
+    name = _fit(canvas, full_name or email or '', 'Helvetica-Bold', 11, column)
+    canvas.drawString(x + safe, line_y, name)
+    for detail in (designation, company):
+        if detail:
+            line_y -= 4 * mm
+            canvas.drawString(x + safe, line_y, _fit(canvas, detail, 'Helvetica', 8, column))
+
+    if card_uid:
+        canvas.drawString(x + safe, y + safe - 1 * mm, _fit(canvas, card_uid, 'Courier', 6, column))
+
+
+def qr_images(cards):
+    """
+    Map card id to an ImageReader of its print QR variant. Stored variants
+    are looked up with one query; missing ones are rendered and stored.
+    """
+    from PIL import Image
+    from reportlab.lib.utils import ImageReader
+    from . import qr
+    from .models import NFCCard, QRAsset
+
+    size, color, fmt = qr.normalize_variant(settings.PRINT_QR_SIZE, None, 'png')
+    cards = [NFCCard(pk=card[0], url_slug=card[1]) for card in cards]
+    assets = {
+        (asset.card_id, asset.url): asset
+        for asset in QRAsset.objects.filter(
+            card_id__in=[card.pk for card in cards], size=size, color=color, format=fmt
+        )
+    }
+
+    images = {}
+    for card in cards:
+        # A variant rendered for an earlier slug or SITE_URL does not match
+        asset = assets.get((card.pk, card.public_url)) or qr.get_asset(card, size, color, fmt)
+        # The variant is black on white: greyscale embeds a third of the data
+        image = Image.open(io.BytesIO(qr.read_asset(asset))).convert('L')
+        images[card.pk] = ImageReader(image)
+    return images
+
+
+class SheetWriter:
+    """
+    Write a PDF to the seekable binary file ``output`` a page group at a
+    time. ``append`` copies the pages of a complete PDF (and everything
+    they reference) to the output, renumbered, as soon as it is given;
+    ``close`` writes the page tree, catalog and cross-reference table.
+
+    Usage:
+        writer = SheetWriter(output, title='Sheets')
+        writer.append(group_pdf)
+        writer.close()
+    """
+
+    def __init__(self, output, title=''):
+        self.output = output
+        self.title = title
+        self.offsets = []
+        self.kids = []
+        self.pages = self._reserve()
+        output.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def _reserve(self):
+        self.offsets.append(None)
+        return len(self.offsets)
+
+    def _ref(self, number):
+        from pypdf.generic import IndirectObject
+
+        # Owned by this writer, which is how _remap tells them apart
+        return IndirectObject(number, 0, self)
+
+    def _write(self, number, obj):
+        self.offsets[number - 1] = self.output.tell()
+        self.output.write(b'%d 0 obj\n' % number)
+        obj.write_to_stream(self.output)
+        self.output.write(b'\nendobj\n')
+
+    def append(self, source):
+        """Copy every page of the PDF in the binary file ``source``."""
+        from pypdf import PdfReader
+        from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject
+
+        numbers = {}
+        pending = []
+
+        def renumber(reference):
+            key = (reference.idnum, reference.generation)
+            if key not in numbers:
+                numbers[key] = self._reserve()
+                pending.append((numbers[key], reference))
+            return self._ref(numbers[key])
+
+        def remap(obj):
+            # Objects are the reader's own and discarded after this call,
+            # so references are replaced in place
+            if isinstance(obj, IndirectObject):
+                return obj if obj.pdf is self else renumber(obj)
+            if isinstance(obj, DictionaryObject):
+                for key, value in list(obj.items()):
+                    obj[key] = remap(value)
+            elif isinstance(obj, ArrayObject):
+                for index, value in enumerate(obj):
+                    obj[index] = remap(value)
+            return obj
+
+        reader = PdfReader(source)
+        for page in reader.pages:
+            # pypdf has already copied inherited attributes onto the page
+            self.kids.append(renumber(page.indirect_reference))
+        while pending:
+            number, reference = pending.pop()
+            obj = reference.get_object()
+            if isinstance(obj, DictionaryObject) and obj.get('/Type') == '/Page':
+                obj[NameObject('/Parent')] = self._ref(self.pages)
+            self._write(number, remap(obj))
+
+    def close(self):
+        """Finish the document. Returns the number of pages."""
+        from pypdf.generic import (
+            ArrayObject, DictionaryObject, NameObject, NumberObject, TextStringObject
+        )
+
+        self._write(self.pages, DictionaryObject({
+            NameObject('/Type'): NameObject('/Pages'),
+            NameObject('/Kids'): ArrayObject(self.kids),
+            NameObject('/Count'): NumberObject(len(self.kids)),
+        }))
+        catalog, info = self._reserve(), self._reserve()
+        self._write(catalog, DictionaryObject({
+            NameObject('/Type'): NameObject('/Catalog'),
+            NameObject('/Pages'): self._ref(self.pages),
+        }))
+        self._write(info, DictionaryObject({
+            NameObject('/Title'): TextStringObject(self.title),
+        }))
+
+        xref = self.output.tell()
+        self.output.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(self.offsets) + 1))
+        for offset in self.offsets:
+            self.output.write(b'%010d 00000 n \n' % offset)
+        self.output.write(b'trailer\n')
+        DictionaryObject({
+            NameObject('/Size'): NumberObject(len(self.offsets) + 1),
+            NameObject('/Root'): self._ref(catalog),
+            NameObject('/Info'): self._ref(info),
+        }).write_to_stream(self.output)
+        self.output.write(b'\nstartxref\n%d\n%%%%EOF\n' % xref)
+        return len(self.kids)
+
+
+def render_sheets(cards, output, page_size='A4', crop_marks=True, progress=None):
+    """
+    Draw ``cards`` (an iterable of PRINT_COLUMNS rows, in print order)
+    onto sheets written to the binary file ``output``, PAGES_PER_CHUNK
+    pages at a time. Calls ``progress(done)`` after each page group.
+    Returns the number of cards.
+    """
+    from reportlab.pdfgen.canvas import Canvas
+
+    layout = SheetLayout(page_size)
+    writer = SheetWriter(output, title='Card print sheets')
+
+    cards = iter(cards)
+    done = 0
+    while True:
+        group = list(islice(cards, layout.per_page * PAGES_PER_CHUNK))
+        if not group:
+            break
+        images = qr_images(group)
+        chunk = io.BytesIO()
+        canvas = Canvas(chunk, pagesize=(layout.width, layout.height), pageCompression=1)
+        for start in range(0, len(group), layout.per_page):
+            for index, card in enumerate(group[start:start + layout.per_page]):
+                x, y = layout.trim_origin(index)
+                draw_card(canvas, layout, x, y, card, images.get(card[0]))
+                if crop_marks:
+                    draw_crop_marks(canvas, layout, x, y)
+            canvas.showPage()
+        canvas.save()
+        del canvas, images
+
+        chunk.seek(0)
+        writer.append(chunk)
+        done += len(group)
+        if progress:
+            progress(done)
+
+    writer.close()
+    return done
+
+
+def batch_cards(batch, chunk_size=500):
+    """
+    Yield the batch's cards in print order as rows of PRINT_COLUMNS,
+    querying ``chunk_size`` ids at a time.
+    """
+    from .models import NFCCard
+
+    for start in range(0, len(batch.card_ids), chunk_size):
+        ids = batch.card_ids[start:start + chunk_size]
+        rows = {
+            str(row[0]): row
+            for row in NFCCard.objects.filter(
+                pk__in=ids, user__organization=batch.organization_id
+            ).values_list(*PRINT_COLUMNS)
+        }
+        # Cards deleted since the batch was created are skipped
+        yield from (rows[card_id] for card_id in ids if card_id in rows)
+
+
+def run_batch(batch):
+    """Render a PrintBatch to a PDF in storage, recording progress."""
+    from .models import PrintBatch
+
+    def progress(done):
+        PrintBatch.objects.filter(pk=batch.pk).update(processed=done)
+
+    batch.status = PrintBatch.Status.RUNNING
+    batch.save(update_fields=['status'])
+
+    try:
+        batch.total = len(batch.card_ids)
+        batch.save(update_fields=['total'])
+        with tempfile.TemporaryFile() as output:
+            batch.processed = render_sheets(
+                batch_cards(batch), output,
+                page_size=batch.page_size, crop_marks=batch.crop_marks, progress=progress
+            )
+            output.seek(0)
+            batch.file.save(f'{batch.pk}.pdf', File(output), save=False)
+    except Exception as e:
+        batch.status = PrintBatch.Status.FAILED
+        batch.error = str(e)
+        batch.finished_at = timezone.now()
+        batch.save(update_fields=['status', 'error', 'finished_at'])
+        raise
+
+    batch.status = PrintBatch.Status.COMPLETED
+    batch.finished_at = timezone.now()
+    batch.save(update_fields=['status', 'processed', 'file', 'finished_at'])
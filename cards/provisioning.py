@@ -0,0 +1,249 @@
+"""
+Bulk card provisioning for enterprise orders.
+
+A CSV with one row per card (``email`` of the organization member the
+card is for, plus an optional ``card_uid`` column) is validated up front
+with a handful of set-based queries and the organization's quota
+counter, then cards and their assignments are inserted with
+``bulk_create`` in chunks, each in its own transaction. Each chunk
+reserves its cards against the quota again as it inserts them, so
+concurrent batches or card creation cannot overshoot it together. Slugs
+come from the bulk allocator and QR codes are queued rather than rendered.
+
+Used by ``manage.py provision_cards`` and, through ProvisioningBatch and
+the ``provision_batch`` task, by the admin dashboard.
+"""
+
+import csv
+import io
+
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+
+COLUMNS = ('email', 'card_uid')
+MANIFEST_COLUMNS = ('card_uid', 'email', 'url_slug', 'public_url', 'card_id')
+
+CHUNK_SIZE = 500
+
+
+class ProvisioningError(Exception):
+    """Raised when a CSV cannot be provisioned; ``errors`` lists why."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__('; '.join(self.errors))
+
+
+def parse_csv(text):
+    """
+    Parse CSV text into row dicts (with their line numbers).
+    Raises ProvisioningError for a missing header or empty emails.
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    fields = [name.strip().lower() for name in reader.fieldnames or []]
+    if 'email' not in fields:
+        raise ProvisioningError(['The CSV needs an "email" column.'])
+    reader.fieldnames = fields
+
+    rows, errors = [], []
+    for line, raw in enumerate(reader, start=2):
+        row = {name: (raw.get(name) or '').strip() for name in COLUMNS}
+        if not any(row.values()):
+            continue
+        if not row['email']:
+            errors.append(f'Line {line}: email is required.')
+        row['email'] = row['email'].lower()
+        row['line'] = line
+        rows.append(row)
+
+    if errors:
+        raise ProvisioningError(errors)
+    if not rows:
+        raise ProvisioningError(['The CSV has no rows.'])
+    return rows
+
+
+def validate(organization, rows):
+    """
+    Check rows against the organization with set-based queries: assignees
+    must be members, card UIDs must be new, and the card quota must hold.
+    Returns {email: user}. Raises ProvisioningError.
+    """
+    from accounts.models import User
+    from organizations import quotas
+    from .models import NFCCard
+
+    errors = []
+
+    emails = {row['email'] for row in rows}
+    members = {
+        user.email.lower(): user
+        for user in User.objects.filter(organization=organization, email__in=emails)
+    }
+    for row in rows:
+        if row['email'] not in members:
+            errors.append(f"Line {row['line']}: {row['email']} is not a member of {organization}.")
+
+    seen = set()
+    for row in rows:
+        uid = row['card_uid']
+        if uid and uid in seen:
+            errors.append(f"Line {row['line']}: card UID {uid} appears more than once.")
+        seen.add(uid)
+    uids = [row['card_uid'] for row in rows if row['card_uid']]
+    existing = set(NFCCard.objects.filter(card_uid__in=uids).values_list('card_uid', flat=True))
+    for row in rows:
+        if row['card_uid'] in existing:
+            errors.append(f"Line {row['line']}: card UID {row['card_uid']} is already registered.")
+
+    organization.refresh_from_db(fields=['card_count', 'max_cards'])
+    try:
+        quotas.check_cards(organization, len(rows))
+    except quotas.QuotaExceeded as e:
+        errors.append(str(e))
+
+    if errors:
+        raise ProvisioningError(errors)
+    return members
+
+
+def provision_cards(organization, rows, created_by=None, theme=None, progress=None,
+                    chunk_size=CHUNK_SIZE):
+    """
+    Create a card and an assignment for every row and queue their QR codes.
+    Calls ``progress(done, total)`` after each chunk and returns the
+    manifest rows. Raises ProvisioningError if validation fails, or if a
+    chunk no longer fits the quota (earlier chunks stay provisioned).
+    """
+    from organizations import quotas
+
+    members = validate(organization, rows)
+    total = len(rows)
+    manifest = []
+
+    for start in range(0, total, chunk_size):
+        chunk = rows[start:start + chunk_size]
+        try:
+            cards = _insert_chunk(organization, chunk, members, created_by, theme)
+        except quotas.QuotaExceeded as e:
+            raise ProvisioningError([f'Stopped after {start} cards: {e}'])
+        manifest.extend(
+            {
+                'card_uid': card.card_uid or '',
+                'email': row['email'],
+                'url_slug': card.url_slug,
+                'public_url': card.public_url,
+                'card_id': str(card.pk),
+            }
+            for row, card in zip(chunk, cards)
+        )
+        if progress:
+            progress(start + len(chunk), total)
+
+    return manifest
+
+
+def _insert_chunk(organization, chunk, members, created_by, theme):
+    """
+    Insert one chunk of cards in a transaction, retrying on a slug
+    collision. Raises QuotaExceeded if the chunk does not fit.
+    """
+    from jobs.queue import enqueue_many
+    from organizations import quotas
+    from .models import NFCCard, CardAssignment
+    from .slugs import MAX_ATTEMPTS, allocate_slugs
+    from .tasks import generate_qr_code
+
+    now = timezone.now()
+    for attempt in range(MAX_ATTEMPTS):
+        slugs = allocate_slugs(len(chunk))
+        cards = [
+            NFCCard(
+                card_uid=row['card_uid'] or None,
+                url_slug=slug,
+                user=members[row['email']],
+                created_by=created_by,
+                theme=theme,
+                status=NFCCard.Status.ACTIVE,
+                activation_date=now,
+            )
+            for row, slug in zip(chunk, slugs)
+        ]
+        try:
+            with transaction.atomic():
+                # bulk_create skips NFCCard.save(), so count the cards here
+                quotas.reserve_cards(organization, len(cards))
+                NFCCard.objects.bulk_create(cards)
+                CardAssignment.objects.bulk_create([
+                    CardAssignment(
+                        card=card,
+                        assigned_to=card.user,
+                        assigned_by=created_by,
+                        notes='Bulk provisioning'
+                    )
+                    for card in cards
+                ])
+                enqueue_many(generate_qr_code.task_name, [[card.pk] for card in cards])
+        except IntegrityError:
+            # Only a slug taken between allocation and insert is retried
+            if attempt == MAX_ATTEMPTS - 1 or not NFCCard.objects.filter(url_slug__in=slugs).exists():
+                raise
+            continue
+        return cards
+
+
+def write_manifest(manifest):
+    """Render manifest rows as CSV text."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=MANIFEST_COLUMNS)
+    writer.writeheader()
+    writer.writerows(manifest)
+    return buffer.getvalue()
+
+
+def run_batch(batch):
+    """Provision a ProvisioningBatch from its uploaded CSV, recording progress."""
+    from .models import ProvisioningBatch
+
+    def progress(done, total):
+        ProvisioningBatch.objects.filter(pk=batch.pk).update(processed=done)
+
+    batch.status = ProvisioningBatch.Status.RUNNING
+    batch.save(update_fields=['status'])
+
+    try:
+        with batch.source.open('rb') as source:
+            rows = parse_csv(source.read().decode('utf-8-sig'))
+        batch.total = len(rows)
+        batch.save(update_fields=['total'])
+        manifest = provision_cards(
+            batch.organization, rows,
+            created_by=batch.created_by, theme=batch.theme, progress=progress
+        )
+    except (ProvisioningError, UnicodeDecodeError) as e:
+        fail_batch(batch, getattr(e, 'errors', [str(e)]))
+        return
+    except Exception as e:
+        # Chunks already committed stay provisioned
+        batch.refresh_from_db(fields=['processed'])
+        fail_batch(batch, [f'Stopped after {batch.processed} cards: {e}'])
+        raise
+
+    batch.manifest.save(
+        f'{batch.pk}.csv', ContentFile(write_manifest(manifest).encode()), save=False
+    )
+    batch.status = ProvisioningBatch.Status.COMPLETED
+    batch.processed = len(manifest)
+    batch.finished_at = timezone.now()
+    batch.save(update_fields=['status', 'processed', 'manifest', 'finished_at'])
+
+
+def fail_batch(batch, errors):
+    from .models import ProvisioningBatch
+
+    batch.status = ProvisioningBatch.Status.FAILED
+    batch.errors = errors
+    batch.finished_at = timezone.now()
+    batch.save(update_fields=['status', 'errors', 'finished_at'])
@@ -0,0 +1,162 @@
+"""
+QR code asset service.
+
+Each card's QR code is rendered once per (URL, size, colour, format) variant
+and stored content-addressed (``qrcodes/<aa>/<sha256>.<ext>``) in the default
+storage. A QRAsset row remembers where every variant lives, so serving a
+QR code never re-renders it and never has to probe the storage backend.
+"""
+
+import hashlib
+import io
+import re
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import IntegrityError, transaction
+
+
+FORMATS = {
+    'png': 'image/png',
+    'webp': 'image/webp',
+    'svg': 'image/svg+xml',
+}
+
+DEFAULT_SIZE = 512
+DEFAULT_COLOR = '#000000'
+DEFAULT_FORMAT = 'png'
+
+BORDER = 4
+HEX_COLOR = re.compile(r'^#[0-9a-fA-F]{6}$')
+
+
+class InvalidVariant(ValueError):
+    """Raised for a size, colour or format the service does not render."""
+
+
+def normalize_variant(size=None, color=None, fmt=None):
+    """Validate a requested variant and fill in defaults."""
+    try:
+        size = int(size) if size else DEFAULT_SIZE
+    except (TypeError, ValueError):
+        raise InvalidVariant(f'Invalid QR size {size}.')
+    if size not in settings.QR_SIZES:
+        raise InvalidVariant(f'Unsupported QR size {size}.')
+
+    color = (color or DEFAULT_COLOR).lower()
+    if not color.startswith('#'):
+        color = f'#{color}'
+    if not HEX_COLOR.match(color):
+        raise InvalidVariant(f'Invalid QR colour {color}.')
+
+    fmt = (fmt or DEFAULT_FORMAT).lower()
+    if fmt not in FORMATS:
+        raise InvalidVariant(f'Unsupported QR format {fmt}.')
+
+    return size, color, fmt
+
+
+def qr_matrix(data):
+    """Return the QR module matrix for ``data``, including the quiet zone."""
+    import qrcode
+
+    qr = qrcode.QRCode(
+        error_correction=qrcode.constants.ERROR_CORRECT_M,
+        border=BORDER,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+
+def render_qr(data, size=DEFAULT_SIZE, color=DEFAULT_COLOR, fmt=DEFAULT_FORMAT):
+    """Render ``data`` as a QR code and return the encoded bytes."""
+    matrix = qr_matrix(data)
+    if fmt == 'svg':
+        return render_svg(matrix, size, color)
+    return render_bitmap(matrix, size, color, fmt)
+
+
+def render_svg(matrix, size, color):
+    modules = len(matrix)
+    path = ''.join(
+        f'M{x},{y}h1v1h-1z'
+        for y, row in enumerate(matrix)
+        for x, dark in enumerate(row) if dark
+    )
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+        f'viewBox="0 0 {modules} {modules}" shape-rendering="crispEdges">'
+        f'<rect width="{modules}" height="{modules}" fill="#ffffff"/>'
+        f'<path fill="{color}" d="{path}"/></svg>'
+    ).encode()
+
+
+def render_bitmap(matrix, size, color, fmt):
+    from PIL import Image
+
+    modules = len(matrix)
+    scale = max(1, size // modules)
+    dark = tuple(int(color[i:i + 2], 16) for i in (1, 3, 5))
+    white = (255, 255, 255)
+
+    image = Image.new('RGB', (modules, modules))
+    image.putdata([dark if cell else white for row in matrix for cell in row])
+    image = image.resize((modules * scale, modules * scale), Image.NEAREST)
+
+    # Centre whole-pixel modules on a canvas of the exact requested size
+    canvas = Image.new('RGB', (max(size, image.width), max(size, image.height)), white)
+    canvas.paste(image, ((canvas.width - image.width) // 2, (canvas.height - image.height) // 2))
+
+    buffer = io.BytesIO()
+    if fmt == 'webp':
+        canvas.save(buffer, format='WEBP', lossless=True)
+    else:
+        canvas.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def store_content(content, fmt):
+    """Store ``content`` under its content hash and return (path, digest)."""
+    digest = hashlib.sha256(content).hexdigest()
+    path = f'qrcodes/{digest[:2]}/{digest}.{fmt}'
+    if not default_storage.exists(path):
+        saved = default_storage.save(path, ContentFile(content))
+        if saved != path:
+            # Another worker stored the same bytes first; keep one copy
+            default_storage.delete(saved)
+    return path, digest
+
+
+def get_asset(card, size=None, color=None, fmt=None):
+    """
+    Return the QRAsset for a variant of ``card``'s QR code, rendering and
+    storing it on first use. Raises InvalidVariant for bad parameters.
+    """
+    from .models import QRAsset
+
+    size, color, fmt = normalize_variant(size, color, fmt)
+    variant = {'card': card, 'url': card.public_url, 'size': size, 'color': color, 'format': fmt}
+    asset = QRAsset.objects.filter(**variant).first()
+    if asset:
+        return asset
+
+    content = render_qr(card.public_url, size, color, fmt)
+    path, digest = store_content(content, fmt)
+    try:
+        with transaction.atomic():
+            return QRAsset.objects.create(**variant, path=path, sha256=digest)
+    except IntegrityError:
+        return QRAsset.objects.get(**variant)
+
+
+def read_asset(asset):
+    """Return the stored bytes of ``asset``."""
+    with default_storage.open(asset.path, 'rb') as stored:
+        return stored.read()
+
+
+def serves_locally():
+    """True when media is on local disk rather than a CDN-backed bucket."""
+    return isinstance(default_storage, FileSystemStorage)
@@ -0,0 +1,59 @@
+"""
+Slug resolution for the public /u/<slug>/ endpoints.
+
+``resolve_card`` loads a card together with its owner, the owner's
+profile and the theme in a single joined query, and caches the result for
+CARD_RESOLVER_TTL seconds in the ``profiles`` cache namespace (see
+nfc_platform/caching.py), tagged with the slug.
+
+``invalidate_slugs`` (called from the card, profile and theme ``save()``
+methods) invalidates those tags, so every worker drops its copy on the
+next lookup instead of waiting for the TTL.
+"""
+
+from django.conf import settings
+from django.http import Http404
+
+from nfc_platform.caching import namespace
+
+
+def slug_tag(slug):
+    return f'slug:{slug}'
+
+
+def card_queryset():
+    """NFCCard queryset with everything a public profile page reads."""
+    from .models import NFCCard
+
+    return NFCCard.objects.select_related('user__profile', 'theme')
+
+
+def resolve_card(slug):
+    """
+    Return the NFCCard for ``slug`` with its owner, profile and theme
+    loaded. Raises Http404 if there is none.
+
+    The returned instance may be shared between requests; treat it as
+    read-only and re-fetch before saving.
+    """
+    def load():
+        card = card_queryset().filter(url_slug=slug).first()
+        if card is None:
+            raise Http404('No card matches the given slug.')
+        return card
+
+    return namespace('profiles').get_or_set(
+        f'card:{slug}', load, settings.CARD_RESOLVER_TTL, tags=[slug_tag(slug)]
+    )
+
+
+def invalidate_slugs(slugs):
+    """Drop cached cards and rendered pages for ``slugs`` in every worker."""
+    slugs = [slug for slug in slugs if slug]
+    if slugs:
+        namespace('profiles').invalidate(*map(slug_tag, slugs))
+
+
+def clear():
+    """Empty this process's tier of the profiles cache (e.g. between tests)."""
+    namespace('profiles').clear_local()
@@ -0,0 +1,101 @@
+"""
+Slug allocation for cards and organizations.
+
+Random card slugs come from a 36^8 space, so collisions are rare enough
+that checking each candidate before inserting it only costs queries.
+Instead:
+
+- ``allocate_slugs(n)`` draws a block of candidates and drops the taken
+  ones with a single ``url_slug__in`` query, for bulk provisioning. The
+  block is not reserved: two batches drawing the same candidate at once
+  is as unlikely as any other collision, and the unique constraint turns
+  it into a retried insert (see cards/provisioning.py).
+- ``insert_unique`` inserts a row and, only if the unique constraint on
+  the slug fires, retries with the next candidate.
+- ``numbered_slugs`` yields ``name``, ``name-1``, ``name-2``, ... skipping
+  values already known to be taken, so a single prefix query replaces a
+  query per counter value.
+"""
+
+import itertools
+import secrets
+import string
+
+from django.db import IntegrityError, transaction
+
+
+ALPHABET = string.ascii_lowercase + string.digits
+LENGTH = 8
+
+# Unique violations tolerated before giving up on a random slug
+MAX_ATTEMPTS = 5
+
+# Largest url_slug__in list sent in one query
+CHUNK_SIZE = 5000
+
+
+def random_slug(length=LENGTH):
+    """Return a random, URL-safe slug."""
+    return ''.join(secrets.choice(ALPHABET) for _ in range(length))
+
+
+def random_slugs(attempts=MAX_ATTEMPTS):
+    """Yield ``attempts`` random slugs, for ``insert_unique``."""
+    return (random_slug() for _ in range(attempts))
+
+
+def allocate_slugs(count):
+    """
+    Return ``count`` distinct card slugs that are not in use.
+    Usually a single query; more only if a block turns out to be taken.
+    """
+    from .models import NFCCard
+
+    slugs = []
+    while len(slugs) < count:
+        wanted = count - len(slugs)
+        candidates = set()
+        # Over-draw slightly so the occasional taken slug needs no second round
+        while len(candidates) < wanted + max(1, wanted // 100):
+            candidates.add(random_slug())
+        candidates.difference_update(slugs)
+
+        batch = list(candidates)
+        for start in range(0, len(batch), CHUNK_SIZE):
+            taken = NFCCard.objects.filter(
+                url_slug__in=batch[start:start + CHUNK_SIZE]
+            ).values_list('url_slug', flat=True)
+            candidates.difference_update(taken)
+
+        slugs.extend(list(candidates)[:wanted])
+    return slugs
+
+
+def numbered_slugs(base, taken):
+    """Yield ``base``, ``base-1``, ``base-2``, ... that are not in ``taken``."""
+    if base not in taken:
+        yield base
+    for counter in itertools.count(1):
+        slug = f'{base}-{counter}'
+        if slug not in taken:
+            yield slug
+
+
+def insert_unique(instance, field, candidates, save):
+    """
+    Insert ``instance`` by calling ``save()``, setting ``field`` to each
+    value from ``candidates`` until the insert does not violate that
+    field's unique constraint. Other integrity errors are re-raised.
+    """
+    model = type(instance)
+    for value in candidates:
+        setattr(instance, field, value)
+        try:
+            with transaction.atomic():
+                save()
+            return
+        except IntegrityError:
+            # Only the failure path pays for this lookup
+            if not model._default_manager.filter(**{field: value}).exists():
+                raise
+    raise IntegrityError(f'Could not allocate a unique {model.__name__}.{field}.')
@@ -0,0 +1,57 @@
+"""
+Background tasks for cards app.
+"""
+
+from django.db.models import Q
+
+from jobs.queue import task
+
+
+@task
+def generate_qr_code(card_id):
+    """Render a card's default QR code and attach it to the card."""
+    from . import qr
+    from .models import NFCCard
+
+    card = NFCCard.objects.filter(pk=card_id).only('pk', 'url_slug', 'qr_code').first()
+    if card is None:
+        return None
+
+    asset = qr.get_asset(card)
+    if not card.qr_code:
+        NFCCard.objects.filter(
+            Q(qr_code='') | Q(qr_code__isnull=True), pk=card.pk
+        ).update(qr_code=asset.path)
+    return asset.path
+
+
+@task(max_attempts=1)
+def provision_batch(batch_id):
+    """Run a bulk provisioning batch. Not retried: chunks commit as they go."""
+    from .models import ProvisioningBatch
+    from .provisioning import run_batch
+
+    batch = ProvisioningBatch.objects.filter(
+        pk=batch_id, status=ProvisioningBatch.Status.PENDING
+    ).select_related('organization', 'created_by', 'theme').first()
+    if batch is None:
+        return None
+
+    run_batch(batch)
+    return batch.status
+
+
+@task(max_attempts=1)
+def render_print_batch(batch_id):
+    """Render a batch print sheet PDF. Not retried; a failed batch can be started again."""
+    from .models import PrintBatch
+    from .printing import run_batch
+
+    batch = PrintBatch.objects.filter(
+        pk=batch_id, status=PrintBatch.Status.PENDING
+    ).select_related('organization').first()
+    if batch is None:
+        return None
+
+    run_batch(batch)
+    return batch.file.name
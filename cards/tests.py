@@ -1,3 +1,403 @@
-from django.test import TestCase
+import csv
+import io
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.http import Http404
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from pypdf import PdfReader
+
+from accounts.models import User
+from jobs.models import Job
+from nfc_platform.testing import LOCMEM_CACHES, clear_caches
+from organizations.models import Organization
+from profiles.models import UserProfile
+from themes.models import Theme
+from . import printing, provisioning, qr, resolver, slugs
+from .models import CardAssignment, NFCCard, ProvisioningBatch
+from .tasks import generate_qr_code
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    ANALYTICS_EVENT_SINK='analytics.ingest.SyncEventSink',
+    SECURE_SSL_REDIRECT=False,
+)
+class CardResolverQueryTests(TestCase):
+    """Guard the number of queries behind /u/<slug>/ endpoints."""
+
+    def setUp(self):
+        clear_caches()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        self.user = User.objects.create_user('owner@example.com', 'pass12345')
+        self.profile = UserProfile.objects.create(user=self.user, full_name='Card Owner')
+        self.theme = Theme.objects.create(name='Test', slug='test')
+        self.card = NFCCard.objects.create(user=self.user, theme=self.theme, qr_code='qrcodes/x.png')
+
+    def test_resolve_loads_everything_in_one_query(self):
+        # One joined query for card/user/profile/theme
+        with self.assertNumQueries(1):
+            card = resolver.resolve_card(self.card.url_slug)
+        with self.assertNumQueries(0):
+            self.assertEqual(card.user.profile.full_name, 'Card Owner')
+            self.assertEqual(card.theme.slug, 'test')
+
+    def test_repeat_resolve_is_served_from_cache(self):
+        resolver.resolve_card(self.card.url_slug)
+        with self.assertNumQueries(0):
+            resolver.resolve_card(self.card.url_slug)
+
+    def test_saves_invalidate_cached_card(self):
+        resolver.resolve_card(self.card.url_slug)
+        self.profile.full_name = 'Renamed'
+        self.profile.save()
+        with self.assertNumQueries(1):
+            card = resolver.resolve_card(self.card.url_slug)
+        self.assertEqual(card.user.profile.full_name, 'Renamed')
+
+    def test_changing_the_slug_drops_the_old_one(self):
+        old_slug = self.card.url_slug
+        resolver.resolve_card(old_slug)
+        card = NFCCard.objects.get(pk=self.card.pk)
+        card.url_slug = 'renamed-card'
+        card.save()
+        with self.assertRaises(Http404):
+            resolver.resolve_card(old_slug)
+        self.assertEqual(resolver.resolve_card('renamed-card').pk, self.card.pk)
+
+    def test_unknown_slug_raises_404(self):
+        with self.assertRaises(Http404):
+            resolver.resolve_card('missing')
+
+    def test_public_profile_hit_only_records_the_view(self):
+        url = f'/u/{self.card.url_slug}/'
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        # The event insert and its counters, in one transaction; nothing is read
+        statements = [query['sql'].split(' ', 2)[:2] for query in queries]
+        self.assertEqual([words[0] for words in statements[1:-1]], ['INSERT', 'UPDATE', 'UPDATE'])
+        self.assertNotIn('SELECT', [words[0] for words in statements])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, JOBS_EAGER=True, SITE_URL='https://example.com')
+class QRAssetTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        self.user = User.objects.create_user('qr@example.com', 'pass12345')
+        self.card = NFCCard.objects.create(user=self.user, url_slug='first-slug')
+
+    def assertEncodes(self, asset, url):
+        self.assertEqual(asset.url, url)
+        self.assertEqual(qr.read_asset(asset), qr.render_qr(url))
+
+    def test_variants_are_stored_once(self):
+        asset = qr.get_asset(self.card)
+        self.assertEqual(self.card.qr_code.name, asset.path)
+        with self.assertNumQueries(1):
+            self.assertEqual(qr.get_asset(self.card), asset)
+        self.assertEncodes(asset, 'https://example.com/u/first-slug')
+
+    def test_changing_the_slug_renders_a_new_qr_code(self):
+        card = NFCCard.objects.get(pk=self.card.pk)
+        old_path = card.qr_code.name
+        card.url_slug = 'second-slug'
+        card.save()
+
+        card.refresh_from_db()
+        self.assertNotEqual(card.qr_code.name, old_path)
+        self.assertEqual(card.qr_code.name, qr.get_asset(card).path)
+        self.assertEncodes(qr.get_asset(card), 'https://example.com/u/second-slug')
+        images = printing.qr_images([(card.pk, card.url_slug)])
+        self.assertEqual(list(images), [card.pk])
+        self.assertTrue(card.qr_assets.filter(url='https://example.com/u/second-slug').exists())
+
+    def test_a_new_site_url_is_a_new_variant(self):
+        old = qr.get_asset(self.card)
+        with override_settings(SITE_URL='https://cards.example.org'):
+            new = qr.get_asset(self.card)
+        self.assertNotEqual(new.pk, old.pk)
+        self.assertEncodes(new, 'https://cards.example.org/u/first-slug')
+
+    def test_backfill_renders_variants_for_the_current_url(self):
+        NFCCard.objects.filter(pk=self.card.pk).update(url_slug='moved-slug')
+        call_command('backfill_qr_codes', stdout=io.StringIO())
+        card = NFCCard.objects.get(pk=self.card.pk)
+        self.assertEqual(card.qr_code.name, qr.get_asset(card).path)
+        self.assertEncodes(qr.get_asset(card), 'https://example.com/u/moved-slug')
+
+        output = io.StringIO()
+        call_command('backfill_qr_codes', stdout=output)
+        self.assertIn('Rendered 0', output.getvalue())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PrintSheetTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        self.user = User.objects.create_user('printer@example.com', 'pass12345')
+        UserProfile.objects.create(user=self.user, full_name='Print Owner')
+
+    def test_page_groups_are_joined_into_one_document(self):
+        per_page = printing.SheetLayout('A4').per_page
+        for _ in range(per_page * 2 + 1):
+            NFCCard.objects.create(user=self.user, qr_code='qrcodes/x.png')
+        cards = list(NFCCard.objects.order_by('created_at', 'pk').values_list(*printing.PRINT_COLUMNS))
+
+        output = io.BytesIO()
+        with mock.patch.object(printing, 'PAGES_PER_CHUNK', 1):
+            self.assertEqual(printing.render_sheets(cards, output), len(cards))
+
+        output.seek(0)
+        reader = PdfReader(output, strict=True)
+        self.assertEqual(len(reader.pages), 3)
+        self.assertEqual(reader.metadata.title, 'Card print sheets')
+        self.assertIn(cards[-1][1], reader.pages[2].extract_text())
+        self.assertIn(cards[0][1], reader.pages[0].extract_text())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SlugAllocationTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user('slugs@example.com', 'pass12345')
+
+    def card(self, slug):
+        return NFCCard.objects.create(user=self.user, url_slug=slug, qr_code='qrcodes/x.png')
+
+    def test_allocate_slugs_skips_taken_candidates_in_one_query(self):
+        self.card('taken001')
+        draws = iter(['taken001', 'free0001', 'free0002', 'free0003', 'free0004'])
+        with mock.patch.object(slugs, 'random_slug', lambda: next(draws)):
+            with self.assertNumQueries(1):
+                allocated = slugs.allocate_slugs(2)
+        self.assertEqual(len(allocated), 2)
+        self.assertNotIn('taken001', allocated)
+
+    def test_allocate_slugs_draws_again_when_a_block_is_taken(self):
+        self.card('taken001')
+        self.card('taken002')
+        draws = iter(['taken001', 'taken002', 'free0001', 'free0002'])
+        with mock.patch.object(slugs, 'random_slug', lambda: next(draws)):
+            with self.assertNumQueries(2):
+                allocated = slugs.allocate_slugs(1)
+        self.assertIn(allocated[0], {'free0001', 'free0002'})
+
+    def test_allocate_slugs_returns_distinct_slugs(self):
+        allocated = slugs.allocate_slugs(300)
+        self.assertEqual(len(set(allocated)), 300)
+
+    def test_insert_unique_retries_on_a_taken_slug(self):
+        self.card('taken001')
+        card = NFCCard(user=self.user, qr_code='qrcodes/x.png')
+        with mock.patch.object(slugs, 'random_slug', side_effect=['taken001', 'free0001']):
+            card.save()
+        self.assertEqual(card.url_slug, 'free0001')
+        self.assertEqual(NFCCard.objects.filter(url_slug='free0001').count(), 1)
+
+    def test_insert_unique_gives_up_after_max_attempts(self):
+        self.card('taken001')
+        card = NFCCard(user=self.user, qr_code='qrcodes/x.png')
+        with self.assertRaises(IntegrityError):
+            slugs.insert_unique(card, 'url_slug', ['taken001'] * slugs.MAX_ATTEMPTS, card.save)
+
+    def test_insert_unique_reraises_other_integrity_errors(self):
+        NFCCard.objects.create(user=self.user, card_uid='UID-1', qr_code='qrcodes/x.png')
+        card = NFCCard(user=self.user, card_uid='UID-1', qr_code='qrcodes/x.png')
+        save = mock.Mock(side_effect=lambda: NFCCard.save(card))
+        with self.assertRaises(IntegrityError):
+            slugs.insert_unique(card, 'url_slug', ['free0001', 'free0002'], save)
+        # The slug was free, so no second candidate was tried
+        self.assertEqual(save.call_count, 1)
+
+    def test_numbered_slugs_skip_taken_values(self):
+        candidates = slugs.numbered_slugs('acme', {'acme', 'acme-1', 'acme-3'})
+        self.assertEqual([next(candidates) for _ in range(3)], ['acme-2', 'acme-4', 'acme-5'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, JOBS_EAGER=False)
+class ProvisioningTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        self.organization = Organization.objects.create(name='Acme', max_users=10, max_cards=10)
+        self.alice = User.objects.create_user('alice@example.com', 'pass12345', organization=self.organization)
+        self.bob = User.objects.create_user('bob@example.com', 'pass12345', organization=self.organization)
+        User.objects.create_user('outsider@example.com', 'pass12345')
+
+    def provision_errors(self, text):
+        with self.assertRaises(provisioning.ProvisioningError) as raised:
+            provisioning.provision_cards(self.organization, provisioning.parse_csv(text))
+        return raised.exception.errors
+
+    def test_parse_csv_normalizes_rows(self):
+        rows = provisioning.parse_csv(' Email ,Card_UID\nAlice@Example.com, UID-1 \n,\nbob@example.com,\n')
+        self.assertEqual(rows, [
+            {'email': 'alice@example.com', 'card_uid': 'UID-1', 'line': 2},
+            {'email': 'bob@example.com', 'card_uid': '', 'line': 4},
+        ])
+
+    def test_parse_csv_rejects_bad_files(self):
+        for text, error in (
+            ('name\nAlice\n', 'The CSV needs an "email" column.'),
+            ('email,card_uid\n,UID-1\n', 'Line 2: email is required.'),
+            ('email\n', 'The CSV has no rows.'),
+        ):
+            with self.subTest(text=text), self.assertRaises(provisioning.ProvisioningError) as raised:
+                provisioning.parse_csv(text)
+            self.assertEqual(raised.exception.errors, [error])
+
+    def test_rows_are_validated_before_anything_is_inserted(self):
+        NFCCard.objects.create(user=self.alice, card_uid='UID-OLD', qr_code='qrcodes/x.png')
+        errors = self.provision_errors(
+            'email,card_uid\n'
+            'outsider@example.com,\n'
+            'alice@example.com,UID-1\n'
+            'bob@example.com,UID-1\n'
+            'bob@example.com,UID-OLD\n'
+        )
+        self.assertEqual(errors, [
+            'Line 2: outsider@example.com is not a member of Acme.',
+            'Line 4: card UID UID-1 appears more than once.',
+            'Line 5: card UID UID-OLD is already registered.',
+        ])
+        self.assertEqual(NFCCard.objects.count(), 1)
+
+    def test_card_quota_is_checked(self):
+        Organization.objects.filter(pk=self.organization.pk).update(max_cards=2)
+        errors = self.provision_errors('email\nalice@example.com\nbob@example.com\nbob@example.com\n')
+        self.assertEqual(len(errors), 1)
+        self.assertIn('3 more would exceed the limit', errors[0])
+        self.assertFalse(NFCCard.objects.exists())
+
+    def test_repeated_emails_get_a_card_each(self):
+        rows = provisioning.parse_csv('email\nalice@example.com\nalice@example.com\nbob@example.com\n')
+        manifest = provisioning.provision_cards(self.organization, rows, chunk_size=2)
+
+        self.assertEqual([row['email'] for row in manifest], [row['email'] for row in rows])
+        self.assertEqual(self.alice.cards.count(), 2)
+        self.assertEqual(self.bob.cards.count(), 1)
+        self.assertEqual(CardAssignment.objects.count(), 3)
+        self.assertEqual(Job.objects.filter(task=generate_qr_code.task_name).count(), 3)
+        self.organization.refresh_from_db()
+        self.assertEqual(self.organization.card_count, 3)
+
+    def test_chunk_is_retried_with_new_slugs_after_a_collision(self):
+        NFCCard.objects.create(user=self.alice, url_slug='taken001', qr_code='qrcodes/x.png')
+        blocks = iter([['taken001', 'free0001'], ['free0002', 'free0003'], ['free0004']])
+        rows = provisioning.parse_csv('email\nalice@example.com\nbob@example.com\nbob@example.com\n')
+
+        with mock.patch.object(slugs, 'allocate_slugs', lambda count: next(blocks)):
+            manifest = provisioning.provision_cards(self.organization, rows, chunk_size=2)
+
+        self.assertEqual(
+            [row['url_slug'] for row in manifest], ['free0002', 'free0003', 'free0004']
+        )
+        self.assertEqual(NFCCard.objects.count(), 4)
+        # The failed attempt rolled back its assignments, jobs and counts
+        self.assertEqual(CardAssignment.objects.count(), 3)
+        self.assertEqual(Job.objects.filter(task=generate_qr_code.task_name).count(), 3)
+        self.organization.refresh_from_db()
+        self.assertEqual(self.organization.card_count, 4)
+
+    def test_chunk_gives_up_after_max_attempts(self):
+        NFCCard.objects.create(user=self.alice, url_slug='taken001', qr_code='qrcodes/x.png')
+        rows = provisioning.parse_csv('email\nbob@example.com\n')
+        with mock.patch.object(slugs, 'allocate_slugs', lambda count: ['taken001']):
+            with self.assertRaises(IntegrityError):
+                provisioning.provision_cards(self.organization, rows)
+        self.assertEqual(self.bob.cards.count(), 0)
+
+    def test_a_chunk_that_no_longer_fits_stops_the_batch(self):
+        rows = provisioning.parse_csv('email\nalice@example.com\nbob@example.com\nbob@example.com\n')
+
+        def shrink_quota(done, total):
+            Organization.objects.filter(pk=self.organization.pk).update(max_cards=2)
+
+        with self.assertRaises(provisioning.ProvisioningError) as raised:
+            provisioning.provision_cards(self.organization, rows, progress=shrink_quota, chunk_size=2)
+        self.assertIn('Stopped after 2 cards', raised.exception.errors[0])
+        self.assertEqual(NFCCard.objects.count(), 2)
+        self.organization.refresh_from_db()
+        self.assertEqual(self.organization.card_count, 2)
+
+    def test_cards_created_after_validation_count_against_the_quota(self):
+        Organization.objects.filter(pk=self.organization.pk).update(max_cards=2)
+        rows = provisioning.parse_csv('email\nalice@example.com\nbob@example.com\n')
+
+        def allocate_after_another_card(count):
+            NFCCard.objects.create(user=self.alice, qr_code='qrcodes/x.png')
+            return ['free0001', 'free0002'][:count]
+
+        with mock.patch.object(slugs, 'allocate_slugs', allocate_after_another_card):
+            with self.assertRaises(provisioning.ProvisioningError):
+                provisioning.provision_cards(self.organization, rows)
+        self.assertEqual(NFCCard.objects.count(), 1)
+        self.organization.refresh_from_db()
+        self.assertEqual(self.organization.card_count, 1)
+
+    def test_a_card_uid_conflict_is_not_retried(self):
+        rows = provisioning.parse_csv('email,card_uid\nbob@example.com,UID-1\n')
+        allocated = []
+
+        def allocate_after_a_uid_is_taken(count):
+            if not allocated:
+                NFCCard.objects.create(user=self.alice, card_uid='UID-1', qr_code='qrcodes/x.png')
+            allocated.append(count)
+            return ['free0001']
+
+        with mock.patch.object(slugs, 'allocate_slugs', allocate_after_a_uid_is_taken):
+            with self.assertRaises(IntegrityError):
+                provisioning.provision_cards(self.organization, rows)
+        self.assertEqual(allocated, [1])
+        self.assertEqual(self.bob.cards.count(), 0)
+
+    def test_batch_writes_a_manifest(self):
+        batch = ProvisioningBatch.objects.create(organization=self.organization, created_by=self.alice)
+        batch.source.save('cards.csv', ContentFile(b'\xef\xbb\xbfemail,card_uid\nbob@example.com,UID-9\n'))
+
+        provisioning.run_batch(batch)
+
+        batch.refresh_from_db()
+        self.assertEqual(batch.status, ProvisioningBatch.Status.COMPLETED)
+        self.assertEqual((batch.processed, batch.total), (1, 1))
+        card = self.bob.cards.get()
+        with batch.manifest.open('r') as manifest:
+            rows = list(csv.DictReader(manifest))
+        self.assertEqual(rows, [{
+            'card_uid': 'UID-9',
+            'email': 'bob@example.com',
+            'url_slug': card.url_slug,
+            'public_url': card.public_url,
+            'card_id': str(card.pk),
+        }])
+
+    def test_batch_records_validation_errors(self):
+        batch = ProvisioningBatch.objects.create(organization=self.organization)
+        batch.source.save('cards.csv', ContentFile(b'email\noutsider@example.com\n'))
+
+        provisioning.run_batch(batch)
+
+        batch.refresh_from_db()
+        self.assertEqual(batch.status, ProvisioningBatch.Status.FAILED)
+        self.assertEqual(batch.errors, ['Line 2: outsider@example.com is not a member of Acme.'])
+        self.assertFalse(batch.manifest)
@@ -0,0 +1,32 @@
+"""
+Admin configuration for jobs app.
+"""
+
+from django.contrib import admin
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Admin for background jobs."""
+    
+    list_display = ('task', 'status', 'attempts', 'max_attempts', 'run_at', 'finished_at')
+    list_filter = ('status', 'task')
+    search_fields = ('task', 'last_error')
+    readonly_fields = (
+        'id', 'task', 'args', 'kwargs', 'attempts', 'locked_by', 'locked_at',
+        'result', 'last_error', 'created_at', 'finished_at'
+    )
+    ordering = ('-created_at',)
+    actions = ['retry_jobs']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    @admin.action(description='Retry selected jobs now')
+    def retry_jobs(self, request, queryset):
+        from django.utils import timezone
+        updated = queryset.exclude(status=Job.Status.RUNNING).update(
+            status=Job.Status.PENDING, attempts=0, run_at=timezone.now(), finished_at=None
+        )
+        self.message_user(request, f'{updated} jobs queued for retry.')
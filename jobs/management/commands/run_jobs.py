@@ -0,0 +1,81 @@
+"""
+Run background jobs from the database queue.
+
+Usage:
+    python manage.py run_jobs
+    python manage.py run_jobs --once
+    python manage.py run_jobs --max-jobs 500
+"""
+
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs import queue
+
+
+class Command(BaseCommand):
+    help = 'Process queued background jobs until stopped.'
+
+    # How often stale locks are released and old jobs purged (seconds)
+    MAINTENANCE_INTERVAL = 60
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once no due jobs are left instead of polling.'
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=0,
+            help='Exit after running this many jobs (0 for no limit).'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=settings.JOBS_POLL_INTERVAL,
+            help='Seconds to wait between polls of an empty queue.'
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        worker = queue.worker_name()
+        self.stdout.write(f'Worker {worker} started.')
+
+        processed = 0
+        next_maintenance = 0
+        while not self.stopping:
+            if time.monotonic() >= next_maintenance:
+                released = queue.release_stale()
+                if released:
+                    self.stdout.write(f'Released {released} stale jobs.')
+                queue.purge_finished()
+                next_maintenance = time.monotonic() + self.MAINTENANCE_INTERVAL
+
+            job = queue.claim(worker)
+            if job is None:
+                if options['once']:
+                    break
+                close_old_connections()
+                time.sleep(options['sleep'])
+                continue
+
+            queue.run_job(job)
+            processed += 1
+            close_old_connections()
+            if options['max_jobs'] and processed >= options['max_jobs']:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker} stopped after {processed} jobs.'))
+
+    def stop(self, signum, frame):
+        # Finish the current job, then exit
+        self.stopping = True
@@ -0,0 +1,59 @@
+"""
+Jobs models.
+The job table doubles as the queue and as the job status record.
+"""
+
+import uuid
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class Job(models.Model):
+    """
+    A unit of background work: a registered task plus its arguments.
+    Workers claim pending jobs whose ``run_at`` has passed.
+    """
+    
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', _('Pending')
+        RUNNING = 'RUNNING', _('Running')
+        SUCCEEDED = 'SUCCEEDED', _('Succeeded')
+        FAILED = 'FAILED', _('Failed')
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    
+    task = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder)
+    kwargs = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    
+    # Set while a worker holds the job
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    last_error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = _('job')
+        verbose_name_plural = _('jobs')
+        ordering = ['run_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.task} ({self.get_status_display()})"
@@ -0,0 +1,270 @@
+"""
+Database-backed job queue.
+
+Slow side effects (QR rendering, email, PDFs) are registered as tasks and
+enqueued as Job rows instead of running inside the request. ``manage.py
+run_jobs`` workers claim due jobs with a compare-and-set UPDATE, so no
+broker is needed and any number of workers can share the table. Because
+jobs are plain rows, one enqueued inside a transaction that rolls back is
+discarded with it.
+
+Usage:
+    from jobs.queue import task
+
+    @task
+    def send_receipt(order_id):
+        ...
+
+    send_receipt.enqueue(order.pk)
+
+Tasks live in each app's ``tasks.py`` (imported when the app registry is
+ready), take and return JSON-serialisable values, and should be safe to
+run more than once: a failed job is retried with exponential backoff up to
+``max_attempts`` times. With ``JOBS_EAGER`` set, jobs run inline as soon
+as they are enqueued.
+"""
+
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+
+
+def task(func=None, *, name=None, max_attempts=None):
+    """
+    Register ``func`` as a task. The decorated function is returned
+    unchanged apart from an ``enqueue(*args, **kwargs)`` helper.
+    """
+    def register(func):
+        task_name = name or f'{func.__module__}.{func.__qualname__}'
+        _tasks[task_name] = func
+        func.task_name = task_name
+        func.enqueue = lambda *args, **kwargs: enqueue(
+            task_name, *args, max_attempts=max_attempts, **kwargs
+        )
+        return func
+
+    if func is None:
+        return register
+    return register(func)
+
+
+def get_task(name):
+    """Return the registered task called ``name``. Raises KeyError."""
+    return _tasks[name]
+
+
+def enqueue(task_name, *args, run_at=None, max_attempts=None, **kwargs):
+    """Queue ``task_name`` to run with the given arguments. Returns the Job."""
+    if task_name not in _tasks:
+        raise KeyError(f'Unknown task: {task_name}')
+
+    eager = settings.JOBS_EAGER
+    job = Job.objects.create(
+        task=task_name,
+        args=list(args),
+        kwargs=kwargs,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+        status=Job.Status.RUNNING if eager else Job.Status.PENDING,
+        attempts=1 if eager else 0,
+    )
+    if eager:
+        run_job(job)
+    return job
+
+
+def enqueue_many(task_name, arg_lists, max_attempts=None):
+    """Queue ``task_name`` once per argument list with a single INSERT."""
+    if task_name not in _tasks:
+        raise KeyError(f'Unknown task: {task_name}')
+    if settings.JOBS_EAGER:
+        return [enqueue(task_name, *args, max_attempts=max_attempts) for args in arg_lists]
+
+    now = timezone.now()
+    return Job.objects.bulk_create([
+        Job(
+            task=task_name,
+            args=list(args),
+            run_at=now,
+            max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+        )
+        for args in arg_lists
+    ])
+
+
+# =============================================================================
+# WORKER API
+# =============================================================================
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker, now=None):
+    """
+    Claim the next due job for ``worker`` and return it, or None.
+    The status check in the UPDATE guarantees each job has one owner.
+    """
+    now = now or timezone.now()
+    due = Job.objects.filter(
+        status=Job.Status.PENDING, run_at__lte=now
+    ).order_by('run_at').values_list('pk', flat=True)
+
+    for pk in due[:10]:
+        claimed = Job.objects.filter(pk=pk, status=Job.Status.PENDING).update(
+            status=Job.Status.RUNNING,
+            locked_by=worker,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+class Heartbeat:
+    """
+    Refresh a claimed job's ``locked_at`` every JOBS_HEARTBEAT_INTERVAL
+    seconds from a background thread while the job runs, so
+    release_stale() only re-queues jobs whose worker has actually stopped.
+
+    Usage:
+        with Heartbeat(job):
+            ...
+    """
+
+    def __init__(self, job, interval=None):
+        self.job = job
+        self.interval = interval or settings.JOBS_HEARTBEAT_INTERVAL
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def beat(self, now=None):
+        """Extend the lock if this worker still holds it. Returns True if so."""
+        return bool(Job.objects.filter(
+            pk=self.job.pk, status=Job.Status.RUNNING, locked_by=self.job.locked_by
+        ).update(locked_at=now or timezone.now()))
+
+    def _run(self):
+        try:
+            while not self._stopped.wait(self.interval):
+                try:
+                    self.beat()
+                except Exception:
+                    logger.exception('Heartbeat for job %s failed', self.job.pk)
+        finally:
+            # The thread's own connection
+            connection.close()
+
+    def __enter__(self):
+        # Eager jobs run inline and hold no lock
+        if self.job.locked_by:
+            self._thread = threading.Thread(
+                target=self._run, name=f'job-heartbeat-{self.job.pk}', daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def run_job(job):
+    """Run a claimed job and record the outcome."""
+    try:
+        func = get_task(job.task)
+    except KeyError:
+        finish(job, Job.Status.FAILED, error=f'Unknown task: {job.task}')
+        return
+
+    try:
+        with Heartbeat(job):
+            result = func(*job.args, **job.kwargs)
+    except Exception:
+        logger.exception('Job %s (%s) failed on attempt %d', job.pk, job.task, job.attempts)
+        retry_or_fail(job, traceback.format_exc())
+    else:
+        finish(job, Job.Status.SUCCEEDED, result=result)
+
+
+def retry_delay(attempts):
+    """Seconds to wait before the next attempt: exponential, capped."""
+    return min(
+        settings.JOBS_RETRY_BACKOFF * 2 ** max(attempts - 1, 0),
+        settings.JOBS_RETRY_BACKOFF_MAX
+    )
+
+
+def retry_or_fail(job, error):
+    if job.attempts >= job.max_attempts:
+        finish(job, Job.Status.FAILED, error=error)
+        return
+    job.status = Job.Status.PENDING
+    job.run_at = timezone.now() + timedelta(seconds=retry_delay(job.attempts))
+    job.locked_by = ''
+    job.locked_at = None
+    job.last_error = error
+    job.save(update_fields=[
+        'status', 'attempts', 'run_at', 'locked_by', 'locked_at', 'last_error'
+    ])
+
+
+def finish(job, status, result=None, error=''):
+    job.status = status
+    job.result = result
+    job.last_error = error or job.last_error
+    job.locked_by = ''
+    job.locked_at = None
+    job.finished_at = timezone.now()
+    job.save(update_fields=[
+        'status', 'attempts', 'result', 'last_error', 'locked_by', 'locked_at',
+        'finished_at'
+    ])
+
+
+def release_stale(now=None):
+    """
+    Return jobs held by workers that died mid-run to the queue: running
+    jobs whose heartbeat has not refreshed ``locked_at`` for
+    JOBS_LOCK_TIMEOUT seconds. Returns the number of jobs released.
+    """
+    now = now or timezone.now()
+    stale = Job.objects.filter(
+        status=Job.Status.RUNNING,
+        locked_at__lt=now - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT)
+    )
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.Status.FAILED,
+        locked_by='',
+        locked_at=None,
+        finished_at=now,
+        last_error='Worker stopped while running the job.'
+    )
+    return stale.update(status=Job.Status.PENDING, locked_by='', locked_at=None, run_at=now)
+
+
+def purge_finished(now=None):
+    """Delete succeeded jobs older than JOBS_RETENTION_DAYS."""
+    now = now or timezone.now()
+    deleted, _ = Job.objects.filter(
+        status=Job.Status.SUCCEEDED,
+        finished_at__lt=now - timedelta(days=settings.JOBS_RETENTION_DAYS)
+    ).delete()
+    return deleted
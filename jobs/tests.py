@@ -0,0 +1,153 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import queue
+from .models import Job
+
+
+calls = []
+
+
+@queue.task(name='jobs.tests.record')
+def record(value):
+    calls.append(value)
+    return value
+
+
+@queue.task(name='jobs.tests.explode')
+def explode():
+    raise RuntimeError('boom')
+
+
+@override_settings(
+    JOBS_EAGER=False,
+    JOBS_MAX_ATTEMPTS=3,
+    JOBS_RETRY_BACKOFF=30,
+    JOBS_RETRY_BACKOFF_MAX=100,
+    JOBS_LOCK_TIMEOUT=600,
+)
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_claimed_job_has_a_single_owner(self):
+        job = record.enqueue(1)
+        claimed = queue.claim('worker-a')
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual(claimed.status, Job.Status.RUNNING)
+        self.assertEqual(claimed.locked_by, 'worker-a')
+        self.assertEqual(claimed.attempts, 1)
+        self.assertIsNone(queue.claim('worker-b'))
+
+    def test_claim_skips_jobs_that_are_not_due(self):
+        record.enqueue(1)
+        Job.objects.update(run_at=timezone.now() + timedelta(minutes=5))
+        self.assertIsNone(queue.claim('worker-a'))
+
+    def test_run_job_records_the_result(self):
+        record.enqueue('done')
+        queue.run_job(queue.claim('worker-a'))
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.Status.SUCCEEDED)
+        self.assertEqual(job.result, 'done')
+        self.assertEqual(job.locked_by, '')
+        self.assertEqual(calls, ['done'])
+
+    def test_failed_job_is_retried_with_backoff(self):
+        explode.enqueue()
+        before = timezone.now()
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            queue.run_job(queue.claim('worker-a'))
+
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.Status.PENDING)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('boom', job.last_error)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=30))
+        self.assertIsNone(queue.claim('worker-a'))
+
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            queue.run_job(queue.claim('worker-a'))
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 2)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=60))
+
+    def test_retry_delay_doubles_up_to_the_cap(self):
+        self.assertEqual(
+            [queue.retry_delay(attempts) for attempts in range(1, 5)],
+            [30, 60, 100, 100]
+        )
+
+    def test_job_fails_after_max_attempts(self):
+        explode.enqueue()
+        for _ in range(3):
+            Job.objects.update(run_at=timezone.now())
+            with self.assertLogs('jobs.queue', 'ERROR'):
+                queue.run_job(queue.claim('worker-a'))
+
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertEqual(job.attempts, 3)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_unknown_task_fails_without_retrying(self):
+        record.enqueue(1)
+        Job.objects.update(task='jobs.tests.missing')
+        queue.run_job(queue.claim('worker-a'))
+        self.assertEqual(Job.objects.get().status, Job.Status.FAILED)
+
+    def test_release_stale_requeues_jobs_without_a_heartbeat(self):
+        record.enqueue(1)
+        record.enqueue(2)
+        stale, fresh = queue.claim('worker-a'), queue.claim('worker-b')
+        Job.objects.filter(pk=stale.pk).update(
+            locked_at=timezone.now() - timedelta(seconds=601)
+        )
+
+        self.assertEqual(queue.release_stale(), 1)
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual(stale.status, Job.Status.PENDING)
+        self.assertEqual(stale.locked_by, '')
+        self.assertEqual(fresh.status, Job.Status.RUNNING)
+        self.assertEqual(queue.claim('worker-c').pk, stale.pk)
+
+    def test_release_stale_fails_jobs_out_of_attempts(self):
+        record.enqueue(1)
+        Job.objects.update(
+            status=Job.Status.RUNNING,
+            attempts=3,
+            locked_by='worker-a',
+            locked_at=timezone.now() - timedelta(seconds=601)
+        )
+        self.assertEqual(queue.release_stale(), 0)
+        self.assertEqual(Job.objects.get().status, Job.Status.FAILED)
+
+    def test_heartbeat_keeps_a_long_job_locked(self):
+        record.enqueue(1)
+        job = queue.claim('worker-a')
+        later = timezone.now() + timedelta(seconds=900)
+
+        self.assertTrue(queue.Heartbeat(job).beat(now=later - timedelta(seconds=300)))
+        self.assertEqual(queue.release_stale(now=later), 0)
+        self.assertEqual(Job.objects.get().status, Job.Status.RUNNING)
+
+    def test_heartbeat_stops_once_the_lock_is_lost(self):
+        record.enqueue(1)
+        job = queue.claim('worker-a')
+        Job.objects.filter(pk=job.pk).update(locked_by='worker-b')
+        self.assertFalse(queue.Heartbeat(job).beat())
+
+    def test_purge_finished_keeps_recent_and_failed_jobs(self):
+        old = timezone.now() - timedelta(days=30)
+        for status in (Job.Status.SUCCEEDED, Job.Status.FAILED):
+            Job.objects.create(task='jobs.tests.record', status=status, finished_at=old)
+        Job.objects.create(
+            task='jobs.tests.record', status=Job.Status.SUCCEEDED, finished_at=timezone.now()
+        )
+        self.assertEqual(queue.purge_finished(), 1)
+        self.assertEqual(Job.objects.count(), 2)
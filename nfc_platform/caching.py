@@ -0,0 +1,289 @@
+"""
+Two-tier, namespaced caching.
+
+Each app caches under its own namespace (``namespace('profiles')``,
+``'themes'``, ``'analytics'``, ``'accounts'``). A namespace reads through
+a small per-process LRU first and then the shared ``default`` cache (files
+on local disk shared by every worker on the host, or Redis), so hot
+values cost no I/O and a value computed by one worker serves them all.
+
+Invalidation is versioned rather than by deleting keys, which could not
+reach the per-process tiers of other workers. Every namespace, and every
+tag a value is stored under, has a version token in the shared cache,
+and the tokens are part of the key a value is stored at. ``invalidate``
+replaces tokens, so every worker misses on its next read and stale
+entries simply age out. ``invalidate_on`` does this whenever instances
+of a model are saved or deleted.
+
+Each worker also keeps the tokens it has read in memory for
+CACHE_VERSION_TTL seconds, which is what keeps local hits free of I/O.
+The worker that invalidates sees the change at once; other workers see
+it within CACHE_VERSION_TTL seconds.
+
+``get_or_set`` keeps a miss from being computed by many requests at
+once: threads of one worker take turns per key, and across workers one
+takes a short lock in the shared cache while the others wait for its
+value (best effort; the file backend's ``add`` is not atomic).
+
+Hits per tier, misses and fills are counted per namespace in each
+process; see ``stats``.
+"""
+
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .instrumentation import count
+
+
+# Namespace timeout meaning "use CACHE_DEFAULT_TIMEOUT"
+DEFAULT = object()
+MISSING = object()
+
+# Version tokens outlive the values stored under them; when one expires
+# anyway its values are recomputed, never served stale.
+VERSION_TIMEOUT = 86400
+
+# Seconds a miss may hold the shared fill lock, and the wait between polls
+LOCK_TIMEOUT = 10
+LOCK_POLL = 0.05
+
+
+class LRUCache:
+    """Thread-safe LRU mapping whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return default
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def pop(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class Namespace:
+    """A namespace of cached values; get one with ``namespace(name)``."""
+
+    def __init__(self, name, timeout=DEFAULT):
+        self.name = name
+        self.timeout = settings.CACHE_DEFAULT_TIMEOUT if timeout is DEFAULT else timeout
+        self.local = LRUCache(settings.CACHE_LOCAL_SIZE, settings.CACHE_LOCAL_TTL)
+        # Version tokens read from the shared cache, briefly trusted
+        self.versions = LRUCache(settings.CACHE_LOCAL_SIZE, settings.CACHE_VERSION_TTL)
+        self.counts = Counter()
+        self.counts_lock = threading.Lock()
+        # Striped locks serializing fills of the same key within this process
+        self.fill_locks = [threading.Lock() for _ in range(32)]
+
+    def __repr__(self):
+        return f'<Namespace {self.name}>'
+
+    def get(self, key, default=None, tags=()):
+        """The value cached for ``key`` under ``tags``, or ``default``."""
+        value = self._lookup(self.make_key(key, tags), count=True)
+        return default if value is MISSING else value
+
+    def set(self, key, value, timeout=DEFAULT, tags=()):
+        """Cache ``value`` for ``key``; invalidating any of ``tags`` drops it."""
+        self._store(self.make_key(key, tags), value, timeout)
+
+    def get_or_set(self, key, compute, timeout=DEFAULT, tags=()):
+        """
+        The value cached for ``key``, or else ``compute()``, which is then
+        cached. Concurrent misses for the same key compute it only once.
+        Exceptions from ``compute`` propagate and nothing is cached.
+        """
+        full_key = self.make_key(key, tags)
+        value = self._lookup(full_key, count=True)
+        if value is not MISSING:
+            return value
+
+        with self.fill_locks[hash(full_key) % len(self.fill_locks)]:
+            # Another thread may have filled it while this one waited
+            value = self._lookup(full_key)
+            if value is not MISSING:
+                return value
+
+            lock_key = f'{full_key}:lock'
+            locked = cache.add(lock_key, 1, LOCK_TIMEOUT)
+            if not locked:
+                self._count('waits')
+                deadline = time.monotonic() + LOCK_TIMEOUT
+                while time.monotonic() < deadline and lock_key in cache:
+                    time.sleep(LOCK_POLL)
+                    value = self._lookup(full_key)
+                    if value is not MISSING:
+                        return value
+            try:
+                value = compute()
+                self._store(full_key, value, timeout)
+                self._count('fills')
+            finally:
+                if locked:
+                    cache.delete(lock_key)
+        return value
+
+    def invalidate(self, *tags):
+        """
+        Drop every value stored under any of ``tags`` in every worker;
+        with no tags, drop the whole namespace.
+        """
+        tokens = {self._version_key(tag): uuid.uuid4().hex[:12] for tag in (tags or ('',))}
+        cache.set_many(tokens, VERSION_TIMEOUT)
+        for name, token in tokens.items():
+            self.versions.set(name, token)
+        if not tags:
+            self.local.clear()
+        self._count('invalidations')
+
+    def invalidate_on(self, *models, tags=None):
+        """
+        Invalidate when instances of ``models`` are saved or deleted:
+        the tags ``tags(instance)`` returns, or the whole namespace.
+        """
+        def handler(sender, instance, **kwargs):
+            self.invalidate(*(tags(instance) if tags else ()))
+
+        for model in models:
+            post_save.connect(handler, sender=model, weak=False)
+            post_delete.connect(handler, sender=model, weak=False)
+
+    def make_key(self, key, tags=()):
+        """
+        The shared cache key for ``key`` under the current versions. Only
+        tokens this process has not read in the last CACHE_VERSION_TTL
+        seconds are fetched from the shared cache.
+        """
+        names = [self._version_key(tag) for tag in ('', *tags)]
+        versions = {}
+        for name in names:
+            token = self.versions.get(name)
+            if token is not None:
+                versions[name] = token
+
+        unknown = [name for name in names if name not in versions]
+        if unknown:
+            versions.update(cache.get_many(unknown))
+            for name in unknown:
+                if name not in versions:
+                    token = uuid.uuid4().hex[:12]
+                    if not cache.add(name, token, VERSION_TIMEOUT):
+                        token = cache.get(name, token)
+                    versions[name] = token
+                self.versions.set(name, versions[name])
+        return ':'.join([self.name, *(versions[name] for name in names), str(key)])
+
+    def stats(self):
+        with self.counts_lock:
+            counts = dict(self.counts)
+        hits = counts.get('local_hits', 0) + counts.get('shared_hits', 0)
+        lookups = hits + counts.get('misses', 0)
+        counts['hit_rate'] = round(hits / lookups, 4) if lookups else None
+        return counts
+
+    def clear_local(self):
+        """Empty this process's tier of the namespace (e.g. between tests)."""
+        self.local.clear()
+        self.versions.clear()
+
+    def _version_key(self, tag):
+        return f'{self.name}:version:{tag}'
+
+    def _lookup(self, full_key, count=False):
+        value = self.local.get(full_key, MISSING)
+        if value is not MISSING:
+            tier = 'local_hits'
+        else:
+            value = cache.get(full_key, MISSING)
+            if value is not MISSING:
+                tier = 'shared_hits'
+                self.local.set(full_key, value, self.timeout)
+            else:
+                tier = 'misses'
+        if count:
+            self._count(tier)
+        return value
+
+    def _store(self, full_key, value, timeout):
+        timeout = self.timeout if timeout is DEFAULT else timeout
+        cache.set(full_key, value, timeout)
+        self.local.set(full_key, value, timeout)
+
+    def _count(self, name):
+        with self.counts_lock:
+            self.counts[name] += 1
+        # Per-request totals for RequestMetricsMiddleware
+        count(f'cache_{name}')
+
+
+_namespaces = {}
+_namespaces_lock = threading.Lock()
+
+
+def namespace(name, timeout=DEFAULT):
+    """
+    The process-wide Namespace called ``name``. ``timeout`` (seconds;
+    None caches until invalidated) applies when it is first created.
+    """
+    with _namespaces_lock:
+        if name not in _namespaces:
+            _namespaces[name] = Namespace(name, timeout)
+        return _namespaces[name]
+
+
+def stats():
+    """This process's hit, miss and fill counts per namespace."""
+    with _namespaces_lock:
+        namespaces = list(_namespaces.values())
+    return {ns.name: ns.stats() for ns in namespaces}
+
+
+def clear_local():
+    """Empty this process's tier of every namespace."""
+    with _namespaces_lock:
+        namespaces = list(_namespaces.values())
+    for ns in namespaces:
+        ns.clear_local()
+
+
+@receiver(setting_changed)
+def reset_local(setting, **kwargs):
+    # A different shared tier (e.g. tests' CACHES) has different tokens
+    if setting == 'CACHES' or setting.startswith('CACHE_'):
+        with _namespaces_lock:
+            for ns in _namespaces.values():
+                ns.local = LRUCache(settings.CACHE_LOCAL_SIZE, settings.CACHE_LOCAL_TTL)
+                ns.versions = LRUCache(settings.CACHE_LOCAL_SIZE, settings.CACHE_VERSION_TTL)
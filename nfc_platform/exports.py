@@ -0,0 +1,144 @@
+"""
+Streaming CSV exports.
+
+Exports are written row by row into a StreamingHttpResponse instead of
+being built up in memory, so memory use stays flat however many rows
+there are. Views feed ``stream_csv`` a ``values_list`` projection read
+with ``.iterator(chunk_size=...)``: related columns come from joins in the
+same query, and rows are fetched from the database in chunks rather than
+all at once.
+
+Query parameters shared by export views:
+    start, end      inclusive date range (YYYY-MM-DD)
+    organization    organization slug (super admins only)
+    gzip            "1" to download a gzip-compressed .csv.gz
+"""
+
+import csv
+import zlib
+from datetime import datetime, time, timedelta
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+
+# Rows fetched from the database per round trip
+CHUNK_SIZE = 2000
+
+# Rows written per response chunk
+FLUSH_ROWS = 500
+
+
+class ExportError(ValueError):
+    """Raised for export parameters that cannot be used."""
+
+
+class Echo:
+    """File-like object whose ``write`` hands the value straight back."""
+
+    def write(self, value):
+        return value
+
+
+def csv_chunks(header, rows, flush_rows=FLUSH_ROWS):
+    """Yield the header and rows as UTF-8 CSV, ``flush_rows`` rows at a time."""
+    writer = csv.writer(Echo())
+    lines = [writer.writerow(header)]
+    for row in rows:
+        lines.append(writer.writerow(row))
+        if len(lines) >= flush_rows:
+            yield ''.join(lines).encode()
+            lines = []
+    if lines:
+        yield ''.join(lines).encode()
+
+
+def gzip_chunks(chunks):
+    """Compress a stream of byte chunks into a single gzip member."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_csv(filename, header, rows, compress=False):
+    """
+    Return a StreamingHttpResponse downloading ``rows`` as ``filename``.
+    With ``compress`` the body is gzipped and ``.gz`` added to the name.
+    """
+    chunks = csv_chunks(header, rows)
+    content_type = 'text/csv'
+    if compress:
+        chunks = gzip_chunks(chunks)
+        content_type = 'application/gzip'
+        filename = f'{filename}.gz'
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def wants_gzip(request):
+    return request.GET.get('gzip', '').lower() in ('1', 'true', 'yes')
+
+
+def date_range(request, default_days=None):
+    """
+    Read ``start`` and ``end`` dates from the query string. Without a
+    start, ``default_days`` (if given) counts back from the end date.
+    Returns (start, end); either may be None. Raises ExportError.
+    """
+    dates = {}
+    for name in ('start', 'end'):
+        value = request.GET.get(name, '').strip()
+        if not value:
+            dates[name] = None
+            continue
+        try:
+            dates[name] = parse_date(value)
+        except ValueError:
+            dates[name] = None
+        if dates[name] is None:
+            raise ExportError(f'"{name}" must be a date in YYYY-MM-DD format.')
+
+    start, end = dates['start'], dates['end']
+    if start is None and default_days is not None:
+        start = (end or timezone.localdate()) - timedelta(days=default_days)
+    if start and end and start > end:
+        raise ExportError('"start" must not be after "end".')
+    return start, end
+
+
+def datetime_bounds(start, end):
+    """
+    Turn a date range into a half-open (from, until) pair of aware
+    datetimes for filtering DateTimeFields without a date cast.
+    """
+    tz = timezone.get_current_timezone()
+    since = datetime.combine(start, time.min, tzinfo=tz) if start else None
+    until = datetime.combine(end + timedelta(days=1), time.min, tzinfo=tz) if end else None
+    return since, until
+
+
+def requested_organization(request):
+    """
+    The organization an export is limited to: the ``organization`` slug
+    for super admins (None for all), otherwise the user's own.
+    Raises ExportError for an unknown slug.
+    """
+    from organizations.models import Organization
+
+    user = request.user
+    if not user.is_super_admin:
+        return user.organization
+
+    slug = request.GET.get('organization', '').strip()
+    if not slug:
+        return None
+    organization = Organization.objects.filter(slug=slug).first()
+    if organization is None:
+        raise ExportError(f'No organization with slug "{slug}".')
+    return organization
@@ -0,0 +1,183 @@
+"""
+Per-request cost instrumentation.
+
+With REQUEST_METRICS on, RequestMetricsMiddleware measures each request:
+wall time, database queries and their total time, template render time
+and cache hits and misses in nfc_platform/caching.py. Every request is
+logged as one JSON line on the ``nfc_platform.requests`` logger, tagged
+with its resolved URL name, and with REQUEST_METRICS_SERVER_TIMING the
+numbers are also sent in a ``Server-Timing`` header, which browser
+developer tools display.
+
+Each process keeps the last REQUEST_METRICS_SAMPLES requests per route,
+and /metrics/requests/ lists their p50, p95 and p99 wall times.
+
+With REQUEST_METRICS off the middleware removes itself at startup and
+the query and template hooks are never installed; what remains is one
+context variable lookup per cache access.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+logger = logging.getLogger('nfc_platform.requests')
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Costs accumulated while handling one request."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.counts = Counter()
+
+    def time_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - started
+
+
+def count(name, amount=1):
+    """Add to counter ``name`` of the request being handled, if measured."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.counts[name] += amount
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of the sorted list ``ordered``."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+class RouteStats:
+    """Recent wall times and query counts per route, in this process."""
+
+    def __init__(self, size):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(lambda: deque(maxlen=size))
+
+    def add(self, route, wall_time, queries):
+        with self.lock:
+            self.samples[route].append((wall_time, queries))
+
+    def summary(self):
+        """{route: {'count', 'p50_ms', 'p95_ms', 'p99_ms', 'mean_queries'}}"""
+        with self.lock:
+            samples = {route: list(entries) for route, entries in self.samples.items()}
+        summary = {}
+        for route, entries in sorted(samples.items()):
+            times = sorted(wall_time for wall_time, _ in entries)
+            summary[route] = {
+                'count': len(entries),
+                **{
+                    f'p{point}_ms': round(percentile(times, point / 100) * 1000, 2)
+                    for point in (50, 95, 99)
+                },
+                'mean_queries': round(sum(queries for _, queries in entries) / len(entries), 2),
+            }
+        return summary
+
+
+route_stats = None
+
+_templates_timed = False
+_templates_lock = threading.Lock()
+
+
+def time_templates():
+    """Wrap Template.render to time the outermost render per request."""
+    global _templates_timed
+    from django.template.base import Template
+
+    with _templates_lock:
+        if _templates_timed:
+            return
+        render = Template.render
+
+        def timed_render(self, context):
+            metrics = _current.get()
+            if metrics is None:
+                return render(self, context)
+            # Included templates render inside their parent's time
+            metrics.template_depth += 1
+            started = time.perf_counter()
+            try:
+                return render(self, context)
+            finally:
+                metrics.template_depth -= 1
+                if not metrics.template_depth:
+                    metrics.template_time += time.perf_counter() - started
+
+        Template.render = timed_render
+        _templates_timed = True
+
+
+class RequestMetricsMiddleware:
+    """Measure each request; see the module docstring."""
+
+    def __init__(self, get_response):
+        global route_stats
+        if not settings.REQUEST_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if route_stats is None:
+            route_stats = RouteStats(settings.REQUEST_METRICS_SAMPLES)
+        time_templates()
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(metrics.time_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        wall_time = time.perf_counter() - started
+
+        match = request.resolver_match
+        route = match.view_name if match else '<unresolved>'
+        route_stats.add(route, wall_time, metrics.queries)
+
+        cache_hits = metrics.counts['cache_local_hits'] + metrics.counts['cache_shared_hits']
+        logger.info(json.dumps({
+            'route': route,
+            'method': request.method,
+            'status': response.status_code,
+            'wall_ms': round(wall_time * 1000, 2),
+            'queries': metrics.queries,
+            'sql_ms': round(metrics.sql_time * 1000, 2),
+            'template_ms': round(metrics.template_time * 1000, 2),
+            'cache_hits': cache_hits,
+            'cache_misses': metrics.counts['cache_misses'],
+        }))
+
+        if settings.REQUEST_METRICS_SERVER_TIMING:
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={metrics.sql_time * 1000:.2f};desc="{metrics.queries} queries"',
+                f'tpl;dur={metrics.template_time * 1000:.2f}',
+                f'cache;desc="{cache_hits} hits, {metrics.counts["cache_misses"]} misses"',
+                f'total;dur={wall_time * 1000:.2f}',
+            ])
+        return response
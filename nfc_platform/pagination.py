@@ -0,0 +1,216 @@
+"""
+Keyset (seek) pagination for dashboard listings.
+
+Rather than skipping rows with OFFSET, each page is read with a WHERE on
+the ordering columns of the last row already shown, so the database
+seeks straight to it through an index and a deep page costs the same as
+the first. Pages are addressed by opaque cursors instead of numbers, and
+nothing is counted.
+
+An ordering is a tuple of field names, each optionally prefixed with
+``-``, ending with a unique field so that every row has a distinct
+position. The default is newest first by (created_at, id). The fields
+must be concrete, non-null columns of the model itself.
+
+``KeysetPaginationMixin`` adds search, filter and sort parameters to a
+TemplateView and puts one page of ``get_queryset()`` in its context.
+"""
+
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.http import Http404
+
+
+DEFAULT_ORDERING = ('-created_at', '-id')
+
+
+class InvalidCursor(ValueError):
+    """A cursor that is malformed or belongs to another ordering."""
+
+
+class KeysetPage:
+    """One page of results and the cursors of its neighbours."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator:
+    """Pages through ``queryset`` ``per_page`` rows at a time in ``ordering``."""
+
+    def __init__(self, queryset, per_page, ordering=DEFAULT_ORDERING):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        opts = queryset.model._meta
+        try:
+            self.fields = [opts.get_field(name.lstrip('-')) for name in self.ordering]
+        except FieldDoesNotExist as error:
+            raise ValueError(f'Cannot paginate by a non-model field: {error}') from None
+
+    def page(self, cursor=None):
+        """
+        The page after (or, for a previous-page cursor, before) ``cursor``;
+        the first page without one. Raises InvalidCursor.
+        """
+        position, backwards = self.decode(cursor) if cursor else (None, False)
+        ordering = self._reversed() if backwards else self.ordering
+
+        queryset = self.queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(position, ordering))
+        rows = list(queryset[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if backwards:
+            rows.reverse()
+            has_previous, has_next = more, True
+        else:
+            has_previous, has_next = position is not None, more
+        return KeysetPage(
+            rows,
+            next_cursor=self.encode(rows[-1]) if rows and has_next else None,
+            previous_cursor=self.encode(rows[0], backwards=True) if rows and has_previous else None,
+        )
+
+    def encode(self, obj, backwards=False):
+        """The cursor of the page after ``obj``, or before it when ``backwards``."""
+        data = {
+            'o': list(self.ordering),
+            'p': [field.value_to_string(obj) for field in self.fields],
+            'b': backwards,
+        }
+        return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode().rstrip('=')
+
+    def decode(self, cursor):
+        """Returns (position, backwards). Raises InvalidCursor."""
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            if data['o'] != list(self.ordering) or len(data['p']) != len(self.fields):
+                raise InvalidCursor('The cursor belongs to another ordering.')
+            position = [field.to_python(value) for field, value in zip(self.fields, data['p'])]
+            return position, bool(data['b'])
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError, ValidationError):
+            raise InvalidCursor('Invalid cursor.') from None
+
+    def _reversed(self):
+        return tuple(name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering)
+
+    def _after(self, position, ordering):
+        """Rows strictly after ``position`` in ``ordering``."""
+        names = [name.lstrip('-') for name in ordering]
+        strict = ['lt' if name.startswith('-') else 'gt' for name in ordering]
+
+        after = Q()
+        for index, name in enumerate(names):
+            term = Q(**{f'{name}__{strict[index]}': position[index]})
+            for prior in range(index):
+                term &= Q(**{names[prior]: position[prior]})
+            after |= term
+        # A plain range on the leading column lets the index bound the scan
+        lead = Q(**{f'{names[0]}__{strict[0]}e': position[0]})
+        return lead & after
+
+
+class KeysetPaginationMixin:
+    """
+    Paginate ``get_queryset()`` into the context of a TemplateView.
+
+    Query parameters:
+        q       -- searched for (case-insensitively) in ``search_fields``
+        <name>  -- for each of ``filters``, a {value: Q} mapping; other
+                   values, such as 'all', leave the rows unfiltered
+        sort    -- a key of ``sorts``, mapping to an ordering
+        cursor  -- the page to show
+
+    The page's rows are put in the context as ``context_object_name``,
+    with ``page``, ``search``, ``selected`` (the active filter values),
+    ``sort``, ``sorts``, and ``next_url`` and ``previous_url`` keeping
+    every other parameter. An invalid cursor is a 404.
+    """
+
+    context_object_name = 'object_list'
+    search_fields = ()
+    filters = {}
+    sorts = {
+        'newest': DEFAULT_ORDERING,
+        'oldest': ('created_at', 'id'),
+    }
+    default_sort = 'newest'
+    per_page = None
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        params = self.request.GET
+        queryset = self.get_queryset()
+
+        search = params.get('q', '').strip()
+        if search and self.search_fields:
+            terms = Q()
+            for field in self.search_fields:
+                terms |= Q(**{f'{field}__icontains': search})
+            queryset = queryset.filter(terms)
+
+        selected = {}
+        for name, choices in self.filters.items():
+            value = params.get(name, '')
+            if value in choices:
+                queryset = queryset.filter(choices[value])
+                selected[name] = value
+
+        sort = params.get('sort')
+        if sort not in self.sorts:
+            sort = self.default_sort
+
+        paginator = KeysetPaginator(
+            queryset, self.per_page or settings.DASHBOARD_PAGE_SIZE, self.sorts[sort]
+        )
+        try:
+            page = paginator.page(params.get('cursor') or None)
+        except InvalidCursor:
+            raise Http404('Invalid cursor.')
+
+        context[self.context_object_name] = page.object_list
+        context.update({
+            'page': page,
+            'search': search,
+            'selected': selected,
+            'sort': sort,
+            'sorts': list(self.sorts),
+            'next_url': self.page_url(page.next_cursor),
+            'previous_url': self.page_url(page.previous_cursor),
+        })
+        return context
+
+    def page_url(self, cursor):
+        """The current URL showing the page at ``cursor``, or None."""
+        if cursor is None:
+            return None
+        params = self.request.GET.copy()
+        params['cursor'] = cursor
+        return f'{self.request.path}?{params.urlencode()}'
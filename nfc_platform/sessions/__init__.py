@@ -0,0 +1,25 @@
+"""
+Session stores with throttled sliding expiry.
+
+SESSION_MODE picks the store that SESSION_ENGINE points at:
+
+    cached_db   sessions are read from the "sessions" cache and written
+                through to the database, which is only read on a cache miss
+    db          sessions are read from and written to the database
+
+Sessions are no longer saved on every request. SessionRefreshMiddleware
+instead marks an active session as changed at most once every
+SESSION_REFRESH_INTERVAL seconds, and saving it pushes its expiry back
+by SESSION_COOKIE_AGE. The stores add one refresh interval to that
+default expiry, so a session still lasts at least SESSION_COOKIE_AGE
+after the last request, and at most one interval longer.
+"""
+
+from django.conf import settings
+
+
+class RefreshingSessionMixin:
+    """Pads the default expiry by one refresh interval."""
+
+    def get_session_cookie_age(self):
+        return settings.SESSION_COOKIE_AGE + settings.SESSION_REFRESH_INTERVAL
@@ -0,0 +1,7 @@
+from django.contrib.sessions.backends import cached_db
+
+from . import RefreshingSessionMixin
+
+
+class SessionStore(RefreshingSessionMixin, cached_db.SessionStore):
+    pass
@@ -0,0 +1,7 @@
+from django.contrib.sessions.backends import db
+
+from . import RefreshingSessionMixin
+
+
+class SessionStore(RefreshingSessionMixin, db.SessionStore):
+    pass
@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+
+
+# Session key holding the time of the last expiry refresh (epoch seconds)
+REFRESHED_KEY = '_session_refreshed'
+
+
+class SessionRefreshMiddleware:
+    """
+    Slide the expiry of an existing session forward, at most once every
+    SESSION_REFRESH_INTERVAL seconds. Must come after SessionMiddleware,
+    which saves the session when the response goes out.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        session = request.session
+        # Checked before session.get so anonymous requests never load a session
+        if session.session_key is not None:
+            now = int(time.time())
+            refreshed = session.get(REFRESHED_KEY, 0)
+            # Loading clears an unknown or expired key, so check it again
+            if session.session_key is not None and now - refreshed >= settings.SESSION_REFRESH_INTERVAL:
+                session[REFRESHED_KEY] = now
+        return self.get_response(request)
@@ -54,10 +54,17 @@ SESSION_COOKIE_SAMESITE = 'Lax'
 CSRF_COOKIE_SAMESITE = 'Lax'
 
 # Session Settings
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
-SESSION_COOKIE_AGE = 1800  # 30 minutes
+# 'cached_db' reads sessions from the sessions cache and writes them through
+# to the database; 'db' keeps them in the database only (see nfc_platform/sessions)
+SESSION_MODE = config('SESSION_MODE', default='cached_db')
+SESSION_ENGINE = f'nfc_platform.sessions.{SESSION_MODE}'
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_COOKIE_AGE = 1800  # 30 minutes idle
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
-SESSION_SAVE_EVERY_REQUEST = True
+# Sessions are saved when they change; SessionRefreshMiddleware slides the
+# expiry of active sessions at most once per interval (seconds)
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_INTERVAL = config('SESSION_REFRESH_INTERVAL', default=60, cast=int)
 
 # Site Configuration
 SITE_ID = 1
@@ -95,13 +102,16 @@ INSTALLED_APPS = [
     'api',
     'analytics.apps.AnalyticsConfig',
     'themes.apps.ThemesConfig',
+    'jobs.apps.JobsConfig',
 ]
 
 MIDDLEWARE = [
+    'nfc_platform.instrumentation.RequestMetricsMiddleware',  # Removes itself unless REQUEST_METRICS
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Serve static files in production
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'nfc_platform.sessions.middleware.SessionRefreshMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -164,6 +174,56 @@ else:
     }
 
 
+# =============================================================================
+# CACHES
+# =============================================================================
+
+# The shared tier behind nfc_platform/caching.py and the session cache: Redis
+# when CACHE_REDIS_URL is set (needs the redis package), otherwise files on
+# local disk, which every worker on the host shares.
+CACHE_REDIS_URL = config('CACHE_REDIS_URL', default='')
+CACHE_DIR = config('CACHE_DIR', default=str(BASE_DIR / 'var' / 'cache'))
+
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        },
+        'sessions': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+            'KEY_PREFIX': 'sessions',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(CACHE_DIR, 'shared'),
+            'OPTIONS': {
+                'MAX_ENTRIES': 20000,
+            },
+        },
+        'sessions': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(CACHE_DIR, 'sessions'),
+            'OPTIONS': {
+                'MAX_ENTRIES': 10000,
+            },
+        },
+    }
+
+# Per-process LRU in front of the shared tier, per cache namespace
+CACHE_LOCAL_SIZE = config('CACHE_LOCAL_SIZE', default=1024, cast=int)
+CACHE_LOCAL_TTL = config('CACHE_LOCAL_TTL', default=60, cast=int)  # seconds
+# Seconds a worker trusts the version tokens it has read, and so the longest
+# another worker's invalidation can take to reach it
+CACHE_VERSION_TTL = config('CACHE_VERSION_TTL', default=5, cast=int)
+# Lifetime of cached values unless a namespace sets its own
+CACHE_DEFAULT_TIMEOUT = config('CACHE_DEFAULT_TIMEOUT', default=300, cast=int)
+
+
 # =============================================================================
 # AUTHENTICATION
 # =============================================================================
@@ -358,7 +418,7 @@ REST_FRAMEWORK = {
         'anon': '100/hour',
         'user': '1000/hour',
     },
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetCursorPagination',
     'PAGE_SIZE': 20,
 }
 
@@ -383,6 +443,107 @@ SITE_NAME = config('SITE_NAME', default='NFC Card Platform')
 SITE_URL = config('SITE_URL', default='http://localhost:8000')
 
 
+# =============================================================================
+# PUBLIC PROFILES
+# =============================================================================
+
+# Rendered public profile pages are cached until the card, profile or
+# theme changes, or for this many seconds at most.
+PROFILE_PAGE_CACHE_TIMEOUT = config('PROFILE_PAGE_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Resolved cards for /u/<slug>/ are cached this long (see cards/resolver.py)
+CARD_RESOLVER_TTL = config('CARD_RESOLVER_TTL', default=60, cast=int)  # seconds
+
+# Pixel sizes QR code variants may be rendered at (see cards/qr.py)
+QR_SIZES = [128, 256, 512, 1024]
+
+# Batch print sheets (see cards/printing.py): QR variant placed on each
+# card, and the most cards one print batch may hold
+PRINT_QR_SIZE = config('PRINT_QR_SIZE', default=256, cast=int)
+PRINT_MAX_CARDS = config('PRINT_MAX_CARDS', default=2000, cast=int)
+
+
+# =============================================================================
+# ANALYTICS
+# =============================================================================
+
+# Incremental rollups re-read this many seconds before the last high-water
+# mark so events committed slightly out of order are still folded in.
+ANALYTICS_ROLLUP_OVERLAP_SECONDS = config('ANALYTICS_ROLLUP_OVERLAP_SECONDS', default=300, cast=int)
+
+# Where interaction events go (see analytics/ingest.py). Use
+# analytics.ingest.SyncEventSink to write every event inline. The buffered
+# sink loses what is still in memory when a worker is killed; a batch it
+# fails to write goes to ANALYTICS_SPOOL_DIR for `manage.py flush_analytics`.
+ANALYTICS_EVENT_SINK = config('ANALYTICS_EVENT_SINK', default='analytics.ingest.BufferedEventSink')
+ANALYTICS_BUFFER_SIZE = config('ANALYTICS_BUFFER_SIZE', default=200, cast=int)
+ANALYTICS_FLUSH_INTERVAL = config('ANALYTICS_FLUSH_INTERVAL', default=5, cast=int)  # seconds
+ANALYTICS_SPOOL_DIR = config('ANALYTICS_SPOOL_DIR', default=str(BASE_DIR / 'var' / 'analytics'))
+ANALYTICS_SPOOL_MARKER_DAYS = config('ANALYTICS_SPOOL_MARKER_DAYS', default=7, cast=int)
+
+# Live per-hour counters (see analytics/live.py), written to the hourly
+# rollup tier with each batch of events. An hour is left to the live counters
+# until this many seconds after it ends; then the rollup recomputes it from
+# the raw events.
+ANALYTICS_LIVE_GRACE_SECONDS = config('ANALYTICS_LIVE_GRACE_SECONDS', default=900, cast=int)
+
+# Event retention, applied by `manage.py analytics_partitions` (see
+# analytics/partitions.py). On PostgreSQL with the partitioned event store
+# old months are detached, archived to storage or dropped; elsewhere old
+# rows are archived (unless dropping) and deleted. 0 keeps every event.
+ANALYTICS_RETENTION_MONTHS = config('ANALYTICS_RETENTION_MONTHS', default=0, cast=int)
+ANALYTICS_RETENTION_ACTION = config('ANALYTICS_RETENTION_ACTION', default='detach')  # detach, archive or drop
+ANALYTICS_PARTITIONS_AHEAD = config('ANALYTICS_PARTITIONS_AHEAD', default=3, cast=int)  # months
+
+# Time-series queries (see analytics/series.py): how long a computed series
+# is cached, and the most buckets one query may return.
+ANALYTICS_SERIES_CACHE_SECONDS = config('ANALYTICS_SERIES_CACHE_SECONDS', default=300, cast=int)
+ANALYTICS_SERIES_MAX_POINTS = config('ANALYTICS_SERIES_MAX_POINTS', default=1000, cast=int)
+
+
+# =============================================================================
+# DASHBOARDS
+# =============================================================================
+
+# Super admin dashboard counts (see accounts/stats.py) are recomputed in a
+# background job once older than PLATFORM_STATS_TTL, serving the cached
+# copy meanwhile, and inside the request once older than the max age.
+PLATFORM_STATS_TTL = config('PLATFORM_STATS_TTL', default=60, cast=int)  # seconds
+PLATFORM_STATS_MAX_AGE = config('PLATFORM_STATS_MAX_AGE', default=3600, cast=int)  # seconds
+
+# Rows per page of the user and card listings (see nfc_platform/pagination.py)
+DASHBOARD_PAGE_SIZE = config('DASHBOARD_PAGE_SIZE', default=25, cast=int)
+
+
+# =============================================================================
+# BACKGROUND JOBS
+# =============================================================================
+
+# Slow side effects run from the database queue (see jobs/queue.py),
+# processed by `python manage.py run_jobs`. When JOBS_EAGER is on, jobs
+# run inline instead, so local development needs no worker.
+JOBS_EAGER = config('JOBS_EAGER', default=DEBUG, cast=bool)
+JOBS_MAX_ATTEMPTS = config('JOBS_MAX_ATTEMPTS', default=5, cast=int)
+JOBS_RETRY_BACKOFF = config('JOBS_RETRY_BACKOFF', default=30, cast=int)  # seconds, doubled per attempt
+JOBS_RETRY_BACKOFF_MAX = config('JOBS_RETRY_BACKOFF_MAX', default=3600, cast=int)  # seconds
+JOBS_POLL_INTERVAL = config('JOBS_POLL_INTERVAL', default=2, cast=float)  # seconds
+JOBS_LOCK_TIMEOUT = config('JOBS_LOCK_TIMEOUT', default=600, cast=int)  # seconds without a heartbeat before a running job is presumed dead
+JOBS_HEARTBEAT_INTERVAL = config('JOBS_HEARTBEAT_INTERVAL', default=60, cast=int)  # seconds between lock refreshes of a running job
+JOBS_RETENTION_DAYS = config('JOBS_RETENTION_DAYS', default=7, cast=int)
+
+
+# =============================================================================
+# INSTRUMENTATION
+# =============================================================================
+
+# Per-request query, template, cache and wall-time metrics (see
+# nfc_platform/instrumentation.py), logged as JSON lines and summarised per
+# route at /metrics/requests/. When off, the middleware unloads itself.
+REQUEST_METRICS = config('REQUEST_METRICS', default=False, cast=bool)
+REQUEST_METRICS_SERVER_TIMING = config('REQUEST_METRICS_SERVER_TIMING', default=DEBUG, cast=bool)
+REQUEST_METRICS_SAMPLES = config('REQUEST_METRICS_SAMPLES', default=1000, cast=int)  # kept per route
+
+
 # =============================================================================
 # RAZORPAY PAYMENT GATEWAY
 # =============================================================================
@@ -0,0 +1,51 @@
+"""
+Cached singleton models.
+
+Site-wide settings kept in a single row (AuthSettings, feature flags)
+subclass SingletonModel. ``load()`` returns the row, creating it with its
+defaults on first use, through the app's cache namespace (see
+nfc_platform/caching.py): each worker keeps a copy in memory, and saving
+or deleting the row invalidates the model's tag so every worker reloads
+it on its next read.
+"""
+
+from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .caching import namespace
+
+
+class SingletonModel(models.Model):
+    """A model with exactly one row, pk 1."""
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        self.pk = 1
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def cache_tag(cls):
+        return cls._meta.label_lower
+
+    @classmethod
+    def load(cls):
+        """
+        The row, from the cache when possible. The instance may be shared
+        between requests in this worker, so only change it to save it.
+        """
+        return namespace(cls._meta.app_label).get_or_set(
+            cls.cache_tag(),
+            lambda: cls.objects.get_or_create(pk=1)[0],
+            None,  # Kept until the row changes
+            tags=[cls.cache_tag()]
+        )
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_singleton(sender, **kwargs):
+    if issubclass(sender, SingletonModel):
+        namespace(sender._meta.app_label).invalidate(sender.cache_tag())
@@ -25,6 +25,15 @@ class R2MediaStorage(S3Boto3Storage):
     file_overwrite = False   # Preserve existing files; append suffix on conflict
     default_acl = None       # R2 does not support per-object ACLs
 
+    # Content-addressed files that never change (see themes/stylesheets.py)
+    immutable_prefixes = ("themes/css/",)
+
+    def get_object_parameters(self, name):
+        params = super().get_object_parameters(name)
+        if name.removeprefix(f"{self.location}/").startswith(self.immutable_prefixes):
+            params["CacheControl"] = "public, max-age=31536000, immutable"
+        return params
+
 
 class R2StaticStorage(S3Boto3Storage):
     """
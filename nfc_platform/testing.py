@@ -0,0 +1,34 @@
+"""
+Helpers shared by the apps' test suites.
+
+Usage:
+    @override_settings(CACHES=LOCMEM_CACHES)
+    class MyTests(TestCase):
+        def setUp(self):
+            clear_caches()
+"""
+
+from django.core.cache import caches
+
+from .caching import clear_local
+
+
+# In-memory caches, so a test run neither reads nor wipes the file-based
+# caches under CACHE_DIR
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests-default',
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests-sessions',
+    },
+}
+
+
+def clear_caches():
+    """Empty every cache alias and this process's namespace tiers."""
+    for alias in LOCMEM_CACHES:
+        caches[alias].clear()
+    clear_local()
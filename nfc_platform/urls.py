@@ -7,11 +7,12 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from profiles.views import PublicProfileView, DownloadVCardView, QRCodeView, MobilePreviewView
-from .views import health_check
+from .views import health_check, request_metrics
 
 urlpatterns = [
     # Health check endpoint for monitoring
     path('healthz', health_check, name='health_check'),
+    path('metrics/requests/', request_metrics, name='request_metrics'),
     
     # Admin
     path('admin/', admin.site.urls),
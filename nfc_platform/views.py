@@ -33,6 +33,28 @@ def health_check(request):
         }, status=503)
 
 
+@never_cache
+@require_http_methods(["GET"])
+def request_metrics(request):
+    """
+    Wall-time percentiles per route in the worker answering, from
+    RequestMetricsMiddleware. Super admins only.
+    """
+    import os
+    from django.conf import settings
+    from django.http import Http404
+    from . import instrumentation
+    
+    if not settings.REQUEST_METRICS or instrumentation.route_stats is None:
+        raise Http404('Request metrics are disabled.')
+    if not (request.user.is_authenticated and request.user.is_super_admin):
+        return JsonResponse({'error': 'You do not have access to request metrics.'}, status=403)
+    return JsonResponse({
+        'pid': os.getpid(),
+        'routes': instrumentation.route_stats.summary(),
+    })
+
+
 def handler404(request, exception):
     """Custom 404 error page."""
     return render(request, 'errors/404.html', status=404)
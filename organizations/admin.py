@@ -12,7 +12,7 @@ class OrganizationAdmin(admin.ModelAdmin):
     
     list_display = (
         'name', 'slug', 'subscription_tier', 'user_count_display',
-        'is_active', 'created_at'
+        'card_count_display', 'is_active', 'created_at'
     )
     list_filter = ('subscription_tier', 'is_active', 'created_at')
     search_fields = ('name', 'slug', 'email')
@@ -52,6 +52,10 @@ class OrganizationAdmin(admin.ModelAdmin):
     def user_count_display(self, obj):
         return f"{obj.user_count} / {obj.max_users}"
     user_count_display.short_description = "Users"
+    
+    def card_count_display(self, obj):
+        return f"{obj.card_count} / {obj.max_cards}"
+    card_count_display.short_description = "Cards"
 
 
 @admin.register(OrganizationInvite)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class OrganizationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'organizations'
+
+    def ready(self):
+        # Connect the quota counters' delete receivers
+        from . import quotas  # noqa: F401
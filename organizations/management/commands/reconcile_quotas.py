@@ -0,0 +1,47 @@
+"""
+Recompute organization user and card counters.
+
+Usage:
+    python manage.py reconcile_quotas
+    python manage.py reconcile_quotas --organization acme-corp --dry-run
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from organizations import quotas
+from organizations.models import Organization
+
+
+class Command(BaseCommand):
+    help = 'Fix drift in the denormalized organization user and card counters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--organization',
+            action='append',
+            dest='organizations',
+            help='Only reconcile the organization with this slug. May be repeated.'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drift without fixing it.'
+        )
+
+    def handle(self, *args, **options):
+        organization_ids = None
+        if options['organizations']:
+            organization_ids = list(
+                Organization.objects.filter(slug__in=options['organizations']).values_list('pk', flat=True)
+            )
+            if len(organization_ids) != len(set(options['organizations'])):
+                raise CommandError('One or more organization slugs do not exist.')
+
+        fixes = quotas.reconcile(organization_ids, dry_run=options['dry_run'])
+        for org, (old_users, old_cards), (users, cards) in fixes:
+            self.stdout.write(
+                f'{org.slug}: users {old_users} -> {users}, cards {old_cards} -> {cards}'
+            )
+
+        verb = 'Found' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(fixes)} organizations with drifted counters.'))
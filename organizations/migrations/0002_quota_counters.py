@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:00
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Organization = apps.get_model('organizations', 'Organization')
+    NFCCard = apps.get_model('cards', 'NFCCard')
+
+    cards = NFCCard.objects.filter(
+        user__organization=OuterRef('pk')
+    ).order_by().values('user__organization').annotate(total=Count('pk')).values('total')
+
+    for org in Organization.objects.annotate(
+        users=Count('members', distinct=True),
+        cards=Coalesce(Subquery(cards), Value(0)),
+    ):
+        Organization.objects.filter(pk=org.pk).update(user_count=org.users, card_count=org.cards)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0001_initial'),
+        ('accounts', '0007_user_organization'),
+        ('cards', '0006_provisioningbatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organization',
+            name='card_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='organization',
+            name='user_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -5,6 +5,7 @@ Organizations group multiple users under a single admin.
 
 import uuid
 from django.db import models
+from django.utils.functional import cached_property
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 
@@ -50,6 +51,10 @@ class Organization(models.Model):
     max_users = models.PositiveIntegerField(default=5)
     max_cards = models.PositiveIntegerField(default=10)
     
+    # Usage counters, maintained by organizations/quotas.py
+    user_count = models.PositiveIntegerField(default=0, editable=False)
+    card_count = models.PositiveIntegerField(default=0, editable=False)
+    
     # Settings
     allow_custom_themes = models.BooleanField(default=False)
     allow_analytics = models.BooleanField(default=True)
@@ -70,33 +75,37 @@ class Organization(models.Model):
     def __str__(self):
         return self.name
     
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.name)
-            # Ensure unique slug
-            original_slug = self.slug
-            counter = 1
-            while Organization.objects.filter(slug=self.slug).exclude(pk=self.pk).exists():
-                self.slug = f"{original_slug}-{counter}"
-                counter += 1
-        super().save(*args, **kwargs)
+    # Only changed through relative updates; never written back from memory
+    COUNTER_FIELDS = ('user_count', 'card_count')
     
-    @property
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        
+        if self.slug:
+            super().save(*args, **kwargs)
+            return
+        
+        # Ensure unique slug: name, name-1, name-2, ... with one prefix query
+        from cards.slugs import insert_unique, numbered_slugs
+        base = slugify(self.name)
+        taken = set(
+            Organization.objects.filter(slug__startswith=base)
+            .exclude(pk=self.pk)
+            .values_list('slug', flat=True)
+        )
+        base_save = super().save
+        insert_unique(self, 'slug', numbered_slugs(base, taken), lambda: base_save(*args, **kwargs))
+    
+    @cached_property
     def admin_user(self):
         """Get the admin user of this organization."""
         from accounts.models import User
         return self.members.filter(role=User.Role.ADMIN).first()
     
-    @property
-    def user_count(self):
-        """Get total number of users in organization."""
-        return self.members.count()
-    
-    @property
-    def card_count(self):
-        """Get total number of cards in organization."""
-        return sum(member.cards.count() for member in self.members.all())
-    
     @property
     def can_add_user(self):
         """Check if organization can add more users."""
@@ -0,0 +1,152 @@
+"""
+Organization quota counters.
+
+Organization.user_count and Organization.card_count are denormalized so
+quota checks (``can_add_user``/``can_add_card``) are plain field reads.
+They are kept current with relative ``F()`` updates in the same
+transaction as the change that moves them:
+
+- ``User.save()`` and ``NFCCard.save()`` report joins, leaves and card
+  reassignments (they remember the foreign key they were loaded with);
+- the post_delete receivers below cover deletes, including cascades and
+  queryset deletes that never call ``Model.delete()``;
+- bulk paths (e.g. cards/provisioning.py) call ``adjust`` directly, or
+  ``reserve_cards`` to enforce the limit in the same statement.
+
+Writes that bypass all of these (``QuerySet.update`` on the foreign keys,
+raw SQL) can leave the counters off; ``manage.py reconcile_quotas``
+recomputes them.
+"""
+
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+
+class QuotaExceeded(Exception):
+    """Raised when an organization has no room for more users or cards."""
+
+
+def adjust(organization_id, users=0, cards=0):
+    """Add ``users`` and ``cards`` (either may be negative) to an organization."""
+    from .models import Organization
+
+    if not organization_id or not (users or cards):
+        return
+    # Clamp at zero so drift never trips the unsigned column constraint
+    Organization.objects.filter(pk=organization_id).update(
+        user_count=Greatest(F('user_count') + users, 0),
+        card_count=Greatest(F('card_count') + cards, 0),
+    )
+
+
+def organizations_of(*user_ids):
+    """Map each given user id to its organization id (or None)."""
+    from accounts.models import User
+
+    ids = [pk for pk in user_ids if pk]
+    if not ids:
+        return {}
+    return dict(User.objects.filter(pk__in=ids).values_list('pk', 'organization_id'))
+
+
+def card_moved(old_user_id, new_user_id):
+    """Record a card created for, reassigned to, or removed from a user."""
+    orgs = organizations_of(old_user_id, new_user_id)
+    old_org, new_org = orgs.get(old_user_id), orgs.get(new_user_id)
+    if old_org != new_org:
+        adjust(old_org, cards=-1)
+        adjust(new_org, cards=1)
+
+
+def member_moved(user, old_organization_id, created=False):
+    """Record a user joining, leaving or switching organizations."""
+    if old_organization_id == user.organization_id:
+        return
+    # Cards follow their owner
+    cards = 0 if created else user.cards.count()
+    adjust(old_organization_id, users=-1, cards=-cards)
+    adjust(user.organization_id, users=1, cards=cards)
+
+
+def check_cards(organization, count=1):
+    """Raise QuotaExceeded unless ``count`` more cards fit."""
+    if organization.card_count + count > organization.max_cards:
+        raise QuotaExceeded(
+            f'{organization} has {organization.card_count} of {organization.max_cards} cards; '
+            f'{count} more would exceed the limit.'
+        )
+
+
+def reserve_cards(organization, count):
+    """
+    Add ``count`` cards to ``organization``'s counter only if they fit,
+    with one conditional UPDATE: concurrent callers cannot pass the limit
+    together. Call it in the transaction that inserts the cards. Raises
+    QuotaExceeded when they do not fit.
+    """
+    from .models import Organization
+
+    fits = Organization.objects.filter(pk=organization.pk, card_count__lte=F('max_cards') - count)
+    while not fits.update(card_count=F('card_count') + count):
+        organization.refresh_from_db(fields=['card_count', 'max_cards'])
+        check_cards(organization, count)
+
+
+def check_users(organization, count=1):
+    """Raise QuotaExceeded unless ``count`` more members fit."""
+    if organization.user_count + count > organization.max_users:
+        raise QuotaExceeded(
+            f'{organization} has {organization.user_count} of {organization.max_users} users; '
+            f'{count} more would exceed the limit.'
+        )
+
+
+def reconcile(organization_ids=None, dry_run=False):
+    """
+    Recompute the counters from the membership and card tables.
+    Returns [(organization, (old users, old cards), (users, cards))] for
+    every organization whose counters were wrong.
+    """
+    from cards.models import NFCCard
+    from .models import Organization
+
+    cards = NFCCard.objects.filter(
+        user__organization=OuterRef('pk')
+    ).order_by().values('user__organization').annotate(total=Count('pk')).values('total')
+
+    organizations = Organization.objects.annotate(
+        actual_users=Count('members', distinct=True),
+        actual_cards=Coalesce(Subquery(cards), Value(0)),
+    )
+    if organization_ids is not None:
+        organizations = organizations.filter(pk__in=organization_ids)
+
+    fixes = []
+    for org in organizations:
+        if (org.user_count, org.card_count) == (org.actual_users, org.actual_cards):
+            continue
+        fixes.append((org, (org.user_count, org.card_count), (org.actual_users, org.actual_cards)))
+        if not dry_run:
+            Organization.objects.filter(pk=org.pk).update(
+                user_count=org.actual_users, card_count=org.actual_cards
+            )
+    return fixes
+
+
+# A cascade may delete a user's cards before or after the user row, so
+# each receiver only counts what is still there: a card whose owner is
+# already gone was counted by member_deleted, and member_deleted only
+# counts cards not yet deleted.
+
+@receiver(post_delete, sender='cards.NFCCard')
+def card_deleted(sender, instance, **kwargs):
+    if instance.user_id:
+        card_moved(instance.user_id, None)
+
+
+@receiver(post_delete, sender='accounts.User')
+def member_deleted(sender, instance, **kwargs):
+    if instance.organization_id:
+        adjust(instance.organization_id, users=-1, cards=-instance.cards.count())
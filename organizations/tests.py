@@ -1,3 +1,126 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+from accounts.models import User
+from cards.models import NFCCard
+from nfc_platform.testing import LOCMEM_CACHES, clear_caches
+from . import quotas
+from .models import Organization
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class QuotaCounterTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.acme = Organization.objects.create(name='Acme', max_users=3, max_cards=3)
+        self.globex = Organization.objects.create(name='Globex')
+
+    def member(self, email, organization=None):
+        return User.objects.create_user(email, 'pass12345', organization=organization)
+
+    def card(self, user):
+        return NFCCard.objects.create(user=user, qr_code='qrcodes/x.png')
+
+    def counts(self, organization):
+        organization.refresh_from_db()
+        return organization.user_count, organization.card_count
+
+    def test_cards_follow_their_owner(self):
+        alice = self.member('alice@example.com', self.acme)
+        bob = self.member('bob@example.com', self.globex)
+        loner = self.member('loner@example.com')
+        card = self.card(alice)
+        self.assertEqual(self.counts(self.acme), (1, 1))
+
+        card = NFCCard.objects.get(pk=card.pk)
+        card.user = bob
+        card.save()
+        self.assertEqual(self.counts(self.acme), (1, 0))
+        self.assertEqual(self.counts(self.globex), (1, 1))
+
+        card.user = loner
+        card.save()
+        self.assertEqual(self.counts(self.globex), (1, 0))
+
+        card.user = alice
+        card.save()
+        card.delete()
+        self.assertEqual(self.counts(self.acme), (1, 0))
+
+    def test_members_take_their_cards_when_they_move(self):
+        alice = self.member('alice@example.com')
+        self.card(alice)
+        self.card(alice)
+
+        alice = User.objects.get(pk=alice.pk)
+        alice.organization = self.acme
+        alice.save()
+        self.assertEqual(self.counts(self.acme), (1, 2))
+
+        alice.organization = self.globex
+        alice.save()
+        self.assertEqual(self.counts(self.acme), (0, 0))
+        self.assertEqual(self.counts(self.globex), (1, 2))
+
+        alice.organization = None
+        alice.save()
+        self.assertEqual(self.counts(self.globex), (0, 0))
+
+    def test_deleting_a_member_counts_each_card_once(self):
+        alice = self.member('alice@example.com', self.acme)
+        self.card(alice)
+        self.card(alice)
+        self.member('bob@example.com', self.acme)
+        self.assertEqual(self.counts(self.acme), (2, 2))
+
+        alice.delete()
+        self.assertEqual(self.counts(self.acme), (1, 0))
+
+    def test_checks_use_the_counters(self):
+        alice = self.member('alice@example.com', self.acme)
+        self.card(alice)
+        self.card(alice)
+        self.acme.refresh_from_db()
+
+        quotas.check_cards(self.acme)
+        with self.assertNumQueries(0), self.assertRaises(quotas.QuotaExceeded):
+            quotas.check_cards(self.acme, 2)
+        quotas.check_users(self.acme, 2)
+        with self.assertRaises(quotas.QuotaExceeded):
+            quotas.check_users(self.acme, 3)
+        self.assertTrue(self.acme.can_add_card)
+        self.assertTrue(self.acme.can_add_user)
+
+    def test_reserve_cards_only_adds_cards_that_fit(self):
+        self.card(self.member('alice@example.com', self.acme))
+        quotas.reserve_cards(self.acme, 2)
+        self.assertEqual(self.counts(self.acme), (1, 3))
+
+        stale = Organization.objects.get(pk=self.acme.pk)
+        stale.card_count = 0
+        with self.assertRaises(quotas.QuotaExceeded):
+            quotas.reserve_cards(stale, 1)
+        self.assertEqual(stale.card_count, 3)
+        self.assertEqual(self.counts(self.acme), (1, 3))
+
+    def test_reconcile_repairs_drifted_counters(self):
+        alice = self.member('alice@example.com', self.acme)
+        self.card(alice)
+        # Bypasses the counters, as queryset updates do
+        User.objects.filter(pk=alice.pk).update(organization=self.globex)
+
+        fixes = quotas.reconcile(dry_run=True)
+        self.assertEqual(
+            sorted((org.name, old, new) for org, old, new in fixes),
+            [('Acme', (1, 1), (0, 0)), ('Globex', (0, 0), (1, 1))]
+        )
+        self.assertEqual(self.counts(self.acme), (1, 1))
+
+        quotas.reconcile()
+        self.assertEqual(self.counts(self.acme), (0, 0))
+        self.assertEqual(self.counts(self.globex), (1, 1))
+        self.assertEqual(quotas.reconcile(), [])
+
+    def test_adjust_never_goes_below_zero(self):
+        quotas.adjust(self.acme.pk, users=-5, cards=-5)
+        self.assertEqual(self.counts(self.acme), (0, 0))
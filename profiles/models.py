@@ -122,7 +122,16 @@ class UserProfile(models.Model):
     def save(self, *args, **kwargs):
         # Calculate completion percentage
         self.completion_percentage = self.calculate_completion()
+        
+        # Partial saves still bump updated_at, which versions cached pages
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'updated_at' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'updated_at']
+        
         super().save(*args, **kwargs)
+        
+        from cards.resolver import invalidate_slugs
+        invalidate_slugs(self.user.cards.values_list('url_slug', flat=True))
     
     def calculate_completion(self):
         """Calculate profile completion percentage."""
@@ -260,3 +269,19 @@ class ProfileContent(models.Model):
     
     def __str__(self):
         return f"{self.content_type} - {self.title or 'Untitled'}"
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.invalidate_cards()
+    
+    def delete(self, *args, **kwargs):
+        self.invalidate_cards()
+        return super().delete(*args, **kwargs)
+    
+    def invalidate_cards(self):
+        """Evict cached public pages showing this section."""
+        from cards.models import NFCCard
+        from cards.resolver import invalidate_slugs
+        invalidate_slugs(
+            NFCCard.objects.filter(user_id=self.profile_id).values_list('url_slug', flat=True)
+        )
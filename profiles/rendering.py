@@ -0,0 +1,88 @@
+"""
+Render cache for public profile pages.
+
+Public profiles are read on every NFC tap but change rarely, so the
+rendered HTML is cached per card in the ``profiles`` cache namespace.
+Each key includes the version of the card, profile and theme the page
+was rendered from (their ``updated_at`` timestamps), so a page is only
+served while those still match, and entries are tagged with the card's
+slug, which the models' ``save()`` methods invalidate eagerly as well.
+"""
+
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.conf import settings
+from django.template.loader import render_to_string
+
+from nfc_platform.caching import namespace
+
+
+@dataclass
+class CachedPage:
+    """A rendered profile page plus its validators."""
+    html: str
+    etag: str
+    last_modified: datetime
+
+
+def get_profile(card):
+    """Return the card owner's profile, or None."""
+    if card.user and hasattr(card.user, 'profile'):
+        return card.user.profile
+    return None
+
+
+def page_key(card, request, template_name):
+    version = hashlib.md5(repr(page_version(card, request)).encode(), usedforsecurity=False)
+    return f'page:{template_name}:{card.url_slug}:{version.hexdigest()}'
+
+
+def page_version(card, request):
+    """
+    Describe everything a rendered page depends on.
+    Any change to these values invalidates the cached page.
+    """
+    profile = get_profile(card)
+    return (
+        card.updated_at.isoformat(),
+        card.theme_id and card.theme.updated_at.isoformat(),
+        profile and profile.updated_at.isoformat(),
+        card.user_id and card.user.is_verified,
+        request.scheme,
+        request.get_host(),
+    )
+
+
+def last_modified(card):
+    profile = get_profile(card)
+    stamps = [card.updated_at]
+    if card.theme_id:
+        stamps.append(card.theme.updated_at)
+    if profile:
+        stamps.append(profile.updated_at)
+    return max(stamps).replace(microsecond=0)
+
+
+def get_page(card, request, template_name, get_context):
+    """
+    Return the CachedPage for ``card``, rendering it on a miss.
+    ``get_context`` is only called when the page has to be rendered.
+    """
+    from cards.resolver import slug_tag
+
+    def render():
+        html = render_to_string(template_name, get_context(), request)
+        return CachedPage(
+            html=html,
+            etag=hashlib.md5(html.encode(), usedforsecurity=False).hexdigest(),
+            last_modified=last_modified(card),
+        )
+
+    return namespace('profiles').get_or_set(
+        page_key(card, request, template_name),
+        render,
+        settings.PROFILE_PAGE_CACHE_TIMEOUT,
+        tags=[slug_tag(card.url_slug)]
+    )
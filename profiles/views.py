@@ -3,86 +3,85 @@ Views for profiles app.
 Handles public NFC card profile pages.
 """
 
-import hashlib
-from django.shortcuts import get_object_or_404
+from django.core.files.storage import default_storage
+from django.shortcuts import redirect
 from django.views.generic import TemplateView, View
-from django.http import HttpResponse
-from cards.models import NFCCard
+from django.http import FileResponse, HttpResponse, HttpResponseBadRequest
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from cards.resolver import resolve_card
+from themes.stylesheets import card_stylesheets
+from . import rendering
 
 
-class PublicProfileView(TemplateView):
-    """Public profile page for NFC cards."""
-    template_name = 'profile/public.html'
+class CachedProfilePageMixin:
+    """
+    Serve a card's profile page from the render cache.
+    Responses carry ETag/Last-Modified so repeat taps can get a 304.
+    """
     
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        slug = self.kwargs.get('slug')
+    def get(self, request, *args, **kwargs):
+        card = resolve_card(kwargs.get('slug'))
+        self.card_requested(card)
         
-        card = get_object_or_404(NFCCard, url_slug=slug)
-        context['card'] = card
-        
-        if card.user and hasattr(card.user, 'profile'):
-            context['profile'] = card.user.profile
-        else:
-            context['profile'] = None
+        page = rendering.get_page(
+            card, request, self.template_name,
+            lambda: self.get_context_data(card=card, **kwargs)
+        )
+        etag = quote_etag(page.etag)
+        last_modified = http_date(page.last_modified.timestamp())
         
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=page.last_modified.timestamp()
+        )
+        if response is None:
+            response = HttpResponse(page.html)
+        response['ETag'] = etag
+        response['Last-Modified'] = last_modified
+        # Revalidate on every tap so views are still counted
+        patch_cache_control(response, no_cache=True)
+        return response
+    
+    def get_context_data(self, card, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['card'] = card
+        context['profile'] = rendering.get_profile(card)
         if card.theme:
             context['theme'] = card.theme
-        
-        # Track the view
-        self.track_view(card)
-        
+        context['stylesheets'] = card_stylesheets(card)
         return context
     
+    def card_requested(self, card):
+        """Hook called on every request, including cache hits and 304s."""
+
+
+class PublicProfileView(CachedProfilePageMixin, TemplateView):
+    """Public profile page for NFC cards."""
+    template_name = 'profile/public.html'
+    
+    def card_requested(self, card):
+        self.track_view(card)
+    
     def track_view(self, card):
         """Track profile view analytics."""
+        from analytics.ingest import record_event
         from analytics.models import ProfileAnalytics
         
-        request = self.request
-        ip = self.get_client_ip(request)
-        
-        # Hash IP for privacy
-        ip_hash = hashlib.sha256(ip.encode()).hexdigest()[:32]
-        
-        # Get device info
-        user_agent = request.META.get('HTTP_USER_AGENT', '')[:255]
-        device_type = self.detect_device_type(user_agent)
-        
-        ProfileAnalytics.objects.create(
-            card=card,
-            interaction_type=ProfileAnalytics.InteractionType.VIEW,
-            visitor_ip_hash=ip_hash,
-            user_agent=user_agent,
-            referrer=request.META.get('HTTP_REFERER', '')[:200] if request.META.get('HTTP_REFERER') else '',
-            device_type=device_type
+        record_event(
+            card,
+            ProfileAnalytics.InteractionType.VIEW,
+            self.request,
+            referrer=self.request.META.get('HTTP_REFERER', '')
         )
-    
-    def get_client_ip(self, request):
-        """Get client IP address."""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR', '0.0.0.0')
-        return ip
-    
-    def detect_device_type(self, user_agent):
-        """Detect device type from user agent."""
-        user_agent = user_agent.lower()
-        if 'mobile' in user_agent or 'android' in user_agent and 'mobile' in user_agent:
-            return 'MOBILE'
-        elif 'tablet' in user_agent or 'ipad' in user_agent:
-            return 'TABLET'
-        elif 'windows' in user_agent or 'macintosh' in user_agent or 'linux' in user_agent:
-            return 'DESKTOP'
-        return 'OTHER'
 
 
 class DownloadVCardView(View):
     """Download vCard for contact."""
     
     def get(self, request, slug):
-        card = get_object_or_404(NFCCard, url_slug=slug)
+        card = resolve_card(slug)
         
         if not card.user or not hasattr(card.user, 'profile'):
             return HttpResponse('Profile not found', status=404)
@@ -99,107 +98,73 @@ class DownloadVCardView(View):
     
     def track_interaction(self, card, request):
         """Track contact save analytics."""
+        from analytics.ingest import record_event
         from analytics.models import ProfileAnalytics
         
-        ip = request.META.get('REMOTE_ADDR', '0.0.0.0')
-        ip_hash = hashlib.sha256(ip.encode()).hexdigest()[:32]
-        
-        ProfileAnalytics.objects.create(
-            card=card,
-            interaction_type=ProfileAnalytics.InteractionType.CONTACT_SAVE,
-            visitor_ip_hash=ip_hash,
-            user_agent=request.META.get('HTTP_USER_AGENT', '')[:255]
-        )
+        record_event(card, ProfileAnalytics.InteractionType.CONTACT_SAVE, request)
 
 
 class QRCodeView(View):
-    """Generate and serve QR code for profile."""
+    """
+    Serve a pre-rendered QR code for a profile.
+
+    Optional ``size``, ``color`` and ``format`` (png, webp, svg) query
+    parameters select a variant; each variant is rendered once and then
+    served from storage.
+    """
     
     def get(self, request, slug):
-        card = get_object_or_404(NFCCard, url_slug=slug)
+        from cards import qr
+        
+        card = resolve_card(slug)
         
         # Check if download is requested
         is_download = request.GET.get('download') == 'true'
         
-        # If QR code exists, serve it
-        if card.qr_code:
-            response = HttpResponse(card.qr_code.read(), content_type='image/png')
-            if is_download:
-                response['Content-Disposition'] = f'attachment; filename="qr_{slug}.png"'
-            else:
-                response['Content-Disposition'] = f'inline; filename="qr_{slug}.png"'
-            return response
-        
-        # Generate QR code on the fly
         try:
-            import qrcode
-            from io import BytesIO
-            from django.conf import settings
-            
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
+            asset = qr.get_asset(
+                card,
+                size=request.GET.get('size'),
+                color=request.GET.get('color'),
+                fmt=request.GET.get('format'),
             )
-            # Use proper URL with /u/ prefix
-            profile_url = f"{settings.SITE_URL}/u/{slug}"
-            qr.add_data(profile_url)
-            qr.make(fit=True)
-            
-            img = qr.make_image(fill_color='#D4AF37', back_color='white')
-            
-            buffer = BytesIO()
-            img.save(buffer, format='PNG')
-            buffer.seek(0)
-            
-            response = HttpResponse(buffer.getvalue(), content_type='image/png')
-            if is_download:
-                response['Content-Disposition'] = f'attachment; filename="qr_{slug}.png"'
-            else:
-                response['Content-Disposition'] = f'inline; filename="qr_{slug}.png"'
-            
-            # Track QR code interaction
-            if is_download:
-                self.track_qr_download(card, request)
-            
-            return response
-            
+        except qr.InvalidVariant as e:
+            return HttpResponseBadRequest(str(e))
         except ImportError:
             return HttpResponse('QR code generation not available', status=501)
+        
+        if is_download:
+            self.track_qr_download(card, request)
+        
+        # Remote storage: send the client straight to the bucket/CDN
+        if not qr.serves_locally():
+            return redirect(default_storage.url(asset.path))
+        
+        etag = quote_etag(asset.sha256)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        
+        filename = f'qr_{slug}.{asset.format}'
+        response = FileResponse(
+            default_storage.open(asset.path, 'rb'),
+            as_attachment=is_download,
+            filename=filename,
+            content_type=qr.FORMATS[asset.format]
+        )
+        # Content-addressed files never change
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        response['ETag'] = etag
+        return response
     
     def track_qr_download(self, card, request):
         """Track QR code download analytics."""
+        from analytics.ingest import record_event
         from analytics.models import ProfileAnalytics
         
-        ip = request.META.get('REMOTE_ADDR', '0.0.0.0')
-        ip_hash = hashlib.sha256(ip.encode()).hexdigest()[:32]
-        
-        ProfileAnalytics.objects.create(
-            card=card,
-            interaction_type='QR_DOWNLOAD',
-            visitor_ip_hash=ip_hash,
-            user_agent=request.META.get('HTTP_USER_AGENT', '')[:255]
-        )
+        record_event(card, ProfileAnalytics.InteractionType.QR_DOWNLOAD, request)
 
 
-class MobilePreviewView(TemplateView):
+class MobilePreviewView(CachedProfilePageMixin, TemplateView):
     """Mobile-optimized preview of profile."""
     template_name = 'profile/mobile.html'
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        slug = self.kwargs.get('slug')
-        
-        card = get_object_or_404(NFCCard, url_slug=slug)
-        context['card'] = card
-        
-        if card.user and hasattr(card.user, 'profile'):
-            context['profile'] = card.user.profile
-        else:
-            context['profile'] = None
-        
-        if card.theme:
-            context['theme'] = card.theme
-        
-        return context
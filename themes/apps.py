@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ThemesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'themes'
+
+    def ready(self):
+        from nfc_platform.caching import namespace
+        namespace('themes').invalidate_on(self.get_model('Theme'))
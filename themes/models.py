@@ -82,6 +82,8 @@ class Theme(models.Model):
     
     # Custom CSS (for advanced customization)
     custom_css = models.TextField(blank=True)
+    # Digest of the compiled stylesheet (see themes/stylesheets.py)
+    stylesheet = models.CharField(max_length=64, blank=True, editable=False)
     
     # Ownership
     created_by = models.ForeignKey(
@@ -109,6 +111,34 @@ class Theme(models.Model):
     def __str__(self):
         return self.name
     
+    def save(self, *args, **kwargs):
+        from .stylesheets import THEME_FIELDS, compile_theme, digest, store
+        
+        # Partial saves still bump updated_at, which versions cached pages
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'updated_at' not in update_fields:
+            kwargs['update_fields'] = update_fields = [*update_fields, 'updated_at']
+        
+        if update_fields is None or THEME_FIELDS.intersection(update_fields):
+            css = compile_theme(self)
+            if digest(css) != self.stylesheet:
+                self.stylesheet = store(css)
+                if update_fields is not None:
+                    kwargs['update_fields'] = [*update_fields, 'stylesheet']
+        
+        super().save(*args, **kwargs)
+        
+        from cards.resolver import invalidate_slugs
+        invalidate_slugs(self.cards.values_list('url_slug', flat=True))
+    
+    @classmethod
+    def public_themes(cls):
+        """Active public themes, cached in the ``themes`` namespace."""
+        from nfc_platform.caching import namespace
+        return namespace('themes').get_or_set(
+            'public', lambda: list(cls.objects.filter(is_active=True, is_public=True))
+        )
+    
     def get_css_variables(self):
         """Generate CSS custom properties for this theme."""
         css_vars = {
@@ -0,0 +1,135 @@
+"""
+Precompiled theme stylesheets.
+
+A theme's colours, background and ``custom_css`` are compiled into one
+minified stylesheet when the theme is saved, and a card's own
+``custom_css`` into a second one. Both are stored content-addressed
+(``themes/css/<sha256>.css``) in the default storage and the model keeps
+the digest, so profile pages link to files that never change instead of
+inlining the CSS into every response, and cards sharing a theme share
+its stylesheet.
+"""
+
+import hashlib
+import re
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+
+# Quoted strings are kept verbatim; comments and whitespace are dropped
+TOKENS = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|/\*.*?\*/', re.S)
+SPACE_AROUND = re.compile(r'\s*([{};,>])\s*')
+SPACE_AFTER = re.compile(r':\s+')
+SPACE = re.compile(r'\s+')
+
+# Theme fields the compiled stylesheet depends on
+THEME_FIELDS = {
+    'primary_color', 'secondary_color', 'background_color', 'text_color',
+    'accent_color', 'background_type', 'background_gradient', 'dark_mode',
+    'custom_css',
+}
+
+
+def minify(css):
+    """Strip comments and redundant whitespace from ``css``."""
+    parts = []
+    position = 0
+    for match in TOKENS.finditer(css):
+        parts.append(_squeeze(css[position:match.start()]))
+        if not match.group().startswith('/*'):
+            parts.append(match.group())
+        position = match.end()
+    parts.append(_squeeze(css[position:]))
+    return ''.join(parts).strip()
+
+
+def _squeeze(css):
+    css = SPACE_AROUND.sub(r'\1', SPACE.sub(' ', css))
+    # Only after colons: a space before one is a descendant selector
+    return SPACE_AFTER.sub(':', css).replace(';}', '}')
+
+
+def compile_theme(theme):
+    """The minified stylesheet for ``theme``."""
+    if theme.background_type == 'GRADIENT' and theme.background_gradient:
+        background = theme.background_gradient
+    else:
+        background = theme.background_color
+    panel = 'rgba(22, 22, 22, 0.8)' if theme.dark_mode else 'rgba(255, 255, 255, 0.85)'
+
+    return minify(f"""
+        :root {{
+            --theme-primary: {theme.primary_color};
+            --theme-secondary: {theme.secondary_color};
+            --theme-bg: {theme.background_color};
+            --theme-text: {theme.text_color};
+            --theme-accent: {theme.accent_color};
+        }}
+        body {{
+            background: {background} !important;
+            color: {theme.text_color} !important;
+        }}
+        .gold-gradient {{
+            background: linear-gradient(135deg, {theme.primary_color}, {theme.accent_color}, {theme.secondary_color}) !important;
+        }}
+        .glass-card {{
+            background: {panel} !important;
+            border: 1px solid {theme.primary_color}33 !important;
+        }}
+        {theme.custom_css}
+    """)
+
+
+def digest(css):
+    return hashlib.sha256(css.encode()).hexdigest()
+
+
+def path_for(digest):
+    return f'themes/css/{digest}.css'
+
+
+def store(css):
+    """Store ``css`` under its content hash and return the digest."""
+    key = digest(css)
+    path = path_for(key)
+    if not default_storage.exists(path):
+        saved = default_storage.save(path, ContentFile(css.encode()))
+        if saved != path:
+            # Another worker stored the same bytes first; keep one copy
+            default_storage.delete(saved)
+    return key
+
+
+def url_for(digest):
+    """Where browsers fetch the stylesheet ``digest``."""
+    from cards.qr import serves_locally
+
+    if serves_locally():
+        return reverse('themes:stylesheet', kwargs={'digest': digest})
+    return default_storage.url(path_for(digest))
+
+
+def card_stylesheets(card):
+    """
+    URLs of the stylesheets a profile page for ``card`` links, theme
+    first. Stylesheets missing for rows saved before they existed are
+    compiled here, once.
+    """
+    from cards.models import NFCCard
+    from .models import Theme
+
+    urls = []
+    theme = card.theme if card.theme_id else None
+    if theme:
+        if not theme.stylesheet:
+            theme.stylesheet = store(compile_theme(theme))
+            Theme.objects.filter(pk=theme.pk).update(stylesheet=theme.stylesheet)
+        urls.append(url_for(theme.stylesheet))
+    if card.custom_css:
+        if not card.stylesheet:
+            card.stylesheet = store(minify(card.custom_css))
+            NFCCard.objects.filter(pk=card.pk).update(stylesheet=card.stylesheet)
+        urls.append(url_for(card.stylesheet))
+    return urls
@@ -9,6 +9,7 @@ app_name = 'themes'
 
 urlpatterns = [
     path('', views.ThemeListView.as_view(), name='list'),
+    path('css/<slug:digest>.css', views.ThemeStylesheetView.as_view(), name='stylesheet'),
     path('<slug:slug>/', views.ThemeDetailView.as_view(), name='detail'),
     path('<slug:slug>/preview/', views.ThemePreviewView.as_view(), name='preview'),
 ]
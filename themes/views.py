@@ -2,7 +2,11 @@
 Views for themes app.
 """
 
-from django.views.generic import ListView, DetailView, TemplateView
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.generic import ListView, DetailView, TemplateView, View
 from django.shortcuts import get_object_or_404
 from .models import Theme
 
@@ -14,7 +18,7 @@ class ThemeListView(ListView):
     context_object_name = 'themes'
     
     def get_queryset(self):
-        return Theme.objects.filter(is_active=True, is_public=True)
+        return Theme.public_themes()
 
 
 class ThemeDetailView(DetailView):
@@ -53,3 +57,29 @@ class ThemePreviewView(TemplateView):
         }
         
         return context
+
+
+class ThemeStylesheetView(View):
+    """
+    Serve a compiled theme or card stylesheet from local storage
+    (see themes/stylesheets.py). Remote storage is linked directly.
+    """
+    
+    def get(self, request, digest):
+        from .stylesheets import path_for
+        
+        etag = quote_etag(digest)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        
+        try:
+            stylesheet = default_storage.open(path_for(digest), 'rb')
+        except FileNotFoundError:
+            raise Http404('No such stylesheet.')
+        
+        response = FileResponse(stylesheet, content_type='text/css; charset=utf-8')
+        # Content-addressed files never change
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        response['ETag'] = etag
+        return response